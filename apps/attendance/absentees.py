@@ -0,0 +1,69 @@
+"""
+Materialize ``not_come`` attendance records for employees who never showed up.
+
+For every region the missing employees are found with a single NOT EXISTS
+anti-join and inserted with ``bulk_create(ignore_conflicts=True)``. The
+``(employee, date)`` unique constraint makes reruns and overlapping
+backfills safe. ``bulk_create`` returns every object it was given, inserted
+or not, so the rows created are counted before and after the inserts.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import AttendanceRecord, Employee, Region
+from .schedules import is_workday
+
+logger = logging.getLogger(__name__)
+
+
+def absent_employee_ids(day, region):
+    """Active employees of ``region`` employed on ``day`` without a record for it."""
+    return Employee.objects.filter(
+        Q(hire_date__lte=day) | Q(hire_date__isnull=True, created_at__date__lte=day),
+        region=region,
+        is_active=True,
+        status='active',
+    ).filter(
+        ~Exists(AttendanceRecord.objects.filter(employee=OuterRef('pk'), date=day))
+    ).values_list('pk', flat=True)
+
+
+def materialize_absentees(day, region_ids=None, chunk_size=None):
+    """Insert ``not_come`` records for ``day``. Returns the number of rows created per region name."""
+    chunk_size = chunk_size or settings.ABSENTEE_CHUNK_SIZE
+    regions = Region.objects.filter(is_active=True)
+    if region_ids:
+        regions = regions.filter(pk__in=region_ids)
+
+    created = {}
+    for region in regions:
+        if not is_workday(day, region.pk):
+            continue
+        employee_ids = list(absent_employee_ids(day, region))
+        created[region.name] = 0
+        if employee_ids:
+            absentees = AttendanceRecord.objects.filter(region=region, date=day, status='not_come')
+            before = absentees.count()
+            for start in range(0, len(employee_ids), chunk_size):
+                AttendanceRecord.objects.bulk_create([
+                    AttendanceRecord(employee_id=employee_id, region=region, date=day, status='not_come')
+                    for employee_id in employee_ids[start:start + chunk_size]
+                ], ignore_conflicts=True)
+            created[region.name] = absentees.count() - before
+        if day == timezone.localdate():
+            region.update_counts()
+
+    logger.info(f"Absentees for {day}: {created}")
+    return created
+
+
+def materialize_absentees_range(date_from, date_to, region_ids=None, chunk_size=None):
+    """Backfill every day from ``date_from`` to ``date_to`` inclusive."""
+    day = date_from
+    while day <= date_to:
+        yield day, materialize_absentees(day, region_ids, chunk_size)
+        day += timedelta(days=1)
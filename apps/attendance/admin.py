@@ -4,12 +4,15 @@ from django.urls import reverse
 from django.utils.safestring import mark_safe
 from .models import (
     Region, Filial, Employee, Terminal, Camera, Admin, 
-    Image, AttendanceRecord, UnknownFace , EmployeeCameraStats
+    Image, AttendanceRecord, UnknownFace , EmployeeCameraStats, IdSequence,
+    UnknownFaceCluster, WorkSchedule, PresenceInterval, ImageIngestStats, DeviceKey
 )
+from .thumbnails import thumbnail_url
 
 
 
 admin.site.register(EmployeeCameraStats)
+admin.site.register(IdSequence)
 @admin.register(Region)
 class RegionAdmin(admin.ModelAdmin):
     list_display = ['name', 'label', 'employees_count', 'is_active', 'created_at']
@@ -26,6 +29,16 @@ class FilialAdmin(admin.ModelAdmin):
     list_filter = ['is_active', 'created_at']
     search_fields = ['name', 'value']
 
+@admin.register(WorkSchedule)
+class WorkScheduleAdmin(admin.ModelAdmin):
+    list_display = ['name', 'region', 'filial', 'start_time', 'end_time', 'grace_minutes', 'workdays', 'is_active']
+    list_filter = ['is_active', 'region', 'filial']
+    search_fields = ['name']
+    raw_id_fields = ['region', 'filial']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('region', 'filial')
+
 @admin.register(Employee)
 class EmployeeAdmin(admin.ModelAdmin):
     list_display = [
@@ -62,24 +75,32 @@ class TerminalAdmin(admin.ModelAdmin):
     search_fields = ['name', 'ip_address', 'location']
     raw_id_fields = ['region', 'filial']
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_online()
+
     def is_online(self, obj):
         if obj.is_online:
             return format_html('<span style="color: green;">●</span> Online')
         return format_html('<span style="color: red;">●</span> Offline')
     is_online.short_description = 'Status'
+    is_online.admin_order_field = 'online'
 
 @admin.register(Camera)
 class CameraAdmin(admin.ModelAdmin):
     list_display = ['name', 'ip_address', 'port', 'region', 'status', 'is_online', 'created_at']
-    list_filter = ['status', 'region', 'created_at']
+    list_filter = ['status', 'role', 'region', 'created_at']
     search_fields = ['name', 'ip_address', 'location']
     raw_id_fields = ['region']
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_online()
+
     def is_online(self, obj):
         if obj.is_online:
             return format_html('<span style="color: green;">●</span> Online')
         return format_html('<span style="color: red;">●</span> Offline')
     is_online.short_description = 'Status'
+    is_online.admin_order_field = 'online'
 
 @admin.register(Admin)
 class AdminModelAdmin(admin.ModelAdmin):
@@ -97,7 +118,7 @@ class ImageInline(admin.TabularInline):
         if obj.image:
             return format_html(
                 '<img src="{}" width="50" height="50" style="object-fit: cover;" />',
-                obj.image.url
+                thumbnail_url(obj.image, 50)
             )
         return "No image"
     image_preview.short_description = 'Preview'
@@ -114,7 +135,7 @@ class ImageAdmin(admin.ModelAdmin):
         if obj.image:
             return format_html(
                 '<img src="{}" width="100" height="100" style="object-fit: cover;" />',
-                obj.image.url
+                thumbnail_url(obj.image, 100)
             )
         return "No image"
     image_preview.short_description = 'Preview'
@@ -125,7 +146,7 @@ class AttendanceRecordAdmin(admin.ModelAdmin):
         'employee', 'date', 'check_in', 'check_out', 
         'status', 'camera', 'region', 
     ]
-    list_filter = ['status', 'date', 'region', 'camera', ]
+    list_filter = ['status', 'date', 'region', 'camera', 'is_manual']
     search_fields = ['employee__first_name', 'employee__last_name', 'employee__employee_id']
     raw_id_fields = ['employee', 'camera', 'region']
     date_hierarchy = 'date'
@@ -136,7 +157,7 @@ class AttendanceRecordAdmin(admin.ModelAdmin):
             'fields': ('employee', 'date', 'status')
         }),
         ('Time Information', {
-            'fields': ('check_in', 'check_out', 'work_duration')
+            'fields': ('check_in', 'check_out', 'presence_seconds', 'work_duration')
         }),
         ('Location Information', {
             'fields': ('camera', 'region')
@@ -145,15 +166,21 @@ class AttendanceRecordAdmin(admin.ModelAdmin):
             'fields': ('face_image', 'face_image_preview', 'distance')
         }),
         ('Additional Information', {
-            'fields': ('notes',)
+            'fields': ('notes', 'is_manual')
         }),
     )
+
+    def save_model(self, request, obj, form, change):
+        # Clearing the box hands the record back to recompute
+        if 'is_manual' not in form.changed_data:
+            obj.is_manual = True
+        super().save_model(request, obj, form, change)
     
     def face_image_preview(self, obj):
         if obj.face_image:
             return format_html(
                 '<img src="{}" width="100" height="100" style="object-fit: cover;" />',
-                obj.face_image.url
+                thumbnail_url(obj.face_image, 100)
             )
         return "No image"
     face_image_preview.short_description = 'Face Image'
@@ -178,7 +205,7 @@ class UnknownFaceAdmin(admin.ModelAdmin):
         if obj.face_image:
             return format_html(
                 '<img src="{}" width="50" height="50" style="object-fit: cover;" />',
-                obj.face_image.url
+                thumbnail_url(obj.face_image, 50)
             )
         return "No image"
     face_image_preview.short_description = 'Face'
@@ -191,9 +218,42 @@ class UnknownFaceAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('camera', 'region', 'linked_employee')
 
+@admin.register(UnknownFaceCluster)
+class UnknownFaceClusterAdmin(admin.ModelAdmin):
+    list_display = ['id', 'region', 'size', 'first_seen', 'last_seen', 'is_processed', 'linked_employee']
+    list_filter = ['is_processed', 'region']
+    raw_id_fields = ['region', 'representative', 'linked_employee']
+    readonly_fields = ['centroid']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('region', 'linked_employee')
+
+@admin.register(DeviceKey)
+class DeviceKeyAdmin(admin.ModelAdmin):
+    list_display = ['key_id', 'camera', 'terminal', 'is_active', 'created_at']
+    list_filter = ['is_active', 'created_at']
+    search_fields = ['key_id', 'camera__name', 'terminal__name']
+    raw_id_fields = ['camera', 'terminal']
+    readonly_fields = ['key_id', 'secret']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('camera', 'terminal')
+
+@admin.register(ImageIngestStats)
+class ImageIngestStatsAdmin(admin.ModelAdmin):
+    list_display = ['date', 'images', 'original_bytes', 'stored_bytes', 'saved_bytes']
+    date_hierarchy = 'date'
+
+@admin.register(PresenceInterval)
+class PresenceIntervalAdmin(admin.ModelAdmin):
+    list_display = ['employee', 'date', 'started_at', 'last_seen_at', 'ended_at', 'entry_camera', 'exit_camera', 'sightings']
+    list_filter = ['date', 'region']
+    search_fields = ['employee__first_name', 'employee__last_name', 'employee__employee_id']
+    raw_id_fields = ['employee', 'region', 'entry_camera', 'exit_camera']
+    date_hierarchy = 'date'
+
 # Customize admin site
 admin.site.site_header = "Attendance System Administration"
 admin.site.site_title = "Attendance Admin"
 admin.site.index_title = "Welcome to Attendance System Administration"
 
-
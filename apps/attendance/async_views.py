@@ -0,0 +1,283 @@
+"""
+Async versions of the ingestion and dashboard views, for ASGI deployments.
+
+DRF 3.14 only has synchronous views, which an ASGI server runs in a thread
+per request, so every database wait holds a thread. ``AsyncAPIView`` keeps
+DRF's request parsing, content negotiation, permissions, throttles and
+exception handling but awaits an ``async def`` handler. Authenticators
+with an ``aauthenticate`` coroutine (``CachedTokenAuthentication``) run on
+the event loop; the others, the throttles and body parsing run in a thread.
+Handlers use the async ORM and return the same data as the sync views.
+
+``attendance_system/asgi.py`` turns on ``ASYNC_VIEWS``, which makes
+``urls.py`` route face-result, face-result/batch, dashboard,
+stats/attendance and events/stream here. The WSGI entry point keeps the
+sync views; its events/stream answers 503.
+"""
+import asyncio
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Count, Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import exceptions, status
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import views
+from .events import event_stream
+from .image_ingest import get_image_ingest_pool
+from .models import AttendanceRecord, Camera, Employee, Region, UnknownFace
+from .serializers import AttendanceRecordSerializer, AttendanceStatsSerializer, UnknownFaceSerializer
+
+logger = logging.getLogger(__name__)
+
+
+def schema_of(sync_handler):
+    """Document an async handler with the ``@extend_schema`` of the sync one it replaces."""
+    def decorator(handler):
+        handler.kwargs = dict(sync_handler.kwargs)
+        return handler
+    return decorator
+
+
+class AsyncAPIView(APIView):
+    """``APIView`` whose request handlers are coroutines."""
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.ainitial(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def ainitial(self, request, *args, **kwargs):
+        """``initial()`` with authentication, throttling and body parsing kept off the event loop."""
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+        request.accepted_renderer, request.accepted_media_type = self.perform_content_negotiation(request)
+        request.version, request.versioning_scheme = self.determine_version(request, *args, **kwargs)
+
+        await self.aperform_authentication(request)
+        self.check_permissions(request)
+        if self.throttle_classes or request.method not in SAFE_METHODS:
+            await sync_to_async(self.check_throttles_and_parse)(request)
+
+    async def aperform_authentication(self, request):
+        for authenticator in request.authenticators:
+            try:
+                if hasattr(authenticator, 'aauthenticate'):
+                    user_auth = await authenticator.aauthenticate(request)
+                else:
+                    user_auth = await sync_to_async(authenticator.authenticate)(request)
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+            if user_auth is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth
+                return
+        request._not_authenticated()
+
+    def check_throttles_and_parse(self, request):
+        self.check_throttles(request)
+        if request.method not in SAFE_METHODS:
+            request.data
+
+
+class FaceResultView(AsyncAPIView):
+    parser_classes = views.FaceResultView.parser_classes
+    authentication_classes = views.FaceResultView.authentication_classes
+    permission_classes = views.FaceResultView.permission_classes
+    throttle_classes = views.FaceResultView.throttle_classes
+
+    @schema_of(views.FaceResultView.post)
+    async def post(self, request, format=None):
+        try:
+            camera_obj = await self.get_camera(request)
+            if camera_obj is None:
+                return Response({"error": "Camera not found."}, status=status.HTTP_404_NOT_FOUND)
+            data, code = await self.process(
+                camera_obj,
+                request.FILES.get('file'),
+                request.data.get('user'),
+                request.data.get('cosine_similarity'),
+                request.data.get('timestamp', None),
+            )
+            return Response(data, status=code)
+
+        except Exception as e:
+            logger.error(f"Unexpected error in face recognition: {e}")
+            return Response({"error": "Internal server error"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    async def get_camera(self, request):
+        camera_id = getattr(request.user, 'camera_id', None)
+        if camera_id:
+            return await Camera.objects.filter(pk=camera_id).afirst()
+        return await Camera.objects.afirst()
+
+    async def process(self, camera_obj, face_file, user_value, cosine_similarity, timestamp_str):
+        timestamp, error = views.validate_face_result(face_file, user_value, cosine_similarity, timestamp_str)
+        if error:
+            return error
+
+        if user_value == "unrecognized":
+            employee_id = None
+            store = views.unknown_face_store(camera_obj, cosine_similarity)
+        else:
+            try:
+                employee = await Employee.objects.aget(id=int(user_value), is_active=True)
+            except ValueError:
+                return {"error": "'user' must be an integer or 'unrecognized'."}, status.HTTP_400_BAD_REQUEST
+            except Employee.DoesNotExist:
+                return {"error": "Employee not found."}, status.HTTP_404_NOT_FOUND
+            employee_id = employee.pk
+            store = views.sighting_store(employee, camera_obj, cosine_similarity, timestamp)
+
+        try:
+            # A full pool stores the crop in the calling thread, which queries the database
+            await sync_to_async(get_image_ingest_pool().submit)(store, face_file.read(), face_file.name)
+            return views.face_result_response(face_file, cosine_similarity, employee_id), status.HTTP_200_OK
+        except Exception as e:
+            logger.error(f"Error storing face result: {e}")
+            return {"error": str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR
+
+
+class FaceResultBatchView(FaceResultView):
+    @schema_of(views.FaceResultBatchView.post)
+    async def post(self, request, format=None):
+        files = request.FILES.getlist('file')
+        users = request.data.getlist('user')
+        similarities = request.data.getlist('cosine_similarity')
+        timestamps = request.data.getlist('timestamp')
+        if not files or len(users) != len(files) or len(similarities) != len(files) \
+                or (timestamps and len(timestamps) != len(files)):
+            return Response(
+                {"error": "file, user and cosine_similarity (and optionally timestamp) must be given once per face."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(files) > settings.FACE_RESULT_BATCH_MAX:
+            return Response(
+                {"error": f"At most {settings.FACE_RESULT_BATCH_MAX} faces per batch."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            camera_obj = await self.get_camera(request)
+            if camera_obj is None:
+                return Response({"error": "Camera not found."}, status=status.HTTP_404_NOT_FOUND)
+            results = []
+            for i, face_file in enumerate(files):
+                data, code = await self.process(
+                    camera_obj, face_file, users[i], similarities[i], timestamps[i] if timestamps else None
+                )
+                results.append(dict(data, status_code=code))
+            return Response({'results': results}, status=status.HTTP_200_OK)
+
+        except Exception as e:
+            logger.error(f"Unexpected error in face recognition batch: {e}")
+            return Response({"error": "Internal server error"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class AttendanceStatsView(AsyncAPIView):
+    @schema_of(views.attendance_stats.cls.get)
+    async def get(self, request):
+        today = timezone.localdate()
+        regions = [region async for region in Region.objects.filter(is_active=True)]
+        employees = {
+            row['region']: row['count']
+            async for row in Employee.objects.filter(is_active=True).order_by().values('region').annotate(count=Count('id'))
+        }
+        records = {
+            (row['region'], row['status']): row['count']
+            async for row in AttendanceRecord.objects.filter(date=today, status__in=['come', 'latecomers'])
+            .order_by().values('region', 'status').annotate(count=Count('id'))
+        }
+
+        stats = []
+        for region in regions:
+            total_employees = employees.get(region.pk, 0)
+            arrivals = records.get((region.pk, 'come'), 0)
+            latecomers = records.get((region.pk, 'latecomers'), 0)
+            stats.append({
+                'region': region.label or region.get_name_display(),
+                'total_employees': total_employees,
+                'arrivals': arrivals,
+                'latecomers': latecomers,
+                'absentees': total_employees - arrivals - latecomers,
+                'attendance_rate': round(arrivals / total_employees * 100, 2) if total_employees > 0 else 0,
+            })
+        return Response(AttendanceStatsSerializer(stats, many=True).data)
+
+
+class DashboardView(AsyncAPIView):
+    @schema_of(views.dashboard_data.cls.get)
+    async def get(self, request):
+        today = timezone.localdate()
+        today_counts = await AttendanceRecord.objects.filter(date=today).aaggregate(
+            total=Count('id'),
+            arrivals=Count('id', filter=Q(status='come')),
+            latecomers=Count('id', filter=Q(status='latecomers')),
+        )
+        recent_unknown = [
+            face async for face in UnknownFace.objects.select_related(
+                'camera', 'region', 'linked_employee'
+            ).filter(is_processed=False).order_by('-recorded_at')[:5]
+        ]
+        recent_attendance = [
+            record async for record in AttendanceRecord.objects.select_related(
+                'employee', 'camera', 'region'
+            ).order_by('-recorded_at')[:10]
+        ]
+
+        return Response({
+            'overview': {
+                'total_employees': await Employee.objects.filter(is_active=True).acount(),
+                'total_regions': await Region.objects.filter(is_active=True).acount(),
+                'total_cameras': await Camera.objects.filter(status='active').acount(),
+                'today_attendance': today_counts['total'],
+                'today_arrivals': today_counts['arrivals'],
+                'today_latecomers': today_counts['latecomers'],
+            },
+            'recent_unknown_faces': UnknownFaceSerializer(recent_unknown, many=True).data,
+            'recent_attendance': AttendanceRecordSerializer(recent_attendance, many=True).data,
+        })
+
+
+attendance_stats = AttendanceStatsView.as_view()
+dashboard_data = DashboardView.as_view()
+
+
+class EventStreamView(AsyncAPIView):
+    """Server-Sent Events of new attendance records and unknown faces, served on the event loop."""
+    renderer_classes = views.EventStreamView.renderer_classes
+
+    @schema_of(views.EventStreamView.get)
+    async def get(self, request):
+        try:
+            region_id, filial_id = views.event_stream_filters(request.query_params)
+        except ValueError:
+            return Response({'error': "'region' and 'filial' must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(event_stream(region_id, filial_id), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Tell nginx not to buffer the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
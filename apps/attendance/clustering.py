@@ -0,0 +1,150 @@
+"""
+Incremental clustering of unknown face sightings.
+
+Each run assigns faces without a cluster to the closest open cluster whose
+centroid lies within ``UNKNOWN_FACE_CLUSTER_DISTANCE`` (cosine distance),
+or starts a new cluster (greedy leader clustering). Centroids are running
+means of unit vectors, so a run only touches new sightings and the current
+centroids.
+"""
+import logging
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .models import Image, UnknownFace, UnknownFaceCluster
+from .tasks import enqueue_face_encoding
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def cluster_unknown_faces(threshold=None, batch_size=1000):
+    """Assign every unclustered unknown face to a cluster. Returns a summary dict."""
+    if threshold is None:
+        threshold = settings.UNKNOWN_FACE_CLUSTER_DISTANCE
+    min_similarity = 1.0 - threshold
+
+    faces = [
+        face for face in UnknownFace.objects.filter(
+            cluster__isnull=True, face_encoding__isnull=False
+        ).order_by('recorded_at').only('id', 'region_id', 'recorded_at', 'face_encoding')
+        if face.face_encoding
+    ]
+    if not faces:
+        return {'faces': 0, 'new_clusters': 0, 'updated_clusters': 0}
+
+    dimension = len(faces[0].face_encoding)
+    faces = [face for face in faces if len(face.face_encoding) == dimension]
+    vectors = _normalize(np.asarray([face.face_encoding for face in faces], dtype=np.float32))
+
+    clusters = [
+        cluster for cluster in UnknownFaceCluster.objects.filter(is_processed=False, centroid__isnull=False)
+        if len(cluster.centroid) == dimension
+    ]
+    if clusters:
+        existing = _normalize(np.asarray([cluster.centroid for cluster in clusters], dtype=np.float32))
+        # One matrix product scores every new face against every open cluster.
+        existing_scores = vectors @ existing.T
+    else:
+        existing_scores = np.empty((len(faces), 0), dtype=np.float32)
+
+    new_sums = np.zeros_like(vectors)
+    new_centroids = np.zeros_like(vectors)
+    new_count = 0
+    existing_members = {}
+    new_members = []
+
+    for index, vector in enumerate(vectors):
+        best_score, target = -1.0, None
+        if clusters:
+            position = int(np.argmax(existing_scores[index]))
+            best_score, target = float(existing_scores[index, position]), ('existing', position)
+        if new_count:
+            scores = new_centroids[:new_count] @ vector
+            position = int(np.argmax(scores))
+            if scores[position] > best_score:
+                best_score, target = float(scores[position]), ('new', position)
+
+        if target is not None and best_score >= min_similarity:
+            kind, position = target
+            if kind == 'existing':
+                existing_members.setdefault(position, []).append(index)
+            else:
+                new_members[position].append(index)
+                new_sums[position] += vector
+                new_centroids[position] = _normalize(new_sums[position])
+        else:
+            new_sums[new_count] = vector
+            new_centroids[new_count] = vector
+            new_members.append([index])
+            new_count += 1
+
+    with transaction.atomic():
+        updated = []
+        for position, members in existing_members.items():
+            cluster = clusters[position]
+            total = existing[position] * cluster.size + vectors[members].sum(axis=0)
+            cluster.centroid = _normalize(total).tolist()
+            cluster.size += len(members)
+            latest = faces[members[-1]].recorded_at
+            cluster.last_seen = max(cluster.last_seen, latest) if cluster.last_seen else latest
+            for index in members:
+                faces[index].cluster = cluster
+            updated.append(cluster)
+        UnknownFaceCluster.objects.bulk_update(updated, ['centroid', 'size', 'last_seen'], batch_size=batch_size)
+
+        created = UnknownFaceCluster.objects.bulk_create([
+            UnknownFaceCluster(
+                region_id=faces[members[0]].region_id,
+                representative=faces[members[0]],
+                centroid=new_centroids[position].tolist(),
+                size=len(members),
+                first_seen=faces[members[0]].recorded_at,
+                last_seen=faces[members[-1]].recorded_at,
+            )
+            for position, members in enumerate(new_members)
+        ], batch_size=batch_size)
+        for cluster, members in zip(created, new_members):
+            for index in members:
+                faces[index].cluster = cluster
+
+        UnknownFace.objects.bulk_update(faces, ['cluster'], batch_size=batch_size)
+
+    summary = {'faces': len(faces), 'new_clusters': len(created), 'updated_clusters': len(updated)}
+    logger.info(f"Clustered unknown faces: {summary}")
+    return summary
+
+
+def link_cluster(cluster, employee):
+    """
+    Link every sighting of ``cluster`` to ``employee`` and create their
+    ``Image`` rows in bulk. Returns the created images.
+    """
+    with transaction.atomic():
+        faces = list(
+            cluster.faces.filter(is_processed=False).exclude(face_image='')
+            .only('id', 'cluster_id', 'camera_id', 'face_image', 'face_encoding')
+        )
+        # Faces already linked one by one keep their employee
+        cluster.faces.filter(is_processed=False).update(linked_employee=employee, is_processed=True)
+        images = Image.objects.bulk_create([
+            Image(
+                employee=employee,
+                camera_id=face.camera_id,
+                image=face.face_image.name,
+                face_encoding=face.face_encoding,
+            )
+            for face in faces
+        ])
+        cluster.linked_employee = employee
+        cluster.is_processed = True
+        cluster.save(update_fields=['linked_employee', 'is_processed', 'updated_at'])
+        enqueue_face_encoding(image.pk for image in images)
+    logger.info(f"Unknown face cluster {cluster.pk} linked to employee {employee.pk} ({len(images)} images)")
+    return images
@@ -0,0 +1,236 @@
+"""
+Debounce repeated recognitions of the same employee on the same camera.
+
+A person standing in front of a camera is recognized many times per
+second. Sightings of one (employee, camera) pair are collected into a
+window of ``RECOGNITION_DEBOUNCE_WINDOW`` seconds that starts with the
+first sighting. Only the best frame (highest cosine similarity), the first
+and last sighting times and the count are kept, and a single consolidated
+write is made through ``ingest.record_recognition`` when the window closes.
+
+Windows live in process memory (``local`` backend) or in Redis (``redis``
+backend, shared by all workers). Expired windows are closed by the next
+sighting of the same pair, by a background sweeper thread (local) or by
+the ``flush_recognition_windows`` Celery beat task (redis).
+"""
+import atexit
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .ingest import record_recognition
+
+logger = logging.getLogger(__name__)
+
+
+def _score(distance):
+    try:
+        return float(distance)
+    except (TypeError, ValueError):
+        return -1e9
+
+
+class LocalDebounceBackend:
+    """Windows kept in a dict; each worker process debounces its own requests."""
+
+    def __init__(self):
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def observe(self, key, now, window_seconds, event, image):
+        """Add a sighting and return the windows that closed because of it."""
+        closed = []
+        with self._lock:
+            current = self._windows.get(key)
+            if current and now - current[0]['first_at'] >= window_seconds:
+                closed.append(self._windows.pop(key))
+                current = None
+            if current is None:
+                self._windows[key] = (dict(event, first_at=now, last_at=now, count=1), image)
+            else:
+                window, best_image = current
+                window['last_at'] = now
+                window['count'] += 1
+                if _score(event['distance']) > _score(window['distance']):
+                    window.update(event)
+                    best_image = image
+                self._windows[key] = (window, best_image)
+        return closed
+
+    def pop_expired(self, now, window_seconds):
+        with self._lock:
+            expired = [key for key, (window, _) in self._windows.items() if now - window['first_at'] >= window_seconds]
+            return [self._windows.pop(key) for key in expired]
+
+    def pop_all(self):
+        with self._lock:
+            windows = list(self._windows.values())
+            self._windows.clear()
+        return windows
+
+
+class RedisDebounceBackend:
+    """Windows kept in Redis hashes so every worker shares them."""
+
+    PREFIX = 'recognition:window:'
+    OPEN_KEY = 'recognition:open'
+
+    OBSERVE_SCRIPT = """
+    local now = tonumber(ARGV[1])
+    local window_seconds = tonumber(ARGV[2])
+    local closed = false
+    local first = redis.call('HGET', KEYS[1], 'first_at')
+    if first and now - tonumber(first) >= window_seconds then
+        closed = {redis.call('HGETALL', KEYS[1]), redis.call('GET', KEYS[2])}
+        redis.call('DEL', KEYS[1], KEYS[2])
+        first = false
+    end
+    if not first then
+        redis.call('HSET', KEYS[1], 'first_at', ARGV[1], 'last_at', ARGV[1], 'count', 1,
+                   'score', ARGV[3], 'event', ARGV[4])
+        redis.call('SET', KEYS[2], ARGV[5])
+        redis.call('ZADD', KEYS[3], now + window_seconds, ARGV[6])
+    else
+        redis.call('HSET', KEYS[1], 'last_at', ARGV[1])
+        redis.call('HINCRBY', KEYS[1], 'count', 1)
+        if tonumber(ARGV[3]) > tonumber(redis.call('HGET', KEYS[1], 'score')) then
+            redis.call('HSET', KEYS[1], 'score', ARGV[3], 'event', ARGV[4])
+            redis.call('SET', KEYS[2], ARGV[5])
+        end
+    end
+    redis.call('EXPIRE', KEYS[1], window_seconds * 10 + 60)
+    redis.call('EXPIRE', KEYS[2], window_seconds * 10 + 60)
+    return closed
+    """
+
+    CLAIM_SCRIPT = """
+    redis.call('ZREM', KEYS[3], ARGV[1])
+    if redis.call('EXISTS', KEYS[1]) == 0 then
+        return false
+    end
+    local result = {redis.call('HGETALL', KEYS[1]), redis.call('GET', KEYS[2])}
+    redis.call('DEL', KEYS[1], KEYS[2])
+    return result
+    """
+
+    def __init__(self, url=None):
+        import redis
+        self.client = redis.Redis.from_url(url or settings.REDIS_URL)
+        self._observe = self.client.register_script(self.OBSERVE_SCRIPT)
+        self._claim = self.client.register_script(self.CLAIM_SCRIPT)
+
+    def _keys(self, member):
+        return [f'{self.PREFIX}{member}', f'{self.PREFIX}{member}:image', self.OPEN_KEY]
+
+    @staticmethod
+    def _member(key):
+        return ':'.join(str(part) for part in key)
+
+    @staticmethod
+    def _decode(result):
+        fields, image = result
+        data = {fields[i].decode(): fields[i + 1].decode() for i in range(0, len(fields), 2)}
+        window = json.loads(data['event'])
+        window.update(
+            first_at=float(data['first_at']),
+            last_at=float(data['last_at']),
+            count=int(data['count']),
+        )
+        return window, image
+
+    def observe(self, key, now, window_seconds, event, image):
+        member = self._member(key)
+        result = self._observe(
+            keys=self._keys(member),
+            args=[now, window_seconds, _score(event['distance']), json.dumps(event), image, member],
+        )
+        return [self._decode(result)] if result else []
+
+    def pop_expired(self, now, window_seconds):
+        closed = []
+        for member in self.client.zrangebyscore(self.OPEN_KEY, '-inf', now):
+            member = member.decode()
+            result = self._claim(keys=self._keys(member), args=[member])
+            if result:
+                closed.append(self._decode(result))
+        return closed
+
+    def pop_all(self):
+        return self.pop_expired(float('inf'), 0)
+
+
+class RecognitionDebouncer:
+    def __init__(self, backend, window_seconds):
+        self.backend = backend
+        self.window_seconds = window_seconds
+        self._sweeper = None
+        self._sweeper_lock = threading.Lock()
+
+    def submit(self, event, image):
+        """
+        Register a sighting. ``event`` must contain ``employee_id``,
+        ``camera_id``, ``region_id``, ``filial_id``, ``distance``, ``file_name`` and
+        ``timestamp``; ``image`` is the frame's bytes.
+        """
+        now = time.time()
+        if self.window_seconds <= 0:
+            self.flush([(dict(event, first_at=now, last_at=now, count=1), image)])
+            return
+        key = (event['employee_id'], event['camera_id'])
+        self.flush(self.backend.observe(key, now, self.window_seconds, event, image))
+        if isinstance(self.backend, LocalDebounceBackend):
+            self._start_sweeper()
+
+    def flush(self, windows):
+        for window, image in windows:
+            try:
+                record_recognition(window, image)
+            except Exception as e:
+                logger.error(f"Error recording recognition window for employee {window.get('employee_id')}: {e}")
+
+    def flush_expired(self):
+        windows = self.backend.pop_expired(time.time(), self.window_seconds)
+        self.flush(windows)
+        return len(windows)
+
+    def flush_all(self):
+        windows = self.backend.pop_all()
+        self.flush(windows)
+        return len(windows)
+
+    def _start_sweeper(self):
+        with self._sweeper_lock:
+            if self._sweeper is not None:
+                return
+            self._sweeper = threading.Thread(target=self._sweep, name='recognition-debounce', daemon=True)
+            self._sweeper.start()
+        atexit.register(self.flush_all)
+
+    def _sweep(self):
+        while True:
+            time.sleep(1)
+            try:
+                if self.flush_expired():
+                    close_old_connections()
+            except Exception as e:
+                logger.error(f"Recognition debounce sweeper failed: {e}")
+
+
+_debouncer = None
+_debouncer_lock = threading.Lock()
+
+
+def get_debouncer():
+    global _debouncer
+    with _debouncer_lock:
+        if _debouncer is None:
+            if settings.RECOGNITION_DEBOUNCE_BACKEND == 'redis':
+                backend = RedisDebounceBackend()
+            else:
+                backend = LocalDebounceBackend()
+            _debouncer = RecognitionDebouncer(backend, settings.RECOGNITION_DEBOUNCE_WINDOW)
+    return _debouncer
@@ -0,0 +1,240 @@
+"""
+Per-device API keys with HMAC request signing.
+
+Every camera or terminal gets a ``DeviceKey``: a public ``key_id`` and a
+shared ``secret``. A device signs each request with three headers:
+
+    X-Device-Key:        key_id
+    X-Device-Timestamp:  unix time in seconds
+    X-Device-Signature:  hex HMAC-SHA256(secret, string to sign)
+
+The string to sign is the method, the full path with its query string, the
+timestamp and the SHA-256 hex digest of the body, joined by newlines (see
+``sign_request``). Requests whose timestamp is more than
+``DEVICE_SIGNATURE_MAX_SKEW`` seconds off are rejected, and so is a
+signature that was already used inside that window. The body is hashed as
+it is read and spooled to a temporary file for the parsers, so a large
+upload is not held in memory whole.
+
+Keys are read from a per-process map and the shared cache, so a warm worker
+verifies a request without a database query. Saving or deleting a key
+drops it from both (see ``signals.py``). Each authenticated request is also
+counted per key and per minute in the shared cache (``record_usage``) and
+counts as a heartbeat of the device.
+"""
+import hashlib
+import hmac
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication
+
+from .heartbeats import get_heartbeat_recorder
+from .models import DeviceKey
+
+KEY_HEADER = 'X-Device-Key'
+TIMESTAMP_HEADER = 'X-Device-Timestamp'
+SIGNATURE_HEADER = 'X-Device-Signature'
+
+CACHE_PREFIX = 'device-key:'
+NONCE_PREFIX = 'device-signature:'
+USAGE_PREFIX = 'device-usage:'
+USAGE_TTL = 2 * 60 * 60
+BODY_CHUNK_SIZE = 64 * 1024
+
+
+def string_to_sign(method, path, timestamp, body_digest):
+    return '\n'.join([method.upper(), path, str(timestamp), body_digest])
+
+
+def sign_request(key_id, secret, method, path, body=b'', timestamp=None):
+    """Headers that authenticate one request as the device owning ``key_id``."""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    signature = hmac.new(
+        secret.encode(),
+        string_to_sign(method, path, timestamp, hashlib.sha256(body).hexdigest()).encode(),
+        hashlib.sha256,
+    ).hexdigest()
+    return {KEY_HEADER: key_id, TIMESTAMP_HEADER: str(timestamp), SIGNATURE_HEADER: signature}
+
+
+class DevicePrincipal:
+    """``request.user`` of a request signed with a device key."""
+
+    is_authenticated = True
+    is_anonymous = False
+    is_active = True
+    is_staff = False
+    is_superuser = False
+
+    def __init__(self, key):
+        self.key_id = key['key_id']
+        self.kind = key['kind']
+        self.device_id = key['device_id']
+        self.username = f'{self.kind}:{self.device_id}'
+
+    @property
+    def camera_id(self):
+        return self.device_id if self.kind == 'camera' else None
+
+    @property
+    def terminal_id(self):
+        return self.device_id if self.kind == 'terminal' else None
+
+    def __str__(self):
+        return self.username
+
+
+def _key_entry(device_key):
+    kind, device_id = device_key.device
+    return {'key_id': device_key.key_id, 'secret': device_key.secret, 'kind': kind, 'device_id': device_id}
+
+
+class DeviceKeyStore:
+    """Active keys as ``{key_id, secret, kind, device_id}`` dicts."""
+
+    def __init__(self):
+        self._keys = {}
+        self._lock = threading.Lock()
+
+    def get(self, key_id):
+        entry = self._keys.get(key_id)
+        if entry and entry[1] > time.monotonic():
+            return entry[0]
+        key = cache.get(f'{CACHE_PREFIX}{key_id}')
+        if key is None:
+            device_key = DeviceKey.objects.filter(key_id=key_id, is_active=True).first()
+            if device_key is None:
+                return None
+            key = _key_entry(device_key)
+            cache.set(f'{CACHE_PREFIX}{key_id}', key, settings.DEVICE_KEY_CACHE_TTL)
+        with self._lock:
+            self._keys[key_id] = (key, time.monotonic() + settings.DEVICE_KEY_LOCAL_TTL)
+        return key
+
+    def warm(self):
+        """Load every active key with one query, for a worker that just started."""
+        keys = {device_key.key_id: _key_entry(device_key) for device_key in DeviceKey.objects.filter(is_active=True)}
+        cache.set_many({f'{CACHE_PREFIX}{key_id}': key for key_id, key in keys.items()}, settings.DEVICE_KEY_CACHE_TTL)
+        expires_at = time.monotonic() + settings.DEVICE_KEY_LOCAL_TTL
+        with self._lock:
+            self._keys.update({key_id: (key, expires_at) for key_id, key in keys.items()})
+        return len(keys)
+
+    def invalidate(self, key_id):
+        with self._lock:
+            self._keys.pop(key_id, None)
+        cache.delete(f'{CACHE_PREFIX}{key_id}')
+
+
+key_store = DeviceKeyStore()
+
+
+def _incr(key, delta):
+    if cache.add(key, delta, USAGE_TTL):
+        return
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # Expired between add and incr
+        cache.set(key, delta, USAGE_TTL)
+
+
+def record_usage(key_id, nbytes, now=None):
+    now = time.time() if now is None else now
+    minute = int(now // 60)
+    _incr(f'{USAGE_PREFIX}{key_id}:{minute}:requests', 1)
+    _incr(f'{USAGE_PREFIX}{key_id}:{minute}:bytes', nbytes)
+    cache.set(f'{USAGE_PREFIX}{key_id}:last_seen', now, USAGE_TTL)
+
+
+def usage(key_ids, minutes=60, now=None):
+    """
+    ``{key_id: {'requests_last_minute', 'requests', 'bytes', 'last_seen'}}``
+    where ``requests`` and ``bytes`` cover the last ``minutes`` minutes.
+    """
+    now = time.time() if now is None else now
+    current = int(now // 60)
+    keys = []
+    for key_id in key_ids:
+        keys.append(f'{USAGE_PREFIX}{key_id}:last_seen')
+        for minute in range(current - minutes + 1, current + 1):
+            keys.append(f'{USAGE_PREFIX}{key_id}:{minute}:requests')
+            keys.append(f'{USAGE_PREFIX}{key_id}:{minute}:bytes')
+    values = cache.get_many(keys)
+    result = {}
+    for key_id in key_ids:
+        prefix = f'{USAGE_PREFIX}{key_id}:'
+        result[key_id] = {
+            'requests_last_minute': values.get(f'{prefix}{current}:requests', 0),
+            'requests': sum(values.get(f'{prefix}{m}:requests', 0) for m in range(current - minutes + 1, current + 1)),
+            'bytes': sum(values.get(f'{prefix}{m}:bytes', 0) for m in range(current - minutes + 1, current + 1)),
+            'last_seen': values.get(f'{prefix}last_seen'),
+        }
+    return result
+
+
+def read_body_digest(request):
+    """
+    ``(sha256 hex digest, size)`` of the body of a Django request. The body
+    is read in chunks into a file that stays in memory up to
+    FILE_UPLOAD_MAX_MEMORY_SIZE and is handed back to the request for the
+    parsers to read.
+    """
+    if hasattr(request, '_body'):
+        return hashlib.sha256(request._body).hexdigest(), len(request._body)
+    digest = hashlib.sha256()
+    spool = tempfile.SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+    size = 0
+    while chunk := request.read(BODY_CHUNK_SIZE):
+        digest.update(chunk)
+        spool.write(chunk)
+        size += len(chunk)
+    spool.seek(0)
+    request._stream = spool
+    request._read_started = False
+    return digest.hexdigest(), size
+
+
+class DeviceSignatureAuthentication(BaseAuthentication):
+    """Authenticate requests signed with a ``DeviceKey``; others fall through."""
+
+    def authenticate(self, request):
+        key_id = request.headers.get(KEY_HEADER)
+        if not key_id:
+            return None
+        timestamp = request.headers.get(TIMESTAMP_HEADER, '')
+        signature = request.headers.get(SIGNATURE_HEADER, '')
+
+        try:
+            skew = abs(time.time() - int(timestamp))
+        except ValueError:
+            raise exceptions.AuthenticationFailed('Invalid device timestamp.')
+        if skew > settings.DEVICE_SIGNATURE_MAX_SKEW:
+            raise exceptions.AuthenticationFailed('Device timestamp outside the allowed window.')
+
+        key = key_store.get(key_id)
+        if key is None:
+            raise exceptions.AuthenticationFailed('Invalid device key.')
+
+        body_digest, size = read_body_digest(request._request)
+        expected = hmac.new(
+            key['secret'].encode(),
+            string_to_sign(request.method, request.get_full_path(), timestamp, body_digest).encode(),
+            hashlib.sha256,
+        ).hexdigest()
+        if not hmac.compare_digest(expected, signature):
+            raise exceptions.AuthenticationFailed('Invalid device signature.')
+        if not cache.add(f'{NONCE_PREFIX}{signature}', 1, settings.DEVICE_SIGNATURE_MAX_SKEW * 2):
+            raise exceptions.AuthenticationFailed('Replayed device request.')
+
+        record_usage(key_id, size)
+        get_heartbeat_recorder().ping(key['kind'], key['device_id'])
+        return DevicePrincipal(key), key
+
+    def authenticate_header(self, request):
+        return 'HMAC-SHA256'
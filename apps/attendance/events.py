@@ -0,0 +1,182 @@
+"""
+Live attendance events for dashboards.
+
+Ingestion publishes one compact event per new attendance record and per
+unknown face with ``publish_event``. Events go through Redis pub/sub
+(``EVENT_STREAM_BACKEND = 'redis'``, shared by all workers) or an
+in-process broadcaster (``'local'``, one process only). The async
+``EventStreamView`` (ASGI deployments) relays them to each connected
+dashboard as Server-Sent Events, keeping only the events of the requested
+region/filial. A viewer costs a queue on the worker's event loop, not a
+thread or a worker. Each worker holds a single Redis subscription for all
+of its viewers.
+
+Django 4.2 does not notice when an ASGI client goes away in the middle of a
+stream, so a stream ends after ``EVENT_STREAM_MAX_AGE`` seconds and the
+browser's ``EventSource`` reconnects.
+"""
+import asyncio
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework.utils.encoders import JSONEncoder
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'attendance:events'
+
+
+class Subscribers:
+    """Queues of the listeners in this process, fed from any thread."""
+
+    def __init__(self, max_queue=1000):
+        self._lock = threading.Lock()
+        self._queues = set()
+        self._max_queue = max_queue
+
+    def __len__(self):
+        return len(self._queues)
+
+    def add(self):
+        """A new queue on the running event loop; ``discard`` it when done."""
+        entry = (asyncio.get_running_loop(), asyncio.Queue(maxsize=self._max_queue))
+        with self._lock:
+            self._queues.add(entry)
+        return entry
+
+    def discard(self, entry):
+        with self._lock:
+            self._queues.discard(entry)
+
+    def put(self, message):
+        with self._lock:
+            queues = list(self._queues)
+        for loop, subscriber in queues:
+            try:
+                loop.call_soon_threadsafe(self._put, subscriber, message)
+            except RuntimeError:
+                # The listener's loop has closed
+                pass
+
+    @staticmethod
+    def _put(subscriber, message):
+        try:
+            subscriber.put_nowait(message)
+        except asyncio.QueueFull:
+            # A stalled client loses events instead of growing memory
+            pass
+
+
+class LocalEventBroker:
+    """Fan-out to the listeners of this process."""
+
+    def __init__(self, max_queue=1000):
+        self.subscribers = Subscribers(max_queue)
+
+    def publish(self, message):
+        self.subscribers.put(message)
+
+    def subscribe(self):
+        return self.subscribers.add()
+
+    def unsubscribe(self, entry):
+        self.subscribers.discard(entry)
+
+
+class RedisEventBroker:
+    """Redis pub/sub; one subscription per process, fanned out to its listeners."""
+
+    def __init__(self, url=None, max_queue=1000):
+        import redis
+        self.url = url or settings.REDIS_URL
+        self.client = redis.Redis.from_url(self.url)
+        self.subscribers = Subscribers(max_queue)
+        self._reader = None
+
+    def publish(self, message):
+        self.client.publish(CHANNEL, message)
+
+    def subscribe(self):
+        loop = asyncio.get_running_loop()
+        if self._reader is None or self._reader.done() or self._reader.get_loop() is not loop:
+            self._reader = loop.create_task(self._read())
+        return self.subscribers.add()
+
+    def unsubscribe(self, entry):
+        self.subscribers.discard(entry)
+
+    async def _read(self):
+        import redis.asyncio
+        while True:
+            client = redis.asyncio.Redis.from_url(self.url)
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(CHANNEL)
+                async for message in pubsub.listen():
+                    if message['type'] == 'message':
+                        self.subscribers.put(message['data'].decode())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Event subscription failed, retrying: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+                await client.aclose()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_event_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            if settings.EVENT_STREAM_BACKEND == 'redis':
+                _broker = RedisEventBroker()
+            else:
+                _broker = LocalEventBroker()
+    return _broker
+
+
+def publish_event(event_type, **payload):
+    """Publish an event once the current transaction commits."""
+    message = json.dumps(dict(payload, type=event_type), cls=JSONEncoder)
+
+    def send():
+        try:
+            get_event_broker().publish(message)
+        except Exception as e:
+            logger.warning(f"Could not publish {event_type} event: {e}")
+
+    transaction.on_commit(send)
+
+
+async def event_stream(region_id=None, filial_id=None, keepalive=None, max_age=None):
+    """Yield SSE frames of the events matching ``region_id``/``filial_id``."""
+    keepalive = keepalive or settings.EVENT_STREAM_KEEPALIVE
+    max_age = max_age or settings.EVENT_STREAM_MAX_AGE
+    loop = asyncio.get_running_loop()
+    ends_at = loop.time() + max_age
+    broker = get_event_broker()
+    entry = broker.subscribe()
+    try:
+        yield 'retry: 5000\n\n'
+        while (remaining := ends_at - loop.time()) > 0:
+            try:
+                message = await asyncio.wait_for(entry[1].get(), min(keepalive, remaining))
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            event = json.loads(message)
+            if region_id is not None and event.get('region_id') != region_id:
+                continue
+            if filial_id is not None and event.get('filial_id') != filial_id:
+                continue
+            yield f"event: {event['type']}\ndata: {message}\n\n"
+    finally:
+        broker.unsubscribe(entry)
@@ -0,0 +1,183 @@
+"""
+Face encoding pipeline for employee images.
+
+Images without an encoding are decoded, detected and encoded in batches by
+a process pool (CPU only). The encoder class is configured with
+``settings.FACE_ENCODER``; ``StubFaceEncoder`` is a deterministic,
+dependency-free encoder for tests and development.
+"""
+import importlib.util
+import io
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.module_loading import import_string
+from PIL import Image as PILImage
+
+from .face_index import get_face_index
+from .models import Image, UnknownFace
+
+logger = logging.getLogger(__name__)
+
+
+class FaceEncoderUnavailable(RuntimeError):
+    """The configured encoder cannot run here (e.g. its package is not installed)."""
+
+
+class BaseFaceEncoder:
+    """Turn the bytes of an image into a face encoding, or ``None`` when no face is found."""
+
+    @classmethod
+    def check(cls):
+        """Raise ``FaceEncoderUnavailable`` if the encoder cannot be created."""
+
+    def encode(self, data):
+        raise NotImplementedError
+
+
+class FaceRecognitionEncoder(BaseFaceEncoder):
+    """Encoder backed by the ``face_recognition`` package (HOG detector, CPU only)."""
+
+    @classmethod
+    def check(cls):
+        if importlib.util.find_spec('face_recognition') is None:
+            raise FaceEncoderUnavailable(
+                "face_recognition is not installed; install it or set FACE_ENCODER"
+            )
+
+    def __init__(self):
+        self.check()
+        import face_recognition
+        self.face_recognition = face_recognition
+
+    def encode(self, data):
+        image = self.face_recognition.load_image_file(io.BytesIO(data))
+        locations = self.face_recognition.face_locations(image, model='hog')
+        if not locations:
+            return None
+        # Use the largest face in the frame.
+        largest = max(locations, key=lambda box: (box[2] - box[0]) * (box[1] - box[3]))
+        encodings = self.face_recognition.face_encodings(
+            image, [largest], model=settings.FACE_RECOGNITION_MODEL
+        )
+        return encodings[0].tolist() if encodings else None
+
+
+class StubFaceEncoder(BaseFaceEncoder):
+    """Deterministic 128-value encoding made from a 16x8 grayscale thumbnail."""
+
+    def encode(self, data):
+        image = PILImage.open(io.BytesIO(data)).convert('L').resize((16, 8))
+        values = [pixel / 255.0 for pixel in image.getdata()]
+        norm = sum(value * value for value in values) ** 0.5 or 1.0
+        return [value / norm for value in values]
+
+
+def get_encoder(path=None):
+    return import_string(path or settings.FACE_ENCODER)()
+
+
+_worker_encoder = None
+
+
+def _init_worker(encoder_path):
+    global _worker_encoder
+    _worker_encoder = get_encoder(encoder_path)
+
+
+def _encode_batch(batch):
+    """Encode ``(image_id, path)`` pairs inside a worker process."""
+    results = []
+    for image_id, path in batch:
+        try:
+            with open(path, 'rb') as f:
+                encoding = _worker_encoder.encode(f.read())
+            # An empty list marks images that were processed but had no face.
+            results.append((image_id, encoding or []))
+        except Exception as e:
+            logger.error(f"Could not encode image {image_id}: {e}")
+            results.append((image_id, None))
+    return results
+
+
+def _run_batches(batches, workers, encoder_path):
+    if not batches:
+        return
+    # Fail here rather than in every pool process
+    import_string(encoder_path).check()
+    # Celery prefork workers are daemonic and may not start child processes.
+    if workers <= 1 or len(batches) <= 1 or multiprocessing.current_process().daemon:
+        _init_worker(encoder_path)
+        for batch in batches:
+            yield from _encode_batch(batch)
+        return
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(encoder_path,)
+    ) as executor:
+        for results in executor.map(_encode_batch, batches):
+            yield from results
+
+
+def _batches(jobs, batch_size):
+    return [jobs[start:start + batch_size] for start in range(0, len(jobs), batch_size)]
+
+
+def compute_image_encodings(image_ids=None, workers=None, batch_size=None, encoder_path=None):
+    """
+    Encode images that have no ``face_encoding`` yet and add every new
+    encoding to the matcher index. Images that already carry an encoding
+    but are missing from the index are only indexed. Returns the number of
+    images that got an encoding.
+    """
+    workers = workers or settings.FACE_ENCODING_WORKERS
+    batch_size = batch_size or settings.FACE_ENCODING_BATCH_SIZE
+    encoder_path = encoder_path or settings.FACE_ENCODER
+
+    queryset = Image.objects.filter(
+        Q(face_encoding__isnull=True) | Q(faiss_id__isnull=True)
+    ).exclude(face_encoding=[])
+    if image_ids is not None:
+        queryset = queryset.filter(pk__in=image_ids)
+    images = {image.pk: image for image in queryset.only('id', 'employee_id', 'image', 'face_encoding', 'faiss_id')}
+
+    jobs = [(image.pk, image.image.path) for image in images.values() if image.face_encoding is None and image.image]
+    encoded = 0
+    for image_id, encoding in _run_batches(_batches(jobs, batch_size), workers, encoder_path):
+        if encoding is not None:
+            images[image_id].face_encoding = encoding
+            encoded += 1
+
+    to_index = [image for image in images.values() if image.face_encoding and image.faiss_id is None]
+    positions = get_face_index().append([
+        (image.pk, image.employee_id, image.face_encoding) for image in to_index
+    ])
+    for image, position in zip(to_index, positions):
+        image.faiss_id = position
+
+    changed = [image for image in images.values() if image.face_encoding is not None]
+    Image.objects.bulk_update(changed, ['face_encoding', 'faiss_id'], batch_size=batch_size)
+    logger.info(f"Encoded {encoded} images, indexed {len(to_index)}")
+    return encoded
+
+
+def compute_unknown_face_encodings(workers=None, batch_size=None, encoder_path=None):
+    """Encode unknown faces that were stored without an encoding."""
+    workers = workers or settings.FACE_ENCODING_WORKERS
+    batch_size = batch_size or settings.FACE_ENCODING_BATCH_SIZE
+    encoder_path = encoder_path or settings.FACE_ENCODER
+
+    faces = {
+        face.pk: face
+        for face in UnknownFace.objects.filter(face_encoding__isnull=True).exclude(face_image='').only('id', 'face_image')
+    }
+    jobs = [(face.pk, face.face_image.path) for face in faces.values()]
+    changed = []
+    for face_id, encoding in _run_batches(_batches(jobs, batch_size), workers, encoder_path):
+        if encoding is not None:
+            faces[face_id].face_encoding = encoding
+            changed.append(faces[face_id])
+    UnknownFace.objects.bulk_update(changed, ['face_encoding'], batch_size=batch_size)
+    return len(changed)
@@ -0,0 +1,109 @@
+"""
+On-disk index of known face encodings used by the matcher.
+
+The index lives at ``settings.FACE_ENCODINGS_PATH`` as a pickle of NumPy
+arrays. Appends take an exclusive file lock so several workers can add
+encodings concurrently; readers reload the file only when it changed.
+"""
+import fcntl
+import os
+import pickle
+import threading
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+
+class FaceIndex:
+    def __init__(self, path=None):
+        self.path = Path(path or settings.FACE_ENCODINGS_PATH)
+        self.lock_path = self.path.with_suffix('.lock')
+        self.encodings = np.empty((0, 0), dtype=np.float32)
+        self.image_ids = np.empty(0, dtype=np.int64)
+        self.employee_ids = np.empty(0, dtype=np.int64)
+        self._normalized = None
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        self.load()
+        return len(self.image_ids)
+
+    def _read(self):
+        with open(self.path, 'rb') as f:
+            data = pickle.load(f)
+        self.encodings = data['encodings']
+        self.image_ids = data['image_ids']
+        self.employee_ids = data['employee_ids']
+        self._normalized = None
+
+    def load(self):
+        """Reload the index from disk if another process changed it."""
+        with self._lock:
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                return
+            if mtime != self._mtime:
+                self._read()
+                self._mtime = mtime
+
+    def append(self, entries):
+        """
+        Add ``(image_id, employee_id, encoding)`` entries and return the
+        position of each one in the index.
+        """
+        if not entries:
+            return []
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(self.lock_path, 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            if self.path.exists():
+                self._read()
+            new = np.asarray([encoding for _, _, encoding in entries], dtype=np.float32)
+            start = len(self.image_ids)
+            self.encodings = new if start == 0 else np.vstack([self.encodings, new])
+            self.image_ids = np.concatenate([self.image_ids, np.asarray([e[0] for e in entries], dtype=np.int64)])
+            self.employee_ids = np.concatenate([self.employee_ids, np.asarray([e[1] for e in entries], dtype=np.int64)])
+            self._normalized = None
+
+            tmp_path = self.path.with_suffix('.tmp')
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({
+                    'encodings': self.encodings,
+                    'image_ids': self.image_ids,
+                    'employee_ids': self.employee_ids,
+                }, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+            self._mtime = os.stat(self.path).st_mtime_ns
+        return list(range(start, start + len(entries)))
+
+    def search(self, encoding, k=1):
+        """Return up to ``k`` ``(employee_id, image_id, cosine_similarity)`` tuples, best first."""
+        self.load()
+        if not len(self.image_ids):
+            return []
+        if self._normalized is None:
+            norms = np.linalg.norm(self.encodings, axis=1, keepdims=True)
+            self._normalized = self.encodings / np.maximum(norms, 1e-12)
+        query = np.asarray(encoding, dtype=np.float32)
+        query = query / max(np.linalg.norm(query), 1e-12)
+        scores = self._normalized @ query
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [
+            (int(self.employee_ids[i]), int(self.image_ids[i]), float(scores[i]))
+            for i in best
+        ]
+
+
+_face_index = None
+
+
+def get_face_index():
+    global _face_index
+    if _face_index is None:
+        _face_index = FaceIndex()
+    return _face_index
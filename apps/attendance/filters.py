@@ -2,7 +2,7 @@ import django_filters
 from django.db import models
 from .models import (
     Employee, Region, Terminal, Camera, Admin, Image,
-    AttendanceRecord, UnknownFace, Filial
+    AttendanceRecord, PresenceInterval, UnknownFace, UnknownFaceCluster, Filial
 )
 
 class EmployeeFilter(django_filters.FilterSet):
@@ -42,22 +42,30 @@ class TerminalFilter(django_filters.FilterSet):
     region = django_filters.ModelChoiceFilter(queryset=Region.objects.filter(is_active=True))
     filial = django_filters.ModelChoiceFilter(queryset=Filial.objects.filter(is_active=True))
     location = django_filters.CharFilter(lookup_expr='icontains')
+    online = django_filters.BooleanFilter(method='filter_online')
 
     class Meta:
         model = Terminal
         fields = ['name', 'ip_address', 'status', 'region', 'filial', 'location']
 
+    def filter_online(self, queryset, name, value):
+        return queryset.online(value)
+
 class CameraFilter(django_filters.FilterSet):
     name = django_filters.CharFilter(lookup_expr='icontains')
     ip_address = django_filters.CharFilter(lookup_expr='icontains')
     status = django_filters.ChoiceFilter(choices=Camera._meta.get_field('status').choices)
     region = django_filters.ModelChoiceFilter(queryset=Region.objects.filter(is_active=True))
     location = django_filters.CharFilter(lookup_expr='icontains')
+    online = django_filters.BooleanFilter(method='filter_online')
 
     class Meta:
         model = Camera
         fields = ['name', 'ip_address', 'status', 'region', 'location']
 
+    def filter_online(self, queryset, name, value):
+        return queryset.online(value)
+
 class AdminFilter(django_filters.FilterSet):
     name = django_filters.CharFilter(lookup_expr='icontains')
     login = django_filters.CharFilter(lookup_expr='icontains')
@@ -95,16 +103,40 @@ class AttendanceRecordFilter(django_filters.FilterSet):
         model = AttendanceRecord
         fields = ['employee', 'camera', 'region', 'status', 'date']
 
+class PresenceIntervalFilter(django_filters.FilterSet):
+    employee = django_filters.ModelChoiceFilter(queryset=Employee.objects.filter(is_active=True))
+    region = django_filters.ModelChoiceFilter(queryset=Region.objects.filter(is_active=True))
+    date = django_filters.DateFilter()
+    date_from = django_filters.DateFilter(field_name='date', lookup_expr='gte')
+    date_to = django_filters.DateFilter(field_name='date', lookup_expr='lte')
+    is_open = django_filters.BooleanFilter(field_name='ended_at', lookup_expr='isnull')
+
+    class Meta:
+        model = PresenceInterval
+        fields = ['employee', 'region', 'date']
+
 class UnknownFaceFilter(django_filters.FilterSet):
     camera = django_filters.ModelChoiceFilter(queryset=Camera.objects.filter(status='active'))
     region = django_filters.ModelChoiceFilter(queryset=Region.objects.filter(is_active=True))
     is_processed = django_filters.BooleanFilter()
+    cluster = django_filters.NumberFilter(field_name='cluster_id')
     recorded_from = django_filters.DateTimeFilter(field_name='recorded_at', lookup_expr='gte')
     recorded_to = django_filters.DateTimeFilter(field_name='recorded_at', lookup_expr='lte')
 
     class Meta:
         model = UnknownFace
-        fields = ['camera', 'region', 'is_processed']
+        fields = ['camera', 'region', 'is_processed', 'cluster']
+
+class UnknownFaceClusterFilter(django_filters.FilterSet):
+    region = django_filters.ModelChoiceFilter(queryset=Region.objects.filter(is_active=True))
+    is_processed = django_filters.BooleanFilter()
+    min_size = django_filters.NumberFilter(field_name='size', lookup_expr='gte')
+    last_seen_from = django_filters.DateTimeFilter(field_name='last_seen', lookup_expr='gte')
+    last_seen_to = django_filters.DateTimeFilter(field_name='last_seen', lookup_expr='lte')
+
+    class Meta:
+        model = UnknownFaceCluster
+        fields = ['region', 'is_processed']
 
 class FilialFilter(django_filters.FilterSet):
     name = django_filters.CharFilter(lookup_expr='icontains')
@@ -0,0 +1,241 @@
+"""
+Heartbeats of cameras and terminals.
+
+Pings only touch memory (``local`` backend, per worker process) or Redis
+(``redis`` backend, shared; the default outside development). Every
+``HEARTBEAT_FLUSH_INTERVAL`` seconds the pings received since the last flush
+are written with one UPDATE per device table, by a background thread (local)
+or by the ``flush_heartbeats`` Celery beat task (redis). ``fleet_status``
+answers from the same map. The Redis map holds every worker's pings, so it
+is read from the database only when it is first seeded. A local map only
+sees its own worker's pings, so it is refreshed from ``last_ping`` at most
+once per flush interval and picks up what the other workers flushed.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Case, DateTimeField, Value, When
+
+from .models import Camera, Terminal
+
+logger = logging.getLogger(__name__)
+
+DEVICE_MODELS = {
+    'camera': Camera,
+    'terminal': Terminal,
+}
+
+
+def _member(kind, device_id):
+    return f'{kind}:{device_id}'
+
+
+def _split(member):
+    kind, device_id = member.split(':')
+    return kind, int(device_id)
+
+
+class LocalHeartbeatBackend:
+    """Pings kept in dicts of this process."""
+
+    shared = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last = {}
+        self._dirty = {}
+
+    def is_seeded(self):
+        return bool(self._last)
+
+    def seed(self, values):
+        """Add devices from the database, keeping pings newer than their ``last_ping``."""
+        with self._lock:
+            for member, value in values.items():
+                current = self._last.get(member)
+                if current is None or (value is not None and value > current):
+                    self._last[member] = value
+
+    def knows(self, member):
+        return member in self._last
+
+    def record(self, member, now):
+        with self._lock:
+            self._last[member] = now
+            self._dirty[member] = now
+
+    def pop_dirty(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        return dirty
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._last)
+
+
+class RedisHeartbeatBackend:
+    """Pings kept in Redis hashes shared by every worker."""
+
+    LAST_KEY = 'heartbeat:last'
+    DIRTY_KEY = 'heartbeat:dirty'
+    shared = True
+
+    def __init__(self, url=None):
+        import redis
+        self.client = redis.Redis.from_url(url or settings.REDIS_URL)
+
+    @staticmethod
+    def _decode(data):
+        return {
+            member.decode(): float(value) if value else None
+            for member, value in data.items()
+        }
+
+    def is_seeded(self):
+        return bool(self.client.exists(self.LAST_KEY))
+
+    def seed(self, values):
+        pipe = self.client.pipeline(transaction=False)
+        for member, value in values.items():
+            pipe.hsetnx(self.LAST_KEY, member, '' if value is None else value)
+        pipe.execute()
+
+    def knows(self, member):
+        return bool(self.client.hexists(self.LAST_KEY, member))
+
+    def record(self, member, now):
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hset(self.LAST_KEY, member, now)
+        pipe.hset(self.DIRTY_KEY, member, now)
+        pipe.execute()
+
+    def pop_dirty(self):
+        pipe = self.client.pipeline()
+        pipe.hgetall(self.DIRTY_KEY)
+        pipe.delete(self.DIRTY_KEY)
+        dirty, _ = pipe.execute()
+        return self._decode(dirty)
+
+    def snapshot(self):
+        return self._decode(self.client.hgetall(self.LAST_KEY))
+
+
+def load_devices():
+    """``{member: last_ping epoch or None}`` for every device in the database."""
+    values = {}
+    for kind, model in DEVICE_MODELS.items():
+        for device_id, last_ping in model.objects.values_list('pk', 'last_ping'):
+            values[_member(kind, device_id)] = last_ping.timestamp() if last_ping else None
+    return values
+
+
+class HeartbeatRecorder:
+    def __init__(self, backend, flush_interval):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self._flusher = None
+        self._flusher_lock = threading.Lock()
+        self._reloaded_at = 0.0
+
+    def _reload(self):
+        self._reloaded_at = time.monotonic()
+        self.backend.seed(load_devices())
+
+    def _ensure_seeded(self):
+        if not self.backend.is_seeded():
+            self._reload()
+        elif not self.backend.shared and time.monotonic() - self._reloaded_at >= self.flush_interval:
+            # Pings received by other workers reach this map through the database
+            self._reload()
+
+    def warm(self):
+        """Seed the device map now instead of on the first ping."""
+        self._ensure_seeded()
+
+    def ping(self, kind, device_id):
+        """Record a heartbeat. Returns ``False`` for unknown devices."""
+        self._ensure_seeded()
+        member = _member(kind, device_id)
+        if not self.backend.knows(member):
+            # The device may have been created after the map was seeded;
+            # reload at most once per flush interval.
+            if time.monotonic() - self._reloaded_at < self.flush_interval:
+                return False
+            self._reload()
+            if not self.backend.knows(member):
+                return False
+        self.backend.record(member, time.time())
+        if isinstance(self.backend, LocalHeartbeatBackend):
+            self._start_flusher()
+        return True
+
+    def flush(self):
+        """Write pending pings, one UPDATE per device table. Returns the number of devices."""
+        dirty = self.backend.pop_dirty()
+        by_kind = {}
+        for member, value in dirty.items():
+            kind, device_id = _split(member)
+            by_kind.setdefault(kind, {})[device_id] = datetime.fromtimestamp(value, tz=dt_timezone.utc)
+        for kind, pings in by_kind.items():
+            DEVICE_MODELS[kind].objects.filter(pk__in=list(pings)).update(
+                last_ping=Case(
+                    *[When(pk=device_id, then=Value(at)) for device_id, at in pings.items()],
+                    output_field=DateTimeField(),
+                )
+            )
+        return len(dirty)
+
+    def fleet_status(self):
+        self._ensure_seeded()
+        now = time.time()
+        threshold = settings.DEVICE_ONLINE_THRESHOLD
+        status = {kind: {'total': 0, 'online': 0, 'devices': []} for kind in DEVICE_MODELS}
+        for member, value in sorted(self.backend.snapshot().items()):
+            kind, device_id = _split(member)
+            is_online = value is not None and now - value < threshold
+            group = status[kind]
+            group['total'] += 1
+            group['online'] += is_online
+            group['devices'].append({
+                'id': device_id,
+                'last_ping': datetime.fromtimestamp(value, tz=dt_timezone.utc).isoformat() if value else None,
+                'is_online': is_online,
+            })
+        return status
+
+    def _start_flusher(self):
+        with self._flusher_lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._run_flusher, name='heartbeat-flush', daemon=True)
+            self._flusher.start()
+
+    def _run_flusher(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                if self.flush():
+                    close_old_connections()
+            except Exception as e:
+                logger.error(f"Heartbeat flush failed: {e}")
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_heartbeat_recorder():
+    global _recorder
+    with _recorder_lock:
+        if _recorder is None:
+            if settings.HEARTBEAT_BACKEND == 'redis':
+                backend = RedisHeartbeatBackend()
+            else:
+                backend = LocalHeartbeatBackend()
+            _recorder = HeartbeatRecorder(backend, settings.HEARTBEAT_FLUSH_INTERVAL)
+    return _recorder
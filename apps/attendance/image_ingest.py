@@ -0,0 +1,147 @@
+"""
+Normalization of face crops sent by recognizers.
+
+``FaceResultView`` hands the uploaded bytes to ``ImageIngestPool.submit``
+and returns. A pool thread strips metadata (applying the EXIF rotation
+first), caps the resolution at ``INGEST_IMAGE_MAX_SIZE`` and re-encodes
+to ``INGEST_IMAGE_FORMAT`` at ``INGEST_IMAGE_QUALITY`` before the crop is
+stored. At most ``INGEST_IMAGE_QUEUE_SIZE`` crops wait for the pool; when
+it is full the crop is stored unchanged by the caller, as before.
+
+Bytes received and stored are summed per day in ``ImageIngestStats``.
+"""
+import atexit
+import io
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image as PILImage, ImageOps
+
+from .models import ImageIngestStats
+
+logger = logging.getLogger(__name__)
+
+FORMAT_EXTENSIONS = {
+    'JPEG': '.jpg',
+    'WEBP': '.webp',
+}
+
+
+def normalize_image(data, name):
+    """Return ``(bytes, name)`` of the re-encoded image; the extension follows the format."""
+    image = PILImage.open(io.BytesIO(data))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    max_size = settings.INGEST_IMAGE_MAX_SIZE
+    image.thumbnail((max_size, max_size), PILImage.LANCZOS)
+
+    image_format = settings.INGEST_IMAGE_FORMAT.upper()
+    buffer = io.BytesIO()
+    # No exif/icc arguments: the encoded file carries no metadata
+    image.save(buffer, image_format, quality=settings.INGEST_IMAGE_QUALITY, optimize=True)
+    root, _ = os.path.splitext(name)
+    return buffer.getvalue(), f'{root}{FORMAT_EXTENSIONS[image_format]}'
+
+
+class StorageSavings:
+    """Per-day byte counters, written to the database at most once a minute."""
+
+    FLUSH_INTERVAL = 60
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._days = {}
+        self._flushed_at = time.monotonic()
+
+    def add(self, original, stored):
+        day = timezone.localdate()
+        with self._lock:
+            counters = self._days.setdefault(day, [0, 0, 0])
+            counters[0] += 1
+            counters[1] += original
+            counters[2] += stored
+
+    def flush_if_due(self):
+        if time.monotonic() - self._flushed_at >= self.FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            days, self._days = self._days, {}
+            self._flushed_at = time.monotonic()
+        for day, (images, original, stored) in days.items():
+            ImageIngestStats.objects.get_or_create(date=day)
+            ImageIngestStats.objects.filter(date=day).update(
+                images=F('images') + images,
+                original_bytes=F('original_bytes') + original,
+                stored_bytes=F('stored_bytes') + stored,
+            )
+
+
+class ImageIngestPool:
+    def __init__(self, workers, queue_size):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-ingest')
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self.queue_size = queue_size
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self.savings = StorageSavings()
+        atexit.register(self.savings.flush)
+
+    def submit(self, store, data, name):
+        """
+        Normalize ``data`` in a pool thread, then call ``store(data, name)``
+        there. Returns ``False`` if the pool was full and ``store`` ran
+        with the original bytes in the calling thread.
+        """
+        if not self._slots.acquire(blocking=False):
+            logger.warning("Image ingest pool is full, storing the crop unchanged")
+            store(data, name)
+            return False
+        with self._pending_lock:
+            self._pending += 1
+        self._executor.submit(self._run, store, data, name)
+        return True
+
+    @property
+    def depth(self):
+        """Crops queued or being stored by the pool threads."""
+        return self._pending
+
+    def _run(self, store, data, name):
+        try:
+            try:
+                normalized, normalized_name = normalize_image(data, name)
+            except Exception as e:
+                logger.warning(f"Could not normalize {name}, storing it unchanged: {e}")
+                normalized, normalized_name = data, name
+            self.savings.add(len(data), len(normalized))
+            store(normalized, normalized_name)
+            self.savings.flush_if_due()
+        except Exception as e:
+            logger.error(f"Error storing face crop {name}: {e}")
+        finally:
+            with self._pending_lock:
+                self._pending -= 1
+            self._slots.release()
+            close_old_connections()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_image_ingest_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ImageIngestPool(settings.INGEST_IMAGE_WORKERS, settings.INGEST_IMAGE_QUEUE_SIZE)
+    return _pool
@@ -0,0 +1,252 @@
+"""
+Bulk employee import from a CSV file plus an optional ZIP of photos.
+
+Every row and photo is validated before anything is written. Employees and
+images are then inserted with ``bulk_create`` in chunks, which bypasses the
+per-row ``post_save`` signals, and region counts are recomputed once at the
+end.
+"""
+import csv
+import io
+import logging
+import os
+import zipfile
+from datetime import datetime
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image as PILImage
+
+from .models import Employee, Image, Region, Terminal
+from .tasks import enqueue_face_encoding, enqueue_thumbnails
+
+logger = logging.getLogger(__name__)
+
+CSV_FIELDS = [
+    'first_name', 'last_name', 'middle_name', 'employee_id', 'position', 'positions',
+    'region', 'terminal', 'phone_number', 'email', 'hire_date', 'photos',
+]
+REQUIRED_FIELDS = ['first_name', 'last_name']
+PHOTO_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
+
+
+class EmployeeImportError(Exception):
+    """Raised when the import input is invalid. ``errors`` maps row numbers to messages."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(f"{len(errors)} invalid row(s)")
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _read_csv(csv_file):
+    content = csv_file.read()
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+    reader = csv.DictReader(io.StringIO(content))
+    unknown = set(reader.fieldnames or []) - set(CSV_FIELDS)
+    if unknown:
+        raise EmployeeImportError({0: [f"Unknown columns: {', '.join(sorted(unknown))}"]})
+    missing = set(REQUIRED_FIELDS) - set(reader.fieldnames or [])
+    if missing:
+        raise EmployeeImportError({0: [f"Missing columns: {', '.join(sorted(missing))}"]})
+    return [
+        {key: (value or '').strip() for key, value in row.items() if key}
+        for row in reader
+    ]
+
+
+def _read_photos(zip_file):
+    """Return a mapping of base file name to bytes for every image in the archive."""
+    photos = {}
+    if not zip_file:
+        return photos
+    try:
+        archive = zipfile.ZipFile(zip_file)
+    except zipfile.BadZipFile:
+        raise EmployeeImportError({0: ["Photos file is not a valid ZIP archive"]})
+    with archive:
+        for info in archive.infolist():
+            name = os.path.basename(info.filename)
+            if info.is_dir() or not name.lower().endswith(PHOTO_EXTENSIONS):
+                continue
+            photos[name] = archive.read(info)
+    return photos
+
+
+def _photo_names(row):
+    return [name.strip() for name in row.get('photos', '').split(';') if name.strip()]
+
+
+def validate_rows(rows, photos):
+    """
+    Validate every row without touching the database more than a few
+    lookups. Returns a list of ``(Employee, [photo names])`` and raises
+    ``EmployeeImportError`` if anything is wrong.
+    """
+    regions = {}
+    for region in Region.objects.filter(is_active=True):
+        regions[region.name] = region
+        regions[str(region.pk)] = region
+    terminals = {}
+    for terminal in Terminal.objects.filter(status='active'):
+        terminals[terminal.name] = terminal
+        terminals[str(terminal.pk)] = terminal
+
+    given_ids = [row['employee_id'] for row in rows if row.get('employee_id')]
+    taken_ids = set(Employee.objects.filter(employee_id__in=given_ids).values_list('employee_id', flat=True))
+    seen_ids = set()
+    checked_photos = {}
+
+    errors = {}
+    employees = []
+    for number, row in enumerate(rows, start=1):
+        row_errors = []
+        employee_id = row.get('employee_id', '')
+        if employee_id:
+            if employee_id in taken_ids:
+                row_errors.append(f"employee_id {employee_id} already exists")
+            elif employee_id in seen_ids:
+                row_errors.append(f"employee_id {employee_id} is duplicated in the file")
+            seen_ids.add(employee_id)
+
+        region = None
+        if row.get('region'):
+            region = regions.get(row['region'])
+            if region is None:
+                row_errors.append(f"Unknown region {row['region']}")
+        terminal = None
+        if row.get('terminal'):
+            terminal = terminals.get(row['terminal'])
+            if terminal is None:
+                row_errors.append(f"Unknown terminal {row['terminal']}")
+
+        hire_date = None
+        if row.get('hire_date'):
+            try:
+                hire_date = datetime.strptime(row['hire_date'], '%Y-%m-%d').date()
+            except ValueError:
+                row_errors.append("hire_date must be YYYY-MM-DD")
+
+        employee = Employee(
+            first_name=row.get('first_name', ''),
+            last_name=row.get('last_name', ''),
+            middle_name=row.get('middle_name') or None,
+            employee_id=employee_id,
+            position=row.get('position') or 'developer',
+            positions=row.get('positions') or None,
+            region=region,
+            terminal=terminal,
+            phone_number=row.get('phone_number', ''),
+            email=row.get('email', ''),
+            hire_date=hire_date,
+        )
+        try:
+            employee.clean_fields(exclude=['employee_id', 'region', 'terminal', 'hire_date'])
+        except ValidationError as e:
+            for field, messages in e.message_dict.items():
+                row_errors.extend(f"{field}: {message}" for message in messages)
+
+        photo_names = _photo_names(row)
+        for name in photo_names:
+            if name not in photos:
+                row_errors.append(f"Photo {name} not found in archive")
+                continue
+            if name not in checked_photos:
+                try:
+                    PILImage.open(io.BytesIO(photos[name])).verify()
+                    checked_photos[name] = True
+                except Exception:
+                    checked_photos[name] = False
+            if not checked_photos[name]:
+                row_errors.append(f"Photo {name} is not a valid image")
+
+        if row_errors:
+            errors[number] = row_errors
+        else:
+            employees.append((employee, photo_names))
+
+    if errors:
+        raise EmployeeImportError(errors)
+    return employees
+
+
+def import_employees(csv_file, photos_file=None, chunk_size=None, dry_run=False, progress=None):
+    """
+    Validate and import employees. ``progress`` is called as
+    ``progress(stage, done, total)`` after each chunk. Returns a summary dict.
+    """
+    chunk_size = chunk_size or settings.EMPLOYEE_IMPORT_CHUNK_SIZE
+    rows = _read_csv(csv_file)
+    photos = _read_photos(photos_file)
+    validated = validate_rows(rows, photos)
+
+    summary = {
+        'employees': len(validated),
+        'images': sum(len(names) for _, names in validated),
+        'dry_run': dry_run,
+    }
+    if dry_run or not validated:
+        return summary
+
+    total = len(validated)
+    done = 0
+    storage = Image._meta.get_field('image').storage
+    written = []
+    try:
+        with transaction.atomic():
+            # Given EMP ids first, so that the allocated ones come after them
+            Employee.reserve_employee_ids(employee.employee_id for employee, _ in validated)
+            missing_ids = [employee for employee, _ in validated if not employee.employee_id]
+            if missing_ids:
+                for employee, employee_id in zip(missing_ids, Employee.allocate_employee_ids(len(missing_ids))):
+                    employee.employee_id = employee_id
+
+            for chunk in _chunks(validated, chunk_size):
+                employees = Employee.objects.bulk_create([employee for employee, _ in chunk])
+                if any(employee.pk is None for employee in employees):
+                    pks = dict(Employee.objects.filter(
+                        employee_id__in=[employee.employee_id for employee in employees]
+                    ).values_list('employee_id', 'pk'))
+                    for employee in employees:
+                        employee.pk = pks[employee.employee_id]
+                done += len(chunk)
+                if progress:
+                    progress('employees', done, total)
+
+            images = []
+            for employee, names in validated:
+                for index, name in enumerate(names):
+                    image = Image(employee=employee, is_primary=index == 0)
+                    image.image.save(name, ContentFile(photos[name]), save=False)
+                    written.append(image.image.name)
+                    images.append(image)
+            done = 0
+            for chunk in _chunks(images, chunk_size):
+                Image.objects.bulk_create(chunk)
+                done += len(chunk)
+                if progress:
+                    progress('images', done, len(images))
+            enqueue_face_encoding(image.pk for image in images if image.pk)
+            enqueue_thumbnails(image.image.name for image in images)
+    except Exception:
+        # The rows were rolled back, so the photos written for them are orphans
+        for name in written:
+            try:
+                storage.delete(name)
+            except OSError as e:
+                logger.warning(f"Could not delete imported photo {name}: {e}")
+        raise
+
+    region_ids = {employee.region_id for employee, _ in validated if employee.region_id}
+    for region in Region.objects.filter(pk__in=region_ids):
+        region.update_counts()
+
+    logger.info(f"Imported {summary['employees']} employees and {summary['images']} images")
+    return summary
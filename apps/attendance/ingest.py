@@ -0,0 +1,110 @@
+"""
+Write path for recognitions reported by cameras.
+
+``record_recognition`` turns one consolidated sighting window (see
+``debounce.py``) into the attendance record update and the
+``EmployeeCameraStats`` row that ``FaceResultView`` used to write for every
+single frame. The first write of the day sets the status to ``come`` or
+``latecomers`` from the camera's work schedule. Every later window moves
+``check_out`` to its last sighting, as each face result did before
+debouncing, and feeds the presence sessionizer (see ``presence.py``).
+"""
+import logging
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+
+from .events import publish_event
+from .models import AttendanceRecord, EmployeeCameraStats
+from .presence import observe
+from .schedules import classify_arrival
+
+logger = logging.getLogger(__name__)
+
+
+def _utc(epoch):
+    return datetime.fromtimestamp(float(epoch), tz=dt_timezone.utc)
+
+
+def _client_time(value):
+    # Windows queued before face-result made timestamps aware carry naive local times
+    timestamp = datetime.fromisoformat(value)
+    return timezone.make_aware(timestamp) if timezone.is_naive(timestamp) else timestamp
+
+
+def record_recognition(window, image):
+    """
+    Persist a sighting window. ``window`` holds ``employee_id``,
+    ``camera_id``, ``camera_role``, ``region_id``, ``filial_id``,
+    ``first_at``/``last_at`` (epoch seconds), ``count``, ``distance``,
+    ``file_name``, ``timestamp`` (ISO time sent by the client for the
+    best frame) and optionally ``employee_name`` for live events;
+    ``image`` is the best frame's bytes.
+    """
+    first_at = _utc(window['first_at'])
+    last_at = _utc(window['last_at'])
+    count = int(window['count'])
+    # Days and times of records are local, like the work schedules
+    local_first_at = timezone.localtime(first_at)
+    # A window of one sighting is the check-in alone
+    check_out = timezone.localtime(last_at).time() if last_at > first_at else None
+
+    with transaction.atomic():
+        attendance_record, created = AttendanceRecord.objects.get_or_create(
+            employee_id=window['employee_id'],
+            date=local_first_at.date(),
+            defaults={
+                'camera_id': window['camera_id'],
+                'region_id': window['region_id'],
+                'check_in': local_first_at.time(),
+                'check_out': check_out,
+                'face_image': ContentFile(image, name=window['file_name']),
+                'distance': window['distance'],
+                'status': classify_arrival(first_at, window['region_id'], window.get('filial_id'))
+            }
+        )
+
+        arrived = created or attendance_record.status == 'not_come'
+        if not created and attendance_record.status == 'not_come':
+            # Arrived after the absentee job marked the day
+            attendance_record.check_in = local_first_at.time()
+            attendance_record.check_out = check_out
+            attendance_record.camera_id = window['camera_id']
+            attendance_record.status = classify_arrival(first_at, window['region_id'], window.get('filial_id'))
+            attendance_record.face_image = ContentFile(image, name=window['file_name'])
+            attendance_record.distance = window['distance']
+            attendance_record.save()
+        elif not created:
+            attendance_record.check_out = timezone.localtime(last_at).time()
+            AttendanceRecord.objects.filter(pk=attendance_record.pk).update(check_out=attendance_record.check_out)
+
+        EmployeeCameraStats.objects.create(
+            employee_id=window['employee_id'],
+            camera_id=window['camera_id'],
+            timestamp=_client_time(window['timestamp']),
+            face_image=ContentFile(image, name=window['file_name']),
+            distance=window['distance']
+        )
+        observe(window, first_at, last_at, window.get('camera_role', 'both'))
+
+        if arrived:
+            publish_event(
+                'attendance',
+                id=attendance_record.pk,
+                employee_id=window['employee_id'],
+                employee_name=window.get('employee_name'),
+                status=attendance_record.status,
+                date=attendance_record.date,
+                check_in=attendance_record.check_in,
+                camera_id=window['camera_id'],
+                region_id=window['region_id'],
+                filial_id=window.get('filial_id'),
+            )
+
+    logger.info(
+        f"Attendance and stats recorded for employee {window['employee_id']} "
+        f"({count} sighting(s) on camera {window['camera_id']})"
+    )
+    return attendance_record
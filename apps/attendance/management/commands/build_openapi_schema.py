@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.attendance import openapi
+
+
+class Command(BaseCommand):
+    help = "Generate the OpenAPI schema files served by api/schema/ (run before collectstatic)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help="Only check that the generated schema matches the code; fails if it does not",
+        )
+
+    def handle(self, *args, **options):
+        directory = settings.OPENAPI_SCHEMA_DIR
+        if options['check']:
+            result = openapi.status()
+            if result != 'current':
+                raise CommandError(f"The OpenAPI schema in {directory} is {result}; run build_openapi_schema")
+            self.stdout.write(self.style.SUCCESS(f"The OpenAPI schema in {directory} matches the code"))
+            return
+
+        record = openapi.build(directory)
+        for fmt, name in openapi.SCHEMA_FILES.items():
+            self.stdout.write(f"{directory / name}  sha256 {record['files'][fmt][:12]}")
+        self.stdout.write(self.style.SUCCESS(f"Built the OpenAPI schema (code {record['fingerprint'][:12]})"))
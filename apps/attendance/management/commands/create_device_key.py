@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.attendance.models import Camera, DeviceKey, Terminal
+
+
+class Command(BaseCommand):
+    help = "Create an API key for a camera or terminal and print its secret"
+
+    def add_arguments(self, parser):
+        group = parser.add_mutually_exclusive_group(required=True)
+        group.add_argument('--camera', type=int, help="Camera ID")
+        group.add_argument('--terminal', type=int, help="Terminal ID")
+        parser.add_argument(
+            '--rotate', action='store_true',
+            help="Deactivate the device's existing keys",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            if options['camera']:
+                device = {'camera': Camera.objects.get(pk=options['camera'])}
+            else:
+                device = {'terminal': Terminal.objects.get(pk=options['terminal'])}
+        except (Camera.DoesNotExist, Terminal.DoesNotExist) as e:
+            raise CommandError(str(e))
+
+        if options['rotate']:
+            # Saved one by one so the key caches are invalidated
+            for old in DeviceKey.objects.filter(is_active=True, **device):
+                old.is_active = False
+                old.save(update_fields=['is_active', 'updated_at'])
+
+        key = DeviceKey.objects.create(**device)
+        self.stdout.write(f"key_id: {key.key_id}")
+        self.stdout.write(f"secret: {key.secret}")
+        self.stdout.write(self.style.SUCCESS(f"Created device key for {key}"))
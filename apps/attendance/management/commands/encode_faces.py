@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.attendance.face_encoding import FaceEncoderUnavailable, compute_image_encodings
+
+
+class Command(BaseCommand):
+    help = "Compute missing face encodings for employee images and add them to the matcher index"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help="Number of encoder processes")
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--encoder', default=None, help="Dotted path of the encoder class")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        try:
+            encoded = compute_image_encodings(
+                workers=options['workers'],
+                batch_size=options['batch_size'],
+                encoder_path=options['encoder'],
+            )
+        except FaceEncoderUnavailable as e:
+            raise CommandError(str(e))
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Encoded {encoded} images in {elapsed:.1f}s"))
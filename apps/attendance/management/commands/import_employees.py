@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.attendance.importers import EmployeeImportError, import_employees
+
+
+class Command(BaseCommand):
+    help = "Import employees from a CSV file and an optional ZIP archive of photos"
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path')
+        parser.add_argument('--photos', help="ZIP archive with the photos referenced in the 'photos' column")
+        parser.add_argument('--chunk-size', type=int, default=None)
+        parser.add_argument('--dry-run', action='store_true', help="Only validate the input")
+
+    def handle(self, *args, **options):
+        def progress(stage, done, total):
+            self.stdout.write(f"{stage}: {done}/{total}")
+
+        photos = open(options['photos'], 'rb') if options['photos'] else None
+        try:
+            with open(options['csv_path'], 'rb') as csv_file:
+                summary = import_employees(
+                    csv_file, photos,
+                    chunk_size=options['chunk_size'],
+                    dry_run=options['dry_run'],
+                    progress=progress,
+                )
+        except EmployeeImportError as e:
+            for row, messages in sorted(e.errors.items()):
+                for message in messages:
+                    self.stderr.write(f"row {row}: {message}")
+            raise CommandError(str(e))
+        finally:
+            if photos:
+                photos.close()
+
+        action = "Validated" if summary['dry_run'] else "Imported"
+        self.stdout.write(self.style.SUCCESS(
+            f"{action} {summary['employees']} employees and {summary['images']} images"
+        ))
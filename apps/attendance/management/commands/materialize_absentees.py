@@ -0,0 +1,36 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.attendance.absentees import materialize_absentees_range
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f"Invalid date {value}. Use YYYY-MM-DD.")
+
+
+class Command(BaseCommand):
+    help = "Create 'not_come' attendance records for a day or a date range (safe to rerun)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help="First day (YYYY-MM-DD), defaults to today")
+        parser.add_argument('--to', dest='date_to', help="Last day (YYYY-MM-DD), defaults to --from")
+        parser.add_argument('--region', type=int, action='append', dest='regions', help="Region ID, can be repeated")
+        parser.add_argument('--chunk-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        date_from = _parse_date(options['date_from']) if options['date_from'] else timezone.localdate()
+        date_to = _parse_date(options['date_to']) if options['date_to'] else date_from
+        if date_to < date_from:
+            raise CommandError("--to must not be before --from")
+
+        total = 0
+        for day, created in materialize_absentees_range(date_from, date_to, options['regions'], options['chunk_size']):
+            count = sum(created.values())
+            total += count
+            self.stdout.write(f"{day}: {count} absentee record(s)")
+        self.stdout.write(self.style.SUCCESS(f"Created {total} absentee record(s)"))
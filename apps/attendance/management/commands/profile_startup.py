@@ -0,0 +1,86 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter so that every import is measured
+CHILD = """
+import json, sys, time
+phases = {}
+started = time.perf_counter()
+def phase(name):
+    global started
+    now = time.perf_counter()
+    phases[name] = round((now - started) * 1000, 1)
+    started = now
+import django
+django.setup()
+phase('django.setup (settings, apps, models, admin)')
+from django.urls import get_resolver
+get_resolver().url_patterns
+phase('URLconf (views, serializers, filters)')
+from django.core.handlers.wsgi import WSGIHandler
+WSGIHandler()
+phase('middleware')
+if %(warm_up)r:
+    from apps.attendance.warmup import warm_up
+    warm_up()
+    phase('warm-up (caches)')
+print('PHASES ' + json.dumps(phases))
+"""
+
+
+def parse_importtime(stderr):
+    """``[(module, self_us, cumulative_us)]`` from ``python -X importtime`` output."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            modules.append((name.strip(), int(self_us), int(cumulative_us)))
+        except ValueError:
+            continue
+    return modules
+
+
+class Command(BaseCommand):
+    help = "Report how long a worker takes to start: phases, packages and modules by import time"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20, help="Rows per table")
+        parser.add_argument('--warm-up', action='store_true', help="Also time the worker warm-up (needs the database)")
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(settings.BASE_DIR), os.environ.get('PYTHONPATH')])))
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', CHILD % {'warm_up': options['warm_up']}],
+            capture_output=True, text=True, env=env, cwd=settings.BASE_DIR,
+        )
+        phases_line = next((line for line in result.stdout.splitlines() if line.startswith('PHASES ')), None)
+        if result.returncode != 0 or phases_line is None:
+            raise CommandError(f"Start-up failed:\n{result.stderr[-2000:]}")
+
+        phases = json.loads(phases_line[len('PHASES '):])
+        modules = parse_importtime(result.stderr)
+        top = options['top']
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Phases"))
+        for name, ms in phases.items():
+            self.stdout.write(f"{ms:>10.1f} ms  {name}")
+        self.stdout.write(f"{sum(phases.values()):>10.1f} ms  total")
+
+        packages = defaultdict(int)
+        for name, self_us, _ in modules:
+            packages[name.split('.')[0]] += self_us
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\nPackages by own import time (top {top})"))
+        for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+            self.stdout.write(f"{self_us / 1000:>10.1f} ms  {package}")
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\nModules by cumulative import time (top {top})"))
+        for name, _, cumulative_us in sorted(modules, key=lambda module: -module[2])[:top]:
+            self.stdout.write(f"{cumulative_us / 1000:>10.1f} ms  {name}")
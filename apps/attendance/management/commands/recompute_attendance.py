@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.attendance.management.commands.materialize_absentees import _parse_date
+from apps.attendance.recompute import recompute_range
+
+
+class Command(BaseCommand):
+    help = "Re-derive attendance records for a date range from raw camera events"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', required=True, help="First day (YYYY-MM-DD)")
+        parser.add_argument('--to', dest='date_to', required=True, help="Last day (YYYY-MM-DD)")
+        parser.add_argument('--workers', type=int, default=1, help="Number of worker processes")
+        parser.add_argument('--chunk-days', type=int, default=7, help="Days per unit of work")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--checkpoint',
+            help="JSON file recording finished chunks; rerun with the same file to resume",
+        )
+
+    def handle(self, *args, **options):
+        date_from = _parse_date(options['date_from'])
+        date_to = _parse_date(options['date_to'])
+        if date_to < date_from:
+            raise CommandError("--to must not be before --from")
+        started = time.monotonic()
+
+        def progress(chunk_start, days, events, done, total):
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f"[{done}/{total}] {chunk_start} +{days}d: {events} events "
+                f"({elapsed:.1f}s elapsed)"
+            )
+
+        try:
+            days, events = recompute_range(
+                date_from, date_to,
+                workers=options['workers'],
+                chunk_days=options['chunk_days'],
+                checkpoint=options['checkpoint'],
+                batch_size=options['batch_size'],
+                progress=progress,
+            )
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        elapsed = max(time.monotonic() - started, 1e-9)
+        self.stdout.write(self.style.SUCCESS(
+            f"Recomputed {days} day(s), {events} events in {elapsed:.1f}s "
+            f"({days / elapsed:.2f} days/s, {events / elapsed:.0f} events/s)"
+        ))
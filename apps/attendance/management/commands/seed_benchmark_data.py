@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.attendance.synthetic import clear, generate
+
+
+class Command(BaseCommand):
+    help = "Fill the database with a synthetic dataset for benchmarks (see scripts/benchmark.py)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--regions', type=int, default=3)
+        parser.add_argument('--filials', type=int, default=2)
+        parser.add_argument('--employees', type=int, default=1000)
+        parser.add_argument('--days', type=int, default=30, help="Past days of attendance records")
+        parser.add_argument('--stats-per-day', type=int, default=3, help="Camera stats rows per employee and day")
+        parser.add_argument('--unknown-faces', type=int, default=500)
+        parser.add_argument('--image-pool', type=int, default=20, help="Distinct fake JPEGs shared by all rows")
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--clear', action='store_true', help="Delete the previous synthetic dataset first")
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            clear()
+            self.stdout.write("Previous synthetic dataset deleted")
+        started = time.monotonic()
+        counts = generate(
+            regions=options['regions'],
+            filials=options['filials'],
+            employees=options['employees'],
+            days=options['days'],
+            stats_per_day=options['stats_per_day'],
+            unknown_faces=options['unknown_faces'],
+            image_pool=options['image_pool'],
+            seed=options['seed'],
+        )
+        for model, count in counts.items():
+            self.stdout.write(f"{model}: {count}")
+        self.stdout.write(self.style.SUCCESS(f"Dataset created in {time.monotonic() - started:.1f}s"))
@@ -0,0 +1,260 @@
+"""
+Per-request query and latency instrumentation.
+
+``RequestMetricsMiddleware`` wraps every request in a
+``connection.execute_wrapper`` that counts SQL statements and their time.
+It records total latency and, for views that use ``InstrumentedViewMixin``,
+the time spent validating and rendering serializers. Each request is logged
+as one JSON line on the ``apps.attendance.metrics`` logger and added to
+per-route histograms, which ``metrics_view`` serves in the Prometheus text
+format to holders of ``METRICS_TOKEN`` (to anyone only with ``DEBUG`` on).
+A request slower than ``SLOW_REQUEST_THRESHOLD_MS`` also logs its most
+repeated SQL statements, which is how N+1 loops show up.
+
+The middleware runs as sync or async middleware, matching the server
+(WSGI or ASGI). It comes first in ``MIDDLEWARE``, so the queries of the
+session and authentication middleware are counted too.
+
+Histograms live in process memory, so every worker process reports its own
+series; Prometheus should scrape each worker or sum them per instance.
+"""
+import hmac
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestStats:
+    """Counters collected while one request is handled."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.statements = Counter()
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+            self.statements[sql] += 1
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    """Per-route histograms and request counters."""
+
+    HISTOGRAMS = (
+        ('http_request_duration_seconds', 'Total request latency', LATENCY_BUCKETS),
+        ('http_request_db_seconds', 'Time spent in SQL per request', LATENCY_BUCKETS),
+        ('http_request_serializer_seconds', 'Time spent in serializers per request', LATENCY_BUCKETS),
+        ('http_request_queries', 'SQL statements per request', QUERY_BUCKETS),
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._requests = Counter()
+        self._collectors = []
+
+    def add_collector(self, collect):
+        """``collect()`` yields extra exposition lines (gauges, counters) for ``render``."""
+        self._collectors.append(collect)
+
+    def observe(self, route, method, status_code, values):
+        with self._lock:
+            self._requests[(route, method, str(status_code))] += 1
+            for name, _, buckets in self.HISTOGRAMS:
+                histogram = self._histograms.get((name, route, method))
+                if histogram is None:
+                    histogram = self._histograms[(name, route, method)] = Histogram(buckets)
+                histogram.observe(values[name])
+
+    def render(self):
+        lines = [
+            '# HELP http_requests_total Requests handled',
+            '# TYPE http_requests_total counter',
+        ]
+        with self._lock:
+            for (route, method, status_code), count in sorted(self._requests.items()):
+                labels = _labels(route=route, method=method, status=status_code)
+                lines.append(f'http_requests_total{{{labels}}} {count}')
+            for name, help_text, _ in self.HISTOGRAMS:
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for (metric, route, method), histogram in sorted(self._histograms.items()):
+                    if metric != name:
+                        continue
+                    labels = _labels(route=route, method=method)
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+                    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.total}')
+                    lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+                    lines.append(f'{name}_count{{{labels}}} {histogram.total}')
+        for collect in self._collectors:
+            lines.extend(collect())
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{key}="{escape(value)}"' for key, value in labels.items())
+
+
+registry = MetricsRegistry()
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return '/' + match.route if match.route else match.view_name
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not settings.METRICS_ENABLED or request.path == settings.METRICS_PATH:
+            return self.get_response(request)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                self.wrap_connections(stack, stats)
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, stats, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.METRICS_ENABLED or request.path == settings.METRICS_PATH:
+            return await self.get_response(request)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        # Database connections belong to the thread that runs this request's
+        # sync code and async ORM queries, so they are wrapped from that thread
+        stack = ExitStack()
+        try:
+            await sync_to_async(self.wrap_connections)(stack, stats)
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+            _current.reset(token)
+        self.record(request, response, stats, time.perf_counter() - started)
+        return response
+
+    @staticmethod
+    def wrap_connections(stack, stats):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats.execute))
+
+    def record(self, request, response, stats, elapsed):
+        route = _route(request)
+        registry.observe(route, request.method, response.status_code, {
+            'http_request_duration_seconds': elapsed,
+            'http_request_db_seconds': stats.db_time,
+            'http_request_serializer_seconds': stats.serializer_time,
+            'http_request_queries': stats.queries,
+        })
+
+        record = {
+            'route': route,
+            'method': request.method,
+            'status': response.status_code,
+            'duration_ms': round(elapsed * 1000, 1),
+            'db_ms': round(stats.db_time * 1000, 1),
+            'serializer_ms': round(stats.serializer_time * 1000, 1),
+            'queries': stats.queries,
+        }
+        if elapsed * 1000 >= settings.SLOW_REQUEST_THRESHOLD_MS:
+            record['path'] = request.get_full_path()
+            record['top_queries'] = [
+                {'count': count, 'sql': sql}
+                for sql, count in stats.statements.most_common(settings.SLOW_REQUEST_TOP_QUERIES)
+            ]
+            logger.warning(json.dumps(record))
+        else:
+            logger.info(json.dumps(record))
+
+
+def _timed(method):
+    def wrapper(*args, **kwargs):
+        stats = _current.get()
+        if stats is None:
+            return method(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            stats.serializer_time += time.perf_counter() - started
+    return wrapper
+
+
+class InstrumentedViewMixin:
+    """Count serializer validation and rendering time towards the request."""
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        serializer.is_valid = _timed(serializer.is_valid)
+        serializer.to_representation = _timed(serializer.to_representation)
+        return serializer
+
+
+def metrics_view(request):
+    token = settings.METRICS_TOKEN
+    if not token:
+        # Without a token only development servers expose the metrics
+        if not settings.DEBUG:
+            return HttpResponseForbidden()
+    elif not hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
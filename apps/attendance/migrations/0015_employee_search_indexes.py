@@ -0,0 +1,34 @@
+from django.db import migrations
+
+# Django compiles ``icontains`` to ``UPPER(col::text) LIKE UPPER(%s)`` on
+# PostgreSQL, so the trigram indexes are built on the same expression.
+SEARCH_FIELDS = ['first_name', 'last_name', 'employee_id', 'email']
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for field in SEARCH_FIELDS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS attendance_employee_{field}_trgm '
+            f'ON attendance_employee USING gin (UPPER("{field}"::text) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in SEARCH_FIELDS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS attendance_employee_{field}_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0014_alter_camera_rtsp_url'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-19 01:13
+
+from django.db import migrations, models
+
+
+def seed_employee_id_sequence(apps, schema_editor):
+    Employee = apps.get_model('attendance', 'Employee')
+    IdSequence = apps.get_model('attendance', 'IdSequence')
+    numbers = [
+        int(value[3:])
+        for value in Employee.objects.filter(employee_id__startswith='EMP').values_list('employee_id', flat=True)
+        if value[3:].isdigit()
+    ]
+    IdSequence.objects.get_or_create(name='employee_id', defaults={'last_value': max(numbers, default=0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0015_employee_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_value', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'ID Sequence',
+                'verbose_name_plural': 'ID Sequences',
+            },
+        ),
+        migrations.RunPython(seed_employee_id_sequence, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-19 01:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0016_idsequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnknownFaceCluster',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('centroid', models.JSONField(blank=True, null=True)),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('first_seen', models.DateTimeField(blank=True, null=True)),
+                ('last_seen', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('is_processed', models.BooleanField(default=False)),
+                ('linked_employee', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='unknown_face_clusters', to='attendance.employee')),
+                ('region', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='unknown_face_clusters', to='attendance.region')),
+                ('representative', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='attendance.unknownface')),
+            ],
+            options={
+                'verbose_name': 'Unknown Face Cluster',
+                'verbose_name_plural': 'Unknown Face Clusters',
+                'ordering': ['-last_seen'],
+            },
+        ),
+        migrations.AddField(
+            model_name='unknownface',
+            name='cluster',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='faces', to='attendance.unknownfacecluster'),
+        ),
+        migrations.AddIndex(
+            model_name='unknownfacecluster',
+            index=models.Index(fields=['is_processed', 'last_seen'], name='attendance__is_proc_cd3100_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-19 01:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0017_unknownfacecluster'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(max_length=100)),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('grace_minutes', models.PositiveSmallIntegerField(default=0)),
+                ('workdays', models.CharField(default='1,2,3,4,5', max_length=20)),
+                ('is_active', models.BooleanField(default=True)),
+                ('filial', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='work_schedules', to='attendance.filial')),
+                ('region', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='work_schedules', to='attendance.region')),
+            ],
+            options={
+                'verbose_name': 'Work Schedule',
+                'verbose_name_plural': 'Work Schedules',
+                'ordering': ['name'],
+            },
+        ),
+    ]
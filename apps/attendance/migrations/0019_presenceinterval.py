@@ -0,0 +1,73 @@
+# Generated by Django 4.2.7 on 2026-10-19 01:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0018_workschedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PresenceInterval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('date', models.DateField()),
+                ('started_at', models.DateTimeField()),
+                ('ended_at', models.DateTimeField(blank=True, null=True)),
+                ('sightings', models.PositiveIntegerField(default=1)),
+            ],
+            options={
+                'verbose_name': 'Presence Interval',
+                'verbose_name_plural': 'Presence Intervals',
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='attendancerecord',
+            name='presence_seconds',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='camera',
+            name='role',
+            field=models.CharField(choices=[('both', 'Kirish va chiqish'), ('entry', 'Kirish'), ('exit', 'Chiqish')], default='both', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='employeecamerastats',
+            index=models.Index(fields=['employee', 'timestamp'], name='attendance__employe_813c74_idx'),
+        ),
+        migrations.AddField(
+            model_name='presenceinterval',
+            name='employee',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='presence_intervals', to='attendance.employee'),
+        ),
+        migrations.AddField(
+            model_name='presenceinterval',
+            name='entry_camera',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='entry_intervals', to='attendance.camera'),
+        ),
+        migrations.AddField(
+            model_name='presenceinterval',
+            name='exit_camera',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='exit_intervals', to='attendance.camera'),
+        ),
+        migrations.AddField(
+            model_name='presenceinterval',
+            name='region',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='presence_intervals', to='attendance.region'),
+        ),
+        migrations.AddIndex(
+            model_name='presenceinterval',
+            index=models.Index(fields=['employee', 'date'], name='attendance__employe_2e3899_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='presenceinterval',
+            index=models.Index(fields=['ended_at'], name='attendance__ended_a_9df910_idx'),
+        ),
+    ]
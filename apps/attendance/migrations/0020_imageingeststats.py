@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-19 01:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0019_presenceinterval'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageIngestStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('date', models.DateField(unique=True)),
+                ('images', models.PositiveIntegerField(default=0)),
+                ('original_bytes', models.BigIntegerField(default=0)),
+                ('stored_bytes', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Image Ingest Stats',
+                'verbose_name_plural': 'Image Ingest Stats',
+                'ordering': ['-date'],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-19 01:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0020_imageingeststats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('key_id', models.CharField(editable=False, max_length=32, unique=True)),
+                ('secret', models.CharField(editable=False, max_length=64)),
+                ('is_active', models.BooleanField(default=True)),
+                ('camera', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='device_keys', to='attendance.camera')),
+                ('terminal', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='device_keys', to='attendance.terminal')),
+            ],
+            options={
+                'verbose_name': 'Device Key',
+                'verbose_name_plural': 'Device Keys',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='devicekey',
+            constraint=models.CheckConstraint(check=models.Q(models.Q(('camera__isnull', False), ('terminal__isnull', True)), models.Q(('camera__isnull', True), ('terminal__isnull', False)), _connector='OR'), name='device_key_single_device'),
+        ),
+    ]
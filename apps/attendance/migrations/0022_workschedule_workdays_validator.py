@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:16
+
+import apps.attendance.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0021_devicekey'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='workschedule',
+            name='workdays',
+            field=models.CharField(default='1,2,3,4,5', max_length=20, validators=[apps.attendance.models.validate_workdays]),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:42
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_last_seen_at(apps, schema_editor):
+    # Open intervals restart their gap from the start; closed ones were last seen when they ended
+    PresenceInterval = apps.get_model('attendance', 'PresenceInterval')
+    PresenceInterval.objects.update(last_seen_at=Coalesce('ended_at', 'started_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0022_workschedule_workdays_validator'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='presenceinterval',
+            name='attendance__ended_a_9df910_idx',
+        ),
+        migrations.AddField(
+            model_name='presenceinterval',
+            name='last_seen_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(fill_last_seen_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='presenceinterval',
+            name='last_seen_at',
+            field=models.DateTimeField(),
+        ),
+        migrations.AddIndex(
+            model_name='presenceinterval',
+            index=models.Index(fields=['ended_at', 'last_seen_at'], name='attendance__ended_a_681740_idx'),
+        ),
+    ]
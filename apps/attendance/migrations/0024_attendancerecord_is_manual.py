@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0023_presenceinterval_last_seen_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancerecord',
+            name='is_manual',
+            field=models.BooleanField(default=False),
+        ),
+    ]
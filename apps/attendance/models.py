@@ -1,8 +1,12 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import F
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
+from datetime import timedelta
 import os
+import secrets
 
 # Choices for region, position, and status
 REGION_CHOICES = (
@@ -29,6 +33,12 @@ STATUS_CHOICES = (
     ('blocked', 'Faol emas'),
 )
 
+CAMERA_ROLE_CHOICES = (
+    ('both', 'Kirish va chiqish'),
+    ('entry', 'Kirish'),
+    ('exit', 'Chiqish'),
+)
+
 ATTENDANCE_STATUS_CHOICES = (
     ('come', 'Kelgan'),
     ('latecomers', 'Kechikkan'),
@@ -45,6 +55,70 @@ class BaseModel(models.Model):
 
 
 
+class IdSequence(models.Model):
+    """
+    Named counters for human-readable identifiers. Blocks of values are
+    reserved with a single atomic UPDATE on the unique ``name`` index, so
+    concurrent writers never receive the same value.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    last_value = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.last_value}"
+
+    @classmethod
+    def allocate(cls, name, count=1, initial=None, using=None):
+        """
+        Reserve ``count`` consecutive values and return them as a range.
+        ``initial`` is a callable giving the starting value when the
+        sequence does not exist yet.
+        """
+        if count < 1:
+            raise ValueError("count must be positive")
+        manager = cls.objects.db_manager(using)
+        while True:
+            with transaction.atomic(using=manager.db):
+                updated = manager.filter(name=name).update(last_value=F('last_value') + count)
+                if updated:
+                    last_value = manager.filter(name=name).values_list('last_value', flat=True).get()
+                    return range(last_value - count + 1, last_value + 1)
+            start = initial() if initial else 0
+            try:
+                with transaction.atomic(using=manager.db):
+                    manager.create(name=name, last_value=start + count)
+                return range(start + 1, start + count + 1)
+            except IntegrityError:
+                # Another writer created the sequence first, retry the update.
+                continue
+
+    @classmethod
+    def advance(cls, name, value, initial=None, using=None):
+        """
+        Make sure the sequence never hands out ``value`` or anything below it,
+        for values that were assigned explicitly. Call it in the transaction
+        that stores ``value``.
+        """
+        manager = cls.objects.db_manager(using)
+        while True:
+            if manager.filter(name=name, last_value__lt=value).update(last_value=value):
+                return
+            if manager.filter(name=name).exists():
+                return
+            start = initial() if initial else 0
+            try:
+                with transaction.atomic(using=manager.db):
+                    manager.create(name=name, last_value=max(start, value))
+                return
+            except IntegrityError:
+                # Another writer created the sequence first, retry the update.
+                continue
+
+    class Meta:
+        verbose_name = "ID Sequence"
+        verbose_name_plural = "ID Sequences"
+
+
 class PositionApi(BaseModel):
     """Position API model for managing positions"""
     value = models.CharField(max_length=50, unique=True)
@@ -78,7 +152,7 @@ class Region(BaseModel):
     def update_counts(self):
         """Update employee and attendance counts"""
         from django.utils import timezone
-        today = timezone.now().date()
+        today = timezone.localdate()
         
         self.employees_count = self.employees.filter(is_active=True).count()
         self.arrivals_count = self.attendance_records.filter(
@@ -121,6 +195,54 @@ class Filial(BaseModel):
 
 
 
+def _workday_tokens(value):
+    return [day.strip() for day in (value or '').split(',') if day.strip()]
+
+
+def validate_workdays(value):
+    days = _workday_tokens(value)
+    if not days or any(not day.isdigit() or not 1 <= int(day) <= 7 for day in days):
+        raise ValidationError("Use comma separated weekday numbers from 1 (Monday) to 7 (Sunday)")
+
+
+class WorkSchedule(BaseModel):
+    """Ish jadvali. Filial, region yoki umumiy (ikkalasi ham bo'sh) darajada beriladi."""
+    name = models.CharField(max_length=100)
+    region = models.ForeignKey(
+        Region,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='work_schedules'
+    )
+    filial = models.ForeignKey(
+        Filial,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='work_schedules'
+    )
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    grace_minutes = models.PositiveSmallIntegerField(default=0)
+    # Comma separated ISO weekday numbers (1 = Monday ... 7 = Sunday)
+    workdays = models.CharField(max_length=20, default='1,2,3,4,5', validators=[validate_workdays])
+    is_active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def workday_numbers(self):
+        # Rows written before validation existed may hold other tokens; skip them
+        return {int(day) for day in _workday_tokens(self.workdays) if day.isdigit() and 1 <= int(day) <= 7}
+
+    class Meta:
+        verbose_name = "Work Schedule"
+        verbose_name_plural = "Work Schedules"
+        ordering = ['name']
+
+
 class Employee(BaseModel):
     """Xodimlar modeli. Xodimlar haqida asosiy ma'lumotlarni saqlaydi."""
     first_name = models.CharField(max_length=30, db_index=True)
@@ -164,20 +286,65 @@ class Employee(BaseModel):
         names.append(self.last_name)
         return ' '.join(names)
     
+    EMPLOYEE_ID_PREFIX = 'EMP'
+    EMPLOYEE_ID_SEQUENCE = 'employee_id'
+
+    @classmethod
+    def format_employee_id(cls, number):
+        return f'{cls.EMPLOYEE_ID_PREFIX}{number:04d}'
+
+    @classmethod
+    def employee_number(cls, employee_id):
+        """Numeric suffix of an EMP id, or None for ids of another form."""
+        prefix = cls.EMPLOYEE_ID_PREFIX
+        if employee_id and employee_id.startswith(prefix) and employee_id[len(prefix):].isdigit():
+            return int(employee_id[len(prefix):])
+        return None
+
+    @classmethod
+    def max_employee_number(cls):
+        """Highest numeric suffix among existing EMP ids (compared as numbers)."""
+        numbers = [
+            cls.employee_number(value)
+            for value in cls.objects.filter(employee_id__startswith=cls.EMPLOYEE_ID_PREFIX).values_list('employee_id', flat=True)
+        ]
+        return max(filter(None, numbers), default=0)
+
+    @classmethod
+    def allocate_employee_ids(cls, count=1):
+        """Reserve ``count`` new employee ids in one round trip."""
+        numbers = IdSequence.allocate(
+            cls.EMPLOYEE_ID_SEQUENCE, count, initial=cls.max_employee_number
+        )
+        return [cls.format_employee_id(number) for number in numbers]
+
+    @classmethod
+    def reserve_employee_ids(cls, employee_ids, using=None):
+        """Keep the sequence ahead of EMP ids that were given explicitly."""
+        numbers = list(filter(None, map(cls.employee_number, employee_ids)))
+        if numbers:
+            IdSequence.advance(
+                cls.EMPLOYEE_ID_SEQUENCE, max(numbers), initial=cls.max_employee_number, using=using
+            )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_employee_id = instance.__dict__.get('employee_id')
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.employee_id:
-            # Generate employee ID
-            last_employee = Employee.objects.filter(
-                employee_id__startswith='EMP'
-            ).order_by('employee_id').last()
-            
-            if last_employee:
-                last_id = int(last_employee.employee_id[3:])
-                self.employee_id = f'EMP{last_id + 1:04d}'
-            else:
-                self.employee_id = 'EMP0001'
-        
-        super().save(*args, **kwargs)
+            self.employee_id = self.allocate_employee_ids()[0]
+            super().save(*args, **kwargs)
+        elif self.employee_id != getattr(self, '_stored_employee_id', None):
+            # An explicit id: a later allocation must not hand it out again
+            with transaction.atomic(using=kwargs.get('using')):
+                self.reserve_employee_ids([self.employee_id], using=kwargs.get('using'))
+                super().save(*args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
+        self._stored_employee_id = self.employee_id
 
     class Meta:
         verbose_name = "Employee"
@@ -189,6 +356,27 @@ class Employee(BaseModel):
             models.Index(fields=['status', 'is_active']),
         ]
 
+def online_since():
+    """Devices that pinged after this moment are online."""
+    return timezone.now() - timedelta(seconds=settings.DEVICE_ONLINE_THRESHOLD)
+
+
+class DeviceQuerySet(models.QuerySet):
+    def with_online(self):
+        """Annotate ``online`` so lists can be filtered and sorted by it."""
+        # A Case, not a bare comparison: a NULL last_ping must read as offline
+        return self.annotate(online=models.Case(
+            models.When(last_ping__gte=online_since(), then=models.Value(True)),
+            default=models.Value(False),
+            output_field=models.BooleanField(),
+        ))
+
+    def online(self, value=True):
+        if value:
+            return self.filter(last_ping__gte=online_since())
+        return self.exclude(last_ping__gte=online_since())
+
+
 class Terminal(BaseModel):
     """Terminallar modeli. IP, port va filial ma'lumotlarini saqlaydi."""
     ip_address = models.GenericIPAddressField(protocol='IPv4', blank=True, null=True)
@@ -218,11 +406,16 @@ class Terminal(BaseModel):
     def __str__(self):
         return self.name
     
+    objects = DeviceQuerySet.as_manager()
+
     @property
     def is_online(self):
+        # Lists annotate 'online' in the database (see DeviceQuerySet.with_online)
+        if hasattr(self, 'online'):
+            return self.online
         if not self.last_ping:
             return False
-        return (timezone.now() - self.last_ping).seconds < 300  # 5 minutes
+        return self.last_ping >= online_since()
 
     class Meta:
         verbose_name = "Terminal"
@@ -251,6 +444,7 @@ class Camera(BaseModel):
     location = models.CharField(max_length=255, blank=True)
     rtsp_url = models.CharField(max_length=200, blank=True)
     last_ping = models.DateTimeField(null=True, blank=True)
+    role = models.CharField(max_length=10, choices=CAMERA_ROLE_CHOICES, default='both')
     filial = models.ForeignKey(
         Filial, 
         on_delete=models.SET_NULL, 
@@ -262,11 +456,16 @@ class Camera(BaseModel):
     def __str__(self):
         return self.name
     
+    objects = DeviceQuerySet.as_manager()
+
     @property
     def is_online(self):
+        # Lists annotate 'online' in the database (see DeviceQuerySet.with_online)
+        if hasattr(self, 'online'):
+            return self.online
         if not self.last_ping:
             return False
-        return (timezone.now() - self.last_ping).seconds < 300  # 5 minutes
+        return self.last_ping >= online_since()
 
     class Meta:
         verbose_name = "Camera"
@@ -366,6 +565,10 @@ class AttendanceRecord(BaseModel):
     distance = models.CharField(max_length=10, null=True, blank=True)
     recorded_at = models.DateTimeField(auto_now_add=True, db_index=True)
     notes = models.TextField(blank=True)
+    # Sum of closed presence intervals of the day
+    presence_seconds = models.PositiveIntegerField(default=0)
+    # Written through the API or the admin; recompute leaves it alone
+    is_manual = models.BooleanField(default=False)
 
     @property
     def get_face_image_url(self):
@@ -375,6 +578,9 @@ class AttendanceRecord(BaseModel):
     
     @property
     def work_duration(self):
+        if self.presence_seconds:
+            from datetime import timedelta
+            return timedelta(seconds=self.presence_seconds)
         if self.check_in and self.check_out:
             from datetime import datetime, timedelta
             check_in_dt = datetime.combine(self.date, self.check_in)
@@ -396,6 +602,96 @@ class AttendanceRecord(BaseModel):
             models.Index(fields=['region', 'date']),
         ]
 
+class PresenceInterval(BaseModel):
+    """Xodimning bino ichida bo'lgan vaqt oralig'i. Kamera hodisalaridan quriladi."""
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='presence_intervals')
+    region = models.ForeignKey(
+        Region,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='presence_intervals'
+    )
+    entry_camera = models.ForeignKey(
+        Camera,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='entry_intervals'
+    )
+    exit_camera = models.ForeignKey(
+        Camera,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='exit_intervals'
+    )
+    date = models.DateField()
+    started_at = models.DateTimeField()
+    # Empty while the interval is open
+    ended_at = models.DateTimeField(null=True, blank=True)
+    # Server time of the latest sighting, on the same clock as started_at
+    last_seen_at = models.DateTimeField()
+    sightings = models.PositiveIntegerField(default=1)
+
+    @property
+    def duration(self):
+        if self.ended_at:
+            return self.ended_at - self.started_at
+        return None
+
+    def __str__(self):
+        return f"{self.employee_id}: {self.started_at} - {self.ended_at or '...'}"
+
+    class Meta:
+        verbose_name = "Presence Interval"
+        verbose_name_plural = "Presence Intervals"
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['employee', 'date']),
+            models.Index(fields=['ended_at', 'last_seen_at']),
+        ]
+
+class UnknownFaceCluster(BaseModel):
+    """Bir xil noma'lum shaxsga tegishli yuzlar guruhi."""
+    region = models.ForeignKey(
+        Region,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='unknown_face_clusters'
+    )
+    representative = models.ForeignKey(
+        'UnknownFace',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    centroid = models.JSONField(null=True, blank=True)
+    size = models.PositiveIntegerField(default=0)
+    first_seen = models.DateTimeField(null=True, blank=True)
+    last_seen = models.DateTimeField(null=True, blank=True, db_index=True)
+    is_processed = models.BooleanField(default=False)
+    linked_employee = models.ForeignKey(
+        Employee,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='unknown_face_clusters'
+    )
+
+    def __str__(self):
+        return f"Unknown face cluster {self.pk} ({self.size} sightings)"
+
+    class Meta:
+        verbose_name = "Unknown Face Cluster"
+        verbose_name_plural = "Unknown Face Clusters"
+        ordering = ['-last_seen']
+        indexes = [
+            models.Index(fields=['is_processed', 'last_seen']),
+        ]
+
 class UnknownFace(BaseModel):
     """Noma'lum yuzlar modeli. Tanishilmagan shaxslarning rasmlarini saqlaydi."""
     camera = models.ForeignKey(Camera, on_delete=models.CASCADE, related_name='unknown_faces')
@@ -418,6 +714,13 @@ class UnknownFace(BaseModel):
         blank=True,
         related_name='unknown_faces'
     )
+    cluster = models.ForeignKey(
+        UnknownFaceCluster,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='faces'
+    )
 
     @property
     def get_face_image_url(self):
@@ -438,6 +741,74 @@ class UnknownFace(BaseModel):
         ]
 
 
+class DeviceKey(BaseModel):
+    """Kamera yoki terminal uchun API kaliti. So'rovlar secret bilan HMAC imzolanadi."""
+    key_id = models.CharField(max_length=32, unique=True, editable=False)
+    secret = models.CharField(max_length=64, editable=False)
+    camera = models.ForeignKey(
+        Camera, on_delete=models.CASCADE, null=True, blank=True, related_name='device_keys'
+    )
+    terminal = models.ForeignKey(
+        Terminal, on_delete=models.CASCADE, null=True, blank=True, related_name='device_keys'
+    )
+    is_active = models.BooleanField(default=True)
+
+    @property
+    def device(self):
+        """``(kind, id)`` of the device the key belongs to."""
+        if self.camera_id:
+            return 'camera', self.camera_id
+        return 'terminal', self.terminal_id
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        if bool(self.camera_id) == bool(self.terminal_id):
+            raise ValidationError("A device key belongs to exactly one camera or terminal.")
+
+    def save(self, *args, **kwargs):
+        if not self.key_id:
+            self.key_id = secrets.token_hex(8)
+        if not self.secret:
+            self.secret = secrets.token_hex(32)
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        kind, device_id = self.device
+        return f"{self.key_id} ({kind} {device_id})"
+
+    class Meta:
+        verbose_name = "Device Key"
+        verbose_name_plural = "Device Keys"
+        ordering = ['-created_at']
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(camera__isnull=False, terminal__isnull=True)
+                | models.Q(camera__isnull=True, terminal__isnull=False),
+                name='device_key_single_device',
+            ),
+        ]
+
+
+class ImageIngestStats(BaseModel):
+    """Kunlik rasm hajmi statistikasi: qabul qilingan va saqlangan baytlar."""
+    date = models.DateField(unique=True)
+    images = models.PositiveIntegerField(default=0)
+    original_bytes = models.BigIntegerField(default=0)
+    stored_bytes = models.BigIntegerField(default=0)
+
+    @property
+    def saved_bytes(self):
+        return self.original_bytes - self.stored_bytes
+
+    def __str__(self):
+        return f"Image storage {self.date}"
+
+    class Meta:
+        verbose_name = "Image Ingest Stats"
+        verbose_name_plural = "Image Ingest Stats"
+        ordering = ['-date']
+
+
 class EmployeeCameraStats(models.Model):
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE)
     camera = models.ForeignKey(Camera, on_delete=models.CASCADE)
@@ -448,6 +819,8 @@ class EmployeeCameraStats(models.Model):
     class Meta:
         indexes = [
             models.Index(fields=['employee', 'camera', 'timestamp']),
+            # Last sighting of an employee on any camera (presence sessionizer)
+            models.Index(fields=['employee', 'timestamp']),
         ]
 
     def __str__(self):
@@ -0,0 +1,143 @@
+"""
+The OpenAPI schema, generated once at build time instead of per request.
+
+``manage.py build_openapi_schema`` writes ``schema.yaml``, ``schema.json``
+and ``build.json`` to ``OPENAPI_SCHEMA_DIR``, which is collected as
+``static/openapi/``. ``schema_view`` (``api/schema/``) then redirects to the
+collected file. In production its name carries the content hash, so
+WhiteNoise and nginx serve it with immutable caching.
+
+``build.json`` records a fingerprint of the code the schema was generated
+from. A schema whose fingerprint no longer matches the code is stale: the
+check at start-up warns about it and ``schema_view`` falls back to live
+generation until the schema is rebuilt.
+"""
+import hashlib
+import json
+import logging
+from functools import lru_cache
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.http import HttpResponseRedirect
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+STATIC_PREFIX = 'openapi'
+SCHEMA_FILES = {'yaml': 'schema.yaml', 'json': 'schema.json'}
+BUILD_FILE = 'build.json'
+
+# Code the schema is generated from; tests and migrations cannot change it
+SOURCE_DIRS = ['apps', 'attendance_system']
+SOURCE_EXCLUDE = {'tests', 'migrations', '__pycache__'}
+PACKAGES = ['Django', 'djangorestframework', 'drf-spectacular', 'django-filter']
+
+
+def source_fingerprint():
+    """sha256 over the project's Python sources and the schema-generating packages."""
+    digest = hashlib.sha256()
+    for package in PACKAGES:
+        try:
+            digest.update(f'{package}=={version(package)}\n'.encode())
+        except PackageNotFoundError:
+            digest.update(f'{package}\n'.encode())
+    base_dir = Path(settings.BASE_DIR)
+    for directory in SOURCE_DIRS:
+        for path in sorted((base_dir / directory).rglob('*.py')):
+            relative = path.relative_to(base_dir)
+            if SOURCE_EXCLUDE.intersection(relative.parts):
+                continue
+            digest.update(relative.as_posix().encode() + b'\0')
+            digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def generate_schema():
+    """``{format: bytes}`` rendered the way ``SpectacularAPIView`` renders them."""
+    from drf_spectacular.generators import SchemaGenerator
+    from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+
+    schema = SchemaGenerator().get_schema(request=None, public=True)
+    return {
+        'yaml': OpenApiYamlRenderer().render(schema, renderer_context={}),
+        'json': OpenApiJsonRenderer().render(schema, renderer_context={}),
+    }
+
+
+def build(directory=None):
+    """Write the schema files and their build record; returns the record."""
+    directory = Path(directory or settings.OPENAPI_SCHEMA_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    rendered = generate_schema()
+    record = {
+        'fingerprint': source_fingerprint(),
+        'generated_at': timezone.now().isoformat(),
+        'files': {},
+    }
+    for fmt, name in SCHEMA_FILES.items():
+        (directory / name).write_bytes(rendered[fmt])
+        record['files'][fmt] = hashlib.sha256(rendered[fmt]).hexdigest()
+    (directory / BUILD_FILE).write_text(json.dumps(record, indent=2))
+    status.cache_clear()
+    return record
+
+
+def read_build(directory=None):
+    """The build record of the generated schema, or None if there is none."""
+    path = Path(directory or settings.OPENAPI_SCHEMA_DIR) / BUILD_FILE
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+@lru_cache(maxsize=None)
+def status():
+    """'current', 'stale' or 'missing'; the code cannot change while a process runs."""
+    record = read_build()
+    if record is None:
+        return 'missing'
+    return 'current' if record.get('fingerprint') == source_fingerprint() else 'stale'
+
+
+def check():
+    """Log a warning unless the generated schema matches the code; returns the status."""
+    result = status()
+    if result == 'stale':
+        logger.warning(
+            "The OpenAPI schema in %s was generated from other code; api/schema/ generates it "
+            "per request until `manage.py build_openapi_schema` is run", settings.OPENAPI_SCHEMA_DIR,
+        )
+    elif result == 'missing' and settings.OPENAPI_SCHEMA_PRECOMPILED:
+        logger.warning(
+            "No OpenAPI schema in %s; api/schema/ generates it per request until "
+            "`manage.py build_openapi_schema` is run", settings.OPENAPI_SCHEMA_DIR,
+        )
+    return result
+
+
+def _wants_json(request):
+    return request.GET.get('format') == 'json' or 'json' in request.headers.get('Accept', '')
+
+
+@lru_cache(maxsize=None)
+def _live_view():
+    from drf_spectacular.views import SpectacularAPIView
+    return SpectacularAPIView.as_view()
+
+
+def schema_view(request, *args, **kwargs):
+    """``api/schema/``: the generated file when it is current, else the live view."""
+    if settings.OPENAPI_SCHEMA_PRECOMPILED and status() == 'current':
+        fmt = 'json' if _wants_json(request) else 'yaml'
+        try:
+            url = staticfiles_storage.url(f'{STATIC_PREFIX}/{SCHEMA_FILES[fmt]}')
+        except ValueError:
+            # Built but not collected yet (manifest storage has no entry for it)
+            pass
+        else:
+            return HttpResponseRedirect(url)
+    return _live_view()(request, *args, **kwargs)
@@ -2,6 +2,8 @@
 
 from rest_framework import permissions
 
+from .device_auth import DevicePrincipal
+
 class IsOwnerOrReadOnly(permissions.BasePermission):
     """
     Custom permission to only allow owners of an object to edit it.
@@ -22,4 +24,16 @@ class IsAdminOrReadOnly(permissions.BasePermission):
     def has_permission(self, request, view):
         if request.method in permissions.SAFE_METHODS:
             return request.user.is_authenticated
-        return request.user.is_authenticated and request.user.is_staff
\ No newline at end of file
+        return request.user.is_authenticated and request.user.is_staff
+
+class IsUserOrCameraKey(permissions.BasePermission):
+    """
+    Authenticated users, and device keys of cameras. Face results are
+    attributed to the signing camera, which a terminal key does not have.
+    """
+    message = "Only camera device keys may post face results."
+
+    def has_permission(self, request, view):
+        if isinstance(request.user, DevicePrincipal):
+            return request.user.camera_id is not None
+        return bool(request.user and request.user.is_authenticated)
@@ -0,0 +1,140 @@
+"""
+Presence intervals built from camera sightings.
+
+A sighting on an ``entry`` or ``both`` camera opens an interval when the
+employee has none open. The interval stays open while sightings keep coming
+no more than ``PRESENCE_SESSION_GAP`` seconds apart, and is closed by a
+sighting on an ``exit`` camera, by the next sighting after a longer gap, or
+by ``close_idle_intervals``. Intervals are timed on the server clock: the
+debounce window times of ``ingest.record_recognition``, never the
+timestamps cameras send. The open interval keeps the time of its latest
+sighting in ``last_seen_at``.
+
+Closing an interval refreshes the derived ``presence_seconds`` of the
+day's ``AttendanceRecord``; ``check_out`` follows every sighting (see
+``ingest.py``).
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import AttendanceRecord, Employee, PresenceInterval
+
+logger = logging.getLogger(__name__)
+
+
+def _gap():
+    return timedelta(seconds=settings.PRESENCE_SESSION_GAP)
+
+
+def sessionize(sightings, gap=None):
+    """
+    Turn ``(timestamp, camera_id, role, region_id)`` tuples of one employee,
+    sorted by time, into interval dicts. The last interval is left open
+    (``ended_at`` is ``None``) if it was not closed by an exit camera.
+    """
+    gap = gap or _gap()
+    current = None
+    for timestamp, camera_id, role, region_id in sightings:
+        if current and timestamp - current['last_at'] > gap:
+            current['ended_at'] = current['last_at']
+            yield current
+            current = None
+        if current is None:
+            if role == 'exit':
+                continue
+            current = {
+                'started_at': timestamp, 'last_at': timestamp, 'ended_at': None,
+                'entry_camera_id': camera_id, 'exit_camera_id': None,
+                'region_id': region_id, 'sightings': 1,
+            }
+            continue
+        current['last_at'] = timestamp
+        current['sightings'] += 1
+        if role == 'exit':
+            current['ended_at'] = timestamp
+            current['exit_camera_id'] = camera_id
+            yield current
+            current = None
+    if current:
+        yield current
+
+
+def summarize_day(employee_id, day):
+    """Refresh ``presence_seconds`` of one daily record from its closed intervals."""
+    intervals = PresenceInterval.objects.filter(
+        employee_id=employee_id, date=day, ended_at__isnull=False
+    ).values_list('started_at', 'ended_at')
+    if not intervals:
+        return
+    total = sum(((ended - started) for started, ended in intervals), timedelta())
+    AttendanceRecord.objects.filter(employee_id=employee_id, date=day).exclude(status='not_come').update(
+        presence_seconds=int(total.total_seconds()),
+    )
+
+
+def close_interval(interval, ended_at, exit_camera_id=None):
+    interval.ended_at = max(ended_at, interval.started_at)
+    interval.last_seen_at = max(interval.ended_at, interval.last_seen_at)
+    interval.exit_camera_id = exit_camera_id
+    interval.save(update_fields=['ended_at', 'last_seen_at', 'exit_camera', 'sightings', 'updated_at'])
+    summarize_day(interval.employee_id, interval.date)
+
+
+def observe(window, first_at, last_at, role):
+    """
+    Feed one consolidated sighting window (see ``ingest.record_recognition``)
+    to the sessionizer. ``first_at`` and ``last_at`` are the window's server
+    times.
+    """
+    employee_id = window['employee_id']
+    count = int(window.get('count', 1))
+
+    with transaction.atomic():
+        # Serializes concurrent windows of the same employee
+        Employee.objects.select_for_update().filter(pk=employee_id).exists()
+        interval = PresenceInterval.objects.filter(
+            employee_id=employee_id, ended_at__isnull=True
+        ).order_by('-started_at').first()
+
+        if interval and first_at - interval.last_seen_at > _gap():
+            close_interval(interval, interval.last_seen_at)
+            interval = None
+
+        if interval is None:
+            if role == 'exit':
+                return None
+            return PresenceInterval.objects.create(
+                employee_id=employee_id,
+                region_id=window['region_id'],
+                entry_camera_id=window['camera_id'],
+                date=timezone.localdate(first_at),
+                started_at=first_at,
+                last_seen_at=last_at,
+                sightings=count,
+            )
+
+        interval.sightings += count
+        if role == 'exit':
+            close_interval(interval, last_at, window['camera_id'])
+        else:
+            interval.last_seen_at = max(last_at, interval.last_seen_at)
+            interval.save(update_fields=['last_seen_at', 'sightings', 'updated_at'])
+    return interval
+
+
+def close_idle_intervals(now=None):
+    """Close open intervals whose employee has not been seen for longer than the gap."""
+    now = now or timezone.now()
+    idle = PresenceInterval.objects.filter(ended_at__isnull=True, last_seen_at__lt=now - _gap())
+
+    closed = 0
+    for interval in idle:
+        close_interval(interval, interval.last_seen_at)
+        closed += 1
+    if closed:
+        logger.info(f"Closed {closed} idle presence intervals")
+    return closed
@@ -0,0 +1,176 @@
+"""
+Re-derive attendance records from raw ``EmployeeCameraStats`` events.
+
+``recompute_day`` rebuilds the presence intervals of a day and the
+check-in, check-out, presence time, camera, region and status of its
+records from that day's sightings, using the current work schedules and
+camera mappings, then fills in absentees. Records written by hand
+(``is_manual``) keep their values.
+``recompute_range`` spreads chunks of days over a process pool and records
+finished chunks in a checkpoint file so an interrupted run can resume.
+"""
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, time as dt_time, timedelta
+
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .absentees import materialize_absentees
+from .models import AttendanceRecord, EmployeeCameraStats, PresenceInterval, Region
+from .presence import sessionize
+from .schedules import classify_arrival
+
+logger = logging.getLogger(__name__)
+
+RECOMPUTED_FIELDS = ['camera', 'region', 'check_in', 'check_out', 'status', 'presence_seconds']
+
+
+def _day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, dt_time.min))
+    return start, timezone.make_aware(datetime.combine(day + timedelta(days=1), dt_time.min))
+
+
+def recompute_day(day, batch_size=1000):
+    """
+    Rebuild the presence intervals and records of ``day`` (a local date, like
+    ``AttendanceRecord.date``). Returns the event count.
+    """
+    start, end = _day_bounds(day)
+    events = EmployeeCameraStats.objects.filter(
+        timestamp__gte=start, timestamp__lt=end
+    ).order_by('employee_id', 'timestamp').values_list(
+        'employee_id', 'camera_id', 'camera__role', 'camera__region_id', 'camera__filial_id', 'timestamp'
+    )
+
+    sightings = {}
+    count = 0
+    for employee_id, camera_id, role, region_id, filial_id, timestamp in events.iterator(chunk_size=batch_size):
+        count += 1
+        sightings.setdefault(employee_id, []).append((timestamp, camera_id, role or 'both', region_id, filial_id))
+
+    finished_day = day < timezone.localdate()
+    with transaction.atomic():
+        existing = {
+            record.employee_id: record
+            for record in AttendanceRecord.objects.filter(date=day, employee_id__in=list(sightings))
+        }
+        to_create, to_update, intervals = [], [], []
+        manual = 0
+        for employee_id, employee_sightings in sightings.items():
+            first_at, camera_id, _, region_id, filial_id = employee_sightings[0]
+            presence = timedelta()
+            for interval in sessionize(sighting[:4] for sighting in employee_sightings):
+                if interval['ended_at'] is None and finished_day:
+                    interval['ended_at'] = interval['last_at']
+                if interval['ended_at'] is not None:
+                    presence += interval['ended_at'] - interval['started_at']
+                intervals.append(PresenceInterval(
+                    employee_id=employee_id,
+                    date=day,
+                    last_seen_at=interval['last_at'],
+                    **{key: value for key, value in interval.items() if key != 'last_at'},
+                ))
+
+            record = existing.get(employee_id) or AttendanceRecord(employee_id=employee_id, date=day)
+            if record.is_manual:
+                manual += 1
+                continue
+            record.camera_id = camera_id
+            record.region_id = region_id
+            record.check_in = timezone.localtime(first_at).time()
+            # Like the live path: the last sighting after the check-in
+            last_at = employee_sightings[-1][0]
+            record.check_out = timezone.localtime(last_at).time() if last_at > first_at else None
+            record.presence_seconds = int(presence.total_seconds())
+            record.status = classify_arrival(first_at, region_id, filial_id)
+            (to_update if record.pk else to_create).append(record)
+
+        PresenceInterval.objects.filter(date=day).delete()
+        PresenceInterval.objects.bulk_create(intervals, batch_size=batch_size)
+        AttendanceRecord.objects.bulk_update(to_update, RECOMPUTED_FIELDS, batch_size=batch_size)
+        AttendanceRecord.objects.bulk_create(to_create, batch_size=batch_size, ignore_conflicts=True)
+        materialize_absentees(day, chunk_size=batch_size)
+    if manual:
+        logger.info(f"Recompute of {day} kept {manual} manually edited record(s)")
+    return count
+
+
+def recompute_days(days, batch_size=1000):
+    """Recompute a chunk of days. Runs inside pool workers."""
+    events = sum(recompute_day(day, batch_size) for day in days)
+    connections.close_all()
+    return days[0], len(days), events
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def load_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return set(json.load(f).get('done', []))
+
+
+def save_checkpoint(path, done):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'done': sorted(done)}, f)
+    os.replace(tmp_path, path)
+
+
+def recompute_range(date_from, date_to, workers=1, chunk_days=7, checkpoint=None, batch_size=1000, progress=None):
+    """
+    Recompute every day from ``date_from`` to ``date_to`` inclusive.
+    Chunks listed in ``checkpoint`` are skipped. ``progress`` is called with
+    ``(chunk_start, days, events, done_chunks, total_chunks)`` after each chunk.
+    Returns ``(days, events)`` processed in this run.
+    """
+    days = [date_from + timedelta(days=n) for n in range((date_to - date_from).days + 1)]
+    chunks = [days[start:start + chunk_days] for start in range(0, len(days), chunk_days)]
+    done = load_checkpoint(checkpoint)
+    pending = [chunk for chunk in chunks if chunk[0].isoformat() not in done]
+
+    total_days = total_events = 0
+
+    def finish(result):
+        nonlocal total_days, total_events
+        chunk_start, day_count, events = result
+        total_days += day_count
+        total_events += events
+        done.add(chunk_start.isoformat())
+        if checkpoint:
+            save_checkpoint(checkpoint, done)
+        if progress:
+            progress(chunk_start, day_count, events, len(done), len(chunks))
+
+    if connections['default'].vendor == 'sqlite' and workers > 1:
+        logger.warning("SQLite allows a single writer; recomputing without a process pool")
+        workers = 1
+
+    failed = []
+    if workers <= 1 or len(pending) <= 1:
+        for chunk in pending:
+            finish(recompute_days(chunk, batch_size))
+    else:
+        # Forked workers must not share the parent's database connections.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+            futures = {executor.submit(recompute_days, chunk, batch_size): chunk for chunk in pending}
+            for future in as_completed(futures):
+                try:
+                    finish(future.result())
+                except Exception as e:
+                    logger.error(f"Recompute of chunk starting {futures[future][0]} failed: {e}")
+                    failed.append(futures[future][0])
+
+    for region in Region.objects.filter(is_active=True):
+        region.update_counts()
+    if failed:
+        raise RuntimeError(f"{len(failed)} chunk(s) failed; rerun with the same checkpoint to retry them")
+    return total_days, total_events
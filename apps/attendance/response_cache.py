@@ -0,0 +1,88 @@
+"""
+Response cache for read-mostly reference lists.
+
+``cached_response`` wraps a view's ``get``. The cache key contains the
+request path with its query string and the current version of every group
+the response depends on. A version is the time of the last change and is
+bumped by model save/delete signals (see ``signals.py``), so a change makes
+every older entry unreachable. Each entry keeps its data, an ETag made from
+that data and the time it was built. Conditional requests
+(``If-None-Match``/``If-Modified-Since``) get a 304, and other hits are
+answered from the cached data. Neither touches the database nor runs a
+serializer. Authentication and permissions still run before the lookup.
+"""
+import functools
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+VERSION_PREFIX = 'response-cache:version:'
+ENTRY_PREFIX = 'response-cache:entry:'
+
+
+def bump_versions(*groups):
+    """Invalidate every cached response that depends on ``groups``."""
+    now = time.time()
+    cache.set_many({f'{VERSION_PREFIX}{group}': now for group in groups}, timeout=None)
+
+
+def get_versions(groups):
+    keys = [f'{VERSION_PREFIX}{group}' for group in groups]
+    versions = cache.get_many(keys)
+    missing = {key: time.time() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def _not_modified(request, entry):
+    etag = request.headers.get('If-None-Match')
+    if etag is not None:
+        return entry['etag'] in [tag.strip() for tag in etag.split(',')] or etag.strip() == '*'
+    since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return since is not None and int(entry['built_at']) <= since
+
+
+def _with_headers(response, entry):
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(entry['built_at'])
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def cached_response(*groups, timeout=None):
+    """Cache the 200 responses of a ``get`` handler until one of ``groups`` changes."""
+    def decorator(get):
+        @functools.wraps(get)
+        def wrapper(self, request, *args, **kwargs):
+            versions = ':'.join(repr(version) for version in get_versions(groups))
+            path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            key = f'{ENTRY_PREFIX}{":".join(groups)}:{versions}:{path}'
+
+            entry = cache.get(key)
+            if entry is None:
+                response = get(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                body = json.dumps(response.data, cls=JSONEncoder, sort_keys=True)
+                entry = {
+                    'data': json.loads(body),
+                    'etag': f'"{hashlib.md5(body.encode()).hexdigest()}"',
+                    'built_at': time.time(),
+                }
+                cache.set(key, entry, timeout or settings.RESPONSE_CACHE_TIMEOUT)
+                return _with_headers(response, entry)
+
+            if _not_modified(request, entry):
+                return _with_headers(Response(status=status.HTTP_304_NOT_MODIFIED), entry)
+            return _with_headers(Response(entry['data']), entry)
+        return wrapper
+    return decorator
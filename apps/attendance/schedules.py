@@ -0,0 +1,76 @@
+"""
+Work schedule lookup and attendance status classification.
+
+All active schedules are held in process memory and reloaded at most every
+``WORK_SCHEDULE_CACHE_TTL`` seconds, or immediately in the process that
+saved or deleted a schedule, so classifying a sighting costs no queries.
+A filial schedule wins over a region schedule, which wins over the default
+schedule (no region and no filial).
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import WorkSchedule
+
+
+class ScheduleCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self._by_filial = {}
+        self._by_region = {}
+        self._default = None
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def _load(self):
+        by_filial, by_region, default = {}, {}, None
+        for schedule in WorkSchedule.objects.filter(is_active=True).order_by('-updated_at'):
+            if schedule.filial_id:
+                by_filial.setdefault(schedule.filial_id, schedule)
+            elif schedule.region_id:
+                by_region.setdefault(schedule.region_id, schedule)
+            elif default is None:
+                default = schedule
+        self._by_filial, self._by_region, self._default = by_filial, by_region, default
+        self._loaded_at = time.monotonic()
+
+    def get(self, region_id=None, filial_id=None):
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > settings.WORK_SCHEDULE_CACHE_TTL:
+                self._load()
+            return (
+                self._by_filial.get(filial_id)
+                or self._by_region.get(region_id)
+                or self._default
+            )
+
+
+schedule_cache = ScheduleCache()
+
+
+def is_workday(day, region_id=None, filial_id=None):
+    """Whether ``day`` is a working day. Without a schedule every day is."""
+    schedule = schedule_cache.get(region_id, filial_id)
+    return schedule is None or day.isoweekday() in schedule.workday_numbers
+
+
+def classify_arrival(arrived_at, region_id=None, filial_id=None):
+    """
+    Return ``'come'`` or ``'latecomers'`` for a first sighting at the aware
+    datetime ``arrived_at``. Arrivals on non-working days are never late.
+    """
+    schedule = schedule_cache.get(region_id, filial_id)
+    if schedule is None:
+        return 'come'
+    local = timezone.localtime(arrived_at)
+    if local.isoweekday() not in schedule.workday_numbers:
+        return 'come'
+    deadline = datetime.combine(local.date(), schedule.start_time) + timedelta(minutes=schedule.grace_minutes)
+    return 'latecomers' if local.replace(tzinfo=None) > deadline else 'come'
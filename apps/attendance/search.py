@@ -0,0 +1,167 @@
+"""
+Employee search backed by database indexes.
+
+Every backend matches like DRF's ``icontains`` search did: each term must
+be a substring of one of the fields. PostgreSQL serves that from pg_trgm GIN
+indexes (created in migration 0015) and ranks rows by trigram similarity.
+SQLite uses a trigram FTS5 table kept in sync with ``attendance_employee``
+by triggers and ranks rows with bm25; terms too short to have a trigram are
+matched with ``icontains``. Any other backend falls back to the plain
+``icontains`` search.
+"""
+import logging
+
+from django.db import connections
+from django.db.models import FloatField, Q, Value
+from django.db.models.functions import Greatest
+from rest_framework.filters import SearchFilter
+
+logger = logging.getLogger(__name__)
+
+EMPLOYEE_SEARCH_FIELDS = ['first_name', 'last_name', 'employee_id', 'email']
+
+FTS_TABLE = 'attendance_employee_fts'
+
+# The trigram tokenizer only matches terms of at least three characters
+FTS_MIN_TERM_LENGTH = 3
+
+_FTS_COLUMNS = ', '.join(EMPLOYEE_SEARCH_FIELDS)
+_NEW_COLUMNS = ', '.join(f'new.{field}' for field in EMPLOYEE_SEARCH_FIELDS)
+_OLD_COLUMNS = ', '.join(f'old.{field}' for field in EMPLOYEE_SEARCH_FIELDS)
+
+SQLITE_FTS_SQL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"{_FTS_COLUMNS}, content='attendance_employee', content_rowid='id', "
+    f"tokenize='trigram')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON attendance_employee BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, {_FTS_COLUMNS}) VALUES (new.id, {_NEW_COLUMNS}); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON attendance_employee BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_FTS_COLUMNS}) "
+    f"VALUES ('delete', old.id, {_OLD_COLUMNS}); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON attendance_employee BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_FTS_COLUMNS}) "
+    f"VALUES ('delete', old.id, {_OLD_COLUMNS}); "
+    f"INSERT INTO {FTS_TABLE}(rowid, {_FTS_COLUMNS}) VALUES (new.id, {_NEW_COLUMNS}); END",
+]
+
+_fts_available = {}
+
+
+def install_sqlite_fts(connection):
+    """
+    Create the FTS5 table and its sync triggers, rebuilding the index if
+    anything was missing. SQLite drops triggers whenever a migration remakes
+    the employee table, so this runs after every ``migrate``.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    objects = [FTS_TABLE] + [f'{FTS_TABLE}_{suffix}' for suffix in ('ai', 'ad', 'au')]
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sql FROM sqlite_master WHERE name = %s", [FTS_TABLE])
+        row = cursor.fetchone()
+        if row and 'trigram' not in row[0]:
+            # Made with the unicode61 tokenizer, which only matches word prefixes
+            cursor.execute(f"DROP TABLE {FTS_TABLE}")
+        cursor.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE name IN (%s, %s, %s, %s)",
+            objects,
+        )
+        existing = cursor.fetchone()[0]
+        try:
+            for statement in SQLITE_FTS_SQL:
+                cursor.execute(statement)
+        except Exception as e:
+            logger.warning(f"SQLite FTS5 is not available, employee search falls back to icontains: {e}")
+            _fts_available[connection.alias] = False
+            return
+        if existing < len(objects):
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    _fts_available[connection.alias] = True
+
+
+def sqlite_fts_available(connection):
+    if connection.alias not in _fts_available:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = %s",
+                [FTS_TABLE],
+            )
+            _fts_available[connection.alias] = cursor.fetchone()[0] == 1
+    return _fts_available[connection.alias]
+
+
+def fts_match_query(terms):
+    """Build an FTS5 MATCH expression doing substring search on every term."""
+    return ' AND '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+
+def contains_terms(terms):
+    """``icontains`` condition: every term is a substring of one of the fields."""
+    condition = Q()
+    for term in terms:
+        term_condition = Q()
+        for field in EMPLOYEE_SEARCH_FIELDS:
+            term_condition |= Q(**{f'{field}__icontains': term})
+        condition &= term_condition
+    return condition
+
+
+def search_employees(queryset, terms):
+    """
+    Filter ``queryset`` to employees matching every term and annotate each
+    row with ``search_rank`` (higher is better). Returns ``None`` when the
+    database has no search index so the caller can fall back.
+    """
+    connection = connections[queryset.db]
+
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        similarities = [
+            Greatest(*[TrigramSimilarity(field, term) for field in EMPLOYEE_SEARCH_FIELDS])
+            for term in terms
+        ]
+        rank = similarities[0]
+        for similarity in similarities[1:]:
+            rank = rank + similarity
+        return queryset.filter(contains_terms(terms)).annotate(search_rank=rank)
+
+    if connection.vendor == 'sqlite' and sqlite_fts_available(connection):
+        indexed = [term for term in terms if len(term) >= FTS_MIN_TERM_LENGTH]
+        queryset = queryset.filter(
+            contains_terms([term for term in terms if len(term) < FTS_MIN_TERM_LENGTH])
+        )
+        if not indexed:
+            return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+        table = queryset.model._meta.db_table
+        # Joined rather than a subquery per row: bm25() reads the MATCH of
+        # the same query. It is lower for better matches, so negate it.
+        return queryset.extra(
+            select={'search_rank': f'-bm25({FTS_TABLE})'},
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = {table}.id', f'{FTS_TABLE} MATCH %s'],
+            params=[fts_match_query(indexed)],
+        )
+
+    return None
+
+
+class EmployeeSearchFilter(SearchFilter):
+    """
+    Drop-in replacement for ``SearchFilter`` on the employee list that uses
+    the search index and orders by relevance unless ``ordering`` is given.
+    Put it after ``OrderingFilter`` so the rank ordering wins.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+
+        ranked = search_employees(queryset, terms)
+        if ranked is None:
+            return super().filter_queryset(request, queryset, view)
+
+        if request.query_params.get('ordering'):
+            return ranked
+        return ranked.order_by('-search_rank', *queryset.query.order_by)
@@ -3,9 +3,11 @@ from django.contrib.auth.hashers import make_password
 from django.utils import timezone
 from .models import (
     Region, Filial, Employee, Terminal, Camera, Admin, Image,
-    AttendanceRecord, UnknownFace, REGION_CHOICES, POSITION_CHOICES,
+    AttendanceRecord, PresenceInterval, UnknownFace, UnknownFaceCluster, WorkSchedule, REGION_CHOICES, POSITION_CHOICES,
     STATUS_CHOICES, ATTENDANCE_STATUS_CHOICES, PositionApi
 )
+from .tasks import enqueue_face_encoding, enqueue_thumbnails
+from .thumbnails import thumbnail_url
 
 
 
@@ -24,19 +26,30 @@ class RegionSerializer(serializers.ModelSerializer):
             'is_active', 'created_at', 'updated_at'
         ]
 
+    # The region views annotate these counts (views.with_region_counts); a
+    # region nested in another serializer counts per object
+
     def get_employees_count(self, obj):
+        if hasattr(obj, 'active_employees'):
+            return obj.active_employees
         return obj.employees.filter(is_active=True).count()
 
     def get_arrivals_count(self, obj):
-        today = timezone.now().date()
+        if hasattr(obj, 'arrivals_today'):
+            return obj.arrivals_today
+        today = timezone.localdate()
         return obj.attendance_records.filter(date=today, status='come').count()
 
     def get_latecomers_count(self, obj):
-        today = timezone.now().date()
+        if hasattr(obj, 'latecomers_today'):
+            return obj.latecomers_today
+        today = timezone.localdate()
         return obj.attendance_records.filter(date=today, status='latecomers').count()
 
     def get_absentees_count(self, obj):
-        today = timezone.now().date()
+        if hasattr(obj, 'absentees_today'):
+            return obj.absentees_today
+        today = timezone.localdate()
         return obj.attendance_records.filter(date=today, status='not_come').count()
 
 class FilialSerializer(serializers.ModelSerializer):
@@ -47,8 +60,29 @@ class FilialSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'value', 'address', 'is_active', 'terminals_count', 'created_at', 'universitet']
 
     def get_terminals_count(self, obj):
+        if hasattr(obj, 'active_terminals'):
+            return obj.active_terminals
         return obj.terminals.filter(status='active').count()
 
+class WorkScheduleSerializer(serializers.ModelSerializer):
+    region_name = serializers.CharField(source='region.label', read_only=True)
+    filial_name = serializers.CharField(source='filial.name', read_only=True)
+
+    # Write fields
+    region_id = serializers.IntegerField(write_only=True, required=False, allow_null=True)
+    filial_id = serializers.IntegerField(write_only=True, required=False, allow_null=True)
+
+    class Meta:
+        model = WorkSchedule
+        fields = [
+            'id', 'name', 'region_name', 'region_id', 'filial_name', 'filial_id',
+            'start_time', 'end_time', 'grace_minutes', 'workdays', 'is_active', 'created_at'
+        ]
+
+    def validate_workdays(self, value):
+        # The model field validator has checked the numbers
+        return ','.join(day.strip() for day in value.split(',') if day.strip())
+
 class EmployeeListSerializer(serializers.ModelSerializer):
     """Simplified serializer for employee list view"""
     region_name = serializers.CharField(source='region.name', read_only=True)
@@ -122,6 +156,8 @@ class TerminalSerializer(serializers.ModelSerializer):
         ]
 
     def get_employees_count(self, obj):
+        if hasattr(obj, 'active_employees'):
+            return obj.active_employees
         return obj.employees.filter(is_active=True).count()
 
 class CameraSerializer(serializers.ModelSerializer):
@@ -136,7 +172,7 @@ class CameraSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'name', 'ip_address', 'port', 'login', 'password',
             'status', 'status_display', 'region_name', 'region_id',
-            'location', 'rtsp_url', 'is_online', 'last_ping', 'created_at'
+            'location', 'rtsp_url', 'role', 'is_online', 'last_ping', 'created_at'
         ]
         extra_kwargs = {
             'password': {'write_only': True}
@@ -169,6 +205,7 @@ class ImageSerializer(serializers.ModelSerializer):
     employee_name = serializers.CharField(source='employee.full_name', read_only=True)
     camera_name = serializers.CharField(source='camera.name', read_only=True)
     image_url = serializers.SerializerMethodField()
+    image_thumb_url = serializers.SerializerMethodField()
 
     # Write fields
     employee_id = serializers.IntegerField(write_only=True)
@@ -178,11 +215,14 @@ class ImageSerializer(serializers.ModelSerializer):
         model = Image
         fields = [
             'id', 'employee_name', 'employee_id', 'camera_name', 'camera_id',
-            'image', 'image_url', 'uploaded_at', 'faiss_id', 'is_primary'
+            'image', 'image_url', 'image_thumb_url', 'uploaded_at', 'faiss_id', 'is_primary'
         ]
 
     def get_image_url(self, obj):
         return obj.get_image_url
+
+    def get_image_thumb_url(self, obj):
+        return thumbnail_url(obj.image)
     
 
 class MultipleImageUploadSerializer(serializers.Serializer):
@@ -198,19 +238,32 @@ class MultipleImageUploadSerializer(serializers.Serializer):
         # camera_id = validated_data.get('camera_id')
         images = validated_data['images']
 
-        image_objects = []
-        for img in images:
-            image_obj = Image.objects.create(
-                employee_id=employee_id,
-                # camera_id=camera_id,
-                image=img
-            )
-            image_objects.append(image_obj)
-
+        image_objects = Image.objects.bulk_create([
+            Image(employee_id=employee_id, image=img) for img in images
+        ])
+        enqueue_face_encoding(image.pk for image in image_objects)
+        enqueue_thumbnails(image.image.name for image in image_objects)
         return image_objects
     
 
 
+class EmployeeImportSerializer(serializers.Serializer):
+    """Serializer for bulk employee import uploads"""
+    file = serializers.FileField()
+    photos = serializers.FileField(required=False, allow_null=True)
+    dry_run = serializers.BooleanField(required=False, default=False)
+
+    def validate_file(self, value):
+        if not value.name.lower().endswith('.csv'):
+            raise serializers.ValidationError("Employee list must be a .csv file")
+        return value
+
+    def validate_photos(self, value):
+        if value and not value.name.lower().endswith('.zip'):
+            raise serializers.ValidationError("Photos must be a .zip archive")
+        return value
+
+
 class AttendanceRecordSerializer(serializers.ModelSerializer):
     employee_name = serializers.CharField(source='employee.full_name', read_only=True)
     employee_id_display = serializers.CharField(source='employee.employee_id', read_only=True)
@@ -218,6 +271,7 @@ class AttendanceRecordSerializer(serializers.ModelSerializer):
     region_name = serializers.CharField(source='region.label', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     face_image_url = serializers.SerializerMethodField()
+    face_image_thumb_url = serializers.SerializerMethodField()
     work_duration = serializers.SerializerMethodField()
 
     # Write fields
@@ -231,13 +285,17 @@ class AttendanceRecordSerializer(serializers.ModelSerializer):
             'id', 'employee_name', 'employee_id', 'employee_id_display',
             'camera_name', 'camera_id', 'region_name', 'region_id',
             'check_in', 'check_out', 'date', 'status', 'status_display',
-            'face_image', 'face_image_url', 'distance', 'work_duration',
-            'notes', 'recorded_at'
+            'face_image', 'face_image_url', 'face_image_thumb_url', 'distance', 'work_duration',
+            'presence_seconds', 'notes', 'is_manual', 'recorded_at'
         ]
+        read_only_fields = ['presence_seconds', 'is_manual']
 
     def get_face_image_url(self, obj):
         return obj.get_face_image_url
 
+    def get_face_image_thumb_url(self, obj):
+        return thumbnail_url(obj.face_image)
+
     def get_work_duration(self, obj):
         duration = obj.work_duration
         if duration:
@@ -252,6 +310,7 @@ class UnknownFaceSerializer(serializers.ModelSerializer):
     region_name = serializers.CharField(source='region.name', read_only=True)
     linked_employee_name = serializers.CharField(source='linked_employee.full_name', read_only=True)
     face_image_url = serializers.SerializerMethodField()
+    face_image_thumb_url = serializers.SerializerMethodField()
 
     # Write fields
     camera_id = serializers.IntegerField(write_only=True)
@@ -261,13 +320,54 @@ class UnknownFaceSerializer(serializers.ModelSerializer):
         model = UnknownFace
         fields = [
             'id', 'camera_name', 'camera_id', 'region_name', 'region_id',
-            'face_image', 'face_image_url', 'recorded_at', 'distance',
-            'is_processed', 'linked_employee_name', 'linked_employee'
+            'face_image', 'face_image_url', 'face_image_thumb_url', 'recorded_at', 'distance',
+            'is_processed', 'linked_employee_name', 'linked_employee', 'cluster'
         ]
+        read_only_fields = ['cluster']
 
     def get_face_image_url(self, obj):
         return obj.get_face_image_url
 
+    def get_face_image_thumb_url(self, obj):
+        return thumbnail_url(obj.face_image)
+
+class PresenceIntervalSerializer(serializers.ModelSerializer):
+    employee_name = serializers.CharField(source='employee.full_name', read_only=True)
+    entry_camera_name = serializers.CharField(source='entry_camera.name', read_only=True)
+    exit_camera_name = serializers.CharField(source='exit_camera.name', read_only=True)
+    duration = serializers.DurationField(read_only=True)
+
+    class Meta:
+        model = PresenceInterval
+        fields = [
+            'id', 'employee', 'employee_name', 'region', 'date', 'started_at', 'last_seen_at', 'ended_at',
+            'duration', 'entry_camera', 'entry_camera_name', 'exit_camera', 'exit_camera_name',
+            'sightings'
+        ]
+
+class UnknownFaceClusterSerializer(serializers.ModelSerializer):
+    region_name = serializers.CharField(source='region.name', read_only=True)
+    linked_employee_name = serializers.CharField(source='linked_employee.full_name', read_only=True)
+    face_image_url = serializers.SerializerMethodField()
+    face_image_thumb_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UnknownFaceCluster
+        fields = [
+            'id', 'region_name', 'size', 'face_image_url', 'face_image_thumb_url', 'first_seen', 'last_seen',
+            'is_processed', 'linked_employee', 'linked_employee_name', 'created_at'
+        ]
+
+    def get_face_image_url(self, obj):
+        if obj.representative:
+            return obj.representative.get_face_image_url
+        return None
+
+    def get_face_image_thumb_url(self, obj):
+        if obj.representative:
+            return thumbnail_url(obj.representative.face_image)
+        return None
+
 class AttendanceStatsSerializer(serializers.Serializer):
     """Serializer for attendance statistics"""
     region = serializers.CharField()
@@ -292,6 +392,26 @@ class UnknownFaceLinkSerializer(serializers.Serializer):
             raise serializers.ValidationError("Invalid employee ID")
         return value
 
+class UnknownFaceClusterLinkSerializer(serializers.Serializer):
+    """Serializer for linking a whole unknown face cluster to an employee"""
+    cluster_id = serializers.IntegerField()
+    employee_id = serializers.IntegerField()
+
+    def validate_cluster_id(self, value):
+        if not UnknownFaceCluster.objects.filter(id=value, is_processed=False).exists():
+            raise serializers.ValidationError("Invalid or already processed cluster ID")
+        return value
+
+    def validate_employee_id(self, value):
+        if not Employee.objects.filter(id=value, is_active=True).exists():
+            raise serializers.ValidationError("Invalid employee ID")
+        return value
+
+class HeartbeatSerializer(serializers.Serializer):
+    """Serializer for camera/terminal heartbeats"""
+    device_type = serializers.ChoiceField(choices=['camera', 'terminal'])
+    device_id = serializers.IntegerField(min_value=1)
+
 class FaceRecognitionResultSerializer(serializers.Serializer):
     """Serializer for face recognition API results"""
     status = serializers.CharField()
@@ -1,7 +1,16 @@
-from django.db.models.signals import post_save, post_delete
+from django.db import connections
+from django.db.models.signals import post_save, post_delete, post_migrate
 from django.dispatch import receiver
 from django.utils import timezone
-from .models import AttendanceRecord, Employee, Region
+from .models import (
+    AttendanceRecord, Camera, DeviceKey, Employee, Filial, Image, PositionApi, Region, Terminal,
+    UnknownFace, WorkSchedule
+)
+from .device_auth import key_store
+from .response_cache import bump_versions
+from .schedules import schedule_cache
+from .search import install_sqlite_fts
+from .tasks import enqueue_face_encoding, enqueue_thumbnails
 
 @receiver(post_save, sender=AttendanceRecord)
 def update_region_counts_on_save(sender, instance, created, **kwargs):
@@ -26,3 +35,75 @@ def update_region_employee_count_on_delete(sender, instance, **kwargs):
     """Update region employee count when employee is deleted"""
     if instance.region:
         instance.region.update_counts()
+
+@receiver(post_save, sender=Image)
+def queue_image_face_encoding(sender, instance, created, **kwargs):
+    """Compute the face encoding of a new image in the background"""
+    if created and (instance.face_encoding is None or instance.faiss_id is None):
+        enqueue_face_encoding([instance.pk])
+
+@receiver(post_save, sender=Image)
+def queue_image_thumbnails(sender, instance, created, **kwargs):
+    """Make thumbnails of a new employee photo in the background"""
+    if created:
+        enqueue_thumbnails([instance.image.name])
+
+@receiver(post_save, sender=UnknownFace)
+@receiver(post_save, sender=AttendanceRecord)
+def queue_face_thumbnails(sender, instance, update_fields=None, **kwargs):
+    """Make thumbnails of a saved face crop in the background"""
+    if update_fields is not None and 'face_image' not in update_fields:
+        return
+    if instance.face_image:
+        enqueue_thumbnails([instance.face_image.name])
+
+@receiver(post_save, sender=WorkSchedule)
+@receiver(post_delete, sender=WorkSchedule)
+def invalidate_schedule_cache(sender, instance, **kwargs):
+    """Reload work schedules on the next classification"""
+    schedule_cache.invalidate()
+
+@receiver(post_migrate)
+def install_employee_search_index(sender, using, **kwargs):
+    """Make sure the SQLite employee search index and triggers exist"""
+    if sender.name == 'apps.attendance':
+        install_sqlite_fts(connections[using])
+
+# Cached reference lists that include data of each model
+RESPONSE_CACHE_GROUPS = {
+    PositionApi: ['positions'],
+    Region: ['regions', 'terminals', 'cameras'],
+    Filial: ['filials', 'terminals'],
+    Terminal: ['terminals', 'filials'],
+    Camera: ['cameras'],
+    Employee: ['regions', 'terminals'],
+    AttendanceRecord: ['regions'],
+}
+
+# Fields no cached list shows. The stored region counts are written by
+# Region.update_counts on every attendance record, while the lists count
+# live (views.with_region_counts); the region list only counts records.
+RESPONSE_CACHE_UNLISTED_FIELDS = {
+    Region: {'employees_count', 'arrivals_count', 'departures_count', 'absentees_count'},
+    AttendanceRecord: {
+        'camera', 'camera_id', 'check_in', 'check_out', 'face_image', 'distance', 'notes',
+        'presence_seconds', 'updated_at',
+    },
+}
+
+def invalidate_cached_responses(sender, update_fields=None, **kwargs):
+    """Drop cached reference lists built from the changed model"""
+    if update_fields and set(update_fields) <= RESPONSE_CACHE_UNLISTED_FIELDS.get(sender, set()):
+        return
+    bump_versions(*RESPONSE_CACHE_GROUPS[sender])
+
+for model in RESPONSE_CACHE_GROUPS:
+    post_save.connect(invalidate_cached_responses, sender=model, dispatch_uid=f'response-cache-save-{model.__name__}')
+    post_delete.connect(invalidate_cached_responses, sender=model, dispatch_uid=f'response-cache-delete-{model.__name__}')
+
+
+@receiver(post_save, sender=DeviceKey)
+@receiver(post_delete, sender=DeviceKey)
+def invalidate_device_key(sender, instance, **kwargs):
+    """Deactivated or deleted keys stop verifying (other workers within DEVICE_KEY_LOCAL_TTL)"""
+    key_store.invalidate(instance.key_id)
@@ -0,0 +1,178 @@
+"""
+Synthetic data for benchmarks and query-count tests.
+
+``generate`` fills the database with regions, filials, cameras, terminals,
+work schedules, employees with face images and a number of past days of
+attendance records, camera stats rows and unknown faces. Everything is
+inserted with ``bulk_create`` and the face images share a small pool of
+generated JPEGs, so a dataset of tens of thousands of rows takes seconds.
+All names carry ``PREFIX`` so ``clear`` can remove a previous dataset.
+"""
+import io
+import random
+from datetime import datetime, time, timedelta
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image as PILImage
+
+from .models import (
+    AttendanceRecord, Camera, Employee, EmployeeCameraStats, Filial, Image,
+    Region, Terminal, UnknownFace, WorkSchedule,
+)
+
+PREFIX = 'bench'
+FIRST_NAMES = ['Aziz', 'Dilnoza', 'Jasur', 'Madina', 'Otabek', 'Sevara', 'Timur', 'Zarina']
+LAST_NAMES = ['Karimov', 'Rahimova', 'Tursunov', 'Yusupova', 'Aliyev', 'Nazarova', 'Qodirov']
+
+
+def fake_jpeg(seed=0, size=160):
+    """A small JPEG that Pillow and the thumbnailer can decode."""
+    rng = random.Random(seed)
+    color = tuple(rng.randrange(256) for _ in range(3))
+    image = PILImage.new('RGB', (size, size), color)
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=80)
+    return buffer.getvalue()
+
+
+def _image_pool(folder, count):
+    names = []
+    for i in range(count):
+        name = f'{folder}/{PREFIX}-{i}.jpg'
+        if not default_storage.exists(name):
+            name = default_storage.save(name, ContentFile(fake_jpeg(i)))
+        names.append(name)
+    return names
+
+
+def clear():
+    """Delete a dataset made by ``generate``; dependent rows cascade."""
+    with transaction.atomic():
+        Employee.objects.filter(employee_id__startswith=f'{PREFIX.upper()}-').delete()
+        Camera.objects.filter(name__startswith=f'{PREFIX}-').delete()
+        Terminal.objects.filter(name__startswith=f'{PREFIX}-').delete()
+        Filial.objects.filter(value__startswith=f'{PREFIX}-').delete()
+        Region.objects.filter(name__startswith=f'{PREFIX}-').delete()
+
+
+def generate(regions=3, filials=2, employees=100, days=5, stats_per_day=3,
+             unknown_faces=20, image_pool=10, seed=1, batch_size=1000):
+    """
+    Create a dataset and return a dict with the number of rows made per
+    model. ``days`` past days end yesterday; about 10% of employees are
+    absent and 20% late on each day.
+    """
+    rng = random.Random(seed)
+    faces = _image_pool('attendance_faces', image_pool)
+    photos = _image_pool('employee_images', image_pool)
+    now = timezone.now()
+    counts = {}
+
+    with transaction.atomic():
+        region_objs = Region.objects.bulk_create([
+            Region(name=f'{PREFIX}-{i}', label=f'Benchmark region {i}') for i in range(regions)
+        ])
+        filial_objs = Filial.objects.bulk_create([
+            Filial(name=f'{PREFIX} filial {i}', value=f'{PREFIX}-{i}', universitet='narxoz')
+            for i in range(filials)
+        ])
+        camera_objs = Camera.objects.bulk_create([
+            Camera(
+                name=f'{PREFIX}-camera-{region.pk}-{j}',
+                ip_address=f'10.{region.pk % 250}.{j}.1',
+                region=region,
+                filial=filial_objs[j % len(filial_objs)] if filial_objs else None,
+                role=('entry', 'exit')[j % 2],
+                last_ping=now,
+            )
+            for region in region_objs for j in range(2)
+        ])
+        terminal_objs = Terminal.objects.bulk_create([
+            Terminal(
+                name=f'{PREFIX}-terminal-{region.pk}',
+                region=region,
+                filial=filial_objs[0] if filial_objs else None,
+                last_ping=now,
+            )
+            for region in region_objs
+        ])
+        WorkSchedule.objects.bulk_create([
+            WorkSchedule(
+                name=f'{PREFIX} schedule {region.pk}', region=region,
+                start_time=time(9), end_time=time(18), grace_minutes=10,
+            )
+            for region in region_objs
+        ])
+
+        employee_objs = Employee.objects.bulk_create([
+            Employee(
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+                employee_id=f'{PREFIX.upper()}-{i:06d}',
+                region=region_objs[i % regions],
+                terminal=terminal_objs[i % regions],
+                hire_date=(now - timedelta(days=days + 30)).date(),
+            )
+            for i in range(employees)
+        ], batch_size=batch_size)
+        images = Image.objects.bulk_create([
+            Image(employee=employee, image=rng.choice(photos), is_primary=True)
+            for employee in employee_objs
+        ], batch_size=batch_size)
+
+        cameras_by_region = {}
+        for camera in camera_objs:
+            cameras_by_region.setdefault(camera.region_id, []).append(camera)
+
+        records, stats = [], []
+        today = timezone.localdate(now)
+        for offset in range(days, 0, -1):
+            day = today - timedelta(days=offset)
+            for employee in employee_objs:
+                camera = rng.choice(cameras_by_region[employee.region_id])
+                roll = rng.random()
+                if roll < 0.1:
+                    records.append(AttendanceRecord(
+                        employee=employee, region_id=employee.region_id, date=day, status='not_come',
+                    ))
+                    continue
+                arrived = timezone.make_aware(datetime.combine(day, time(8, 30))) + timedelta(
+                    minutes=rng.randrange(60 if roll < 0.3 else 35)
+                )
+                left = arrived + timedelta(hours=8, minutes=rng.randrange(90))
+                records.append(AttendanceRecord(
+                    employee=employee, camera=camera, region_id=employee.region_id, date=day,
+                    check_in=arrived.time(), check_out=left.time(),
+                    status='latecomers' if arrived.time() > time(9, 10) else 'come',
+                    face_image=rng.choice(faces), distance=f'{rng.uniform(0.6, 0.95):.3f}',
+                    presence_seconds=int((left - arrived).total_seconds()),
+                ))
+                for k in range(stats_per_day):
+                    stats.append(EmployeeCameraStats(
+                        employee=employee, camera=camera,
+                        timestamp=arrived + (left - arrived) * k / max(stats_per_day - 1, 1),
+                        face_image=rng.choice(faces), distance=f'{rng.uniform(0.6, 0.95):.3f}',
+                    ))
+        AttendanceRecord.objects.bulk_create(records, batch_size=batch_size)
+        EmployeeCameraStats.objects.bulk_create(stats, batch_size=batch_size)
+
+        unknown = UnknownFace.objects.bulk_create([
+            UnknownFace(
+                camera=camera, region_id=camera.region_id,
+                face_image=rng.choice(faces), distance=f'{rng.uniform(0.2, 0.5):.3f}',
+            )
+            for camera in (rng.choice(camera_objs) for _ in range(unknown_faces))
+        ], batch_size=batch_size)
+
+    for region in region_objs:
+        region.update_counts()
+
+    counts.update(
+        regions=len(region_objs), filials=len(filial_objs), cameras=len(camera_objs),
+        terminals=len(terminal_objs), employees=len(employee_objs), images=len(images),
+        attendance_records=len(records), camera_stats=len(stats), unknown_faces=len(unknown),
+    )
+    return counts
@@ -0,0 +1,131 @@
+import logging
+
+from celery import shared_task
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def encode_images_task(image_ids):
+    """Compute face encodings for the given images and add them to the matcher index."""
+    from .face_encoding import FaceEncoderUnavailable, compute_image_encodings
+    try:
+        return compute_image_encodings(image_ids)
+    except FaceEncoderUnavailable as e:
+        # The encode_faces command picks these images up once an encoder is installed.
+        logger.warning(f"Could not encode {len(image_ids)} images: {e}")
+        return 0
+
+
+@shared_task
+def cluster_unknown_faces_task():
+    """Encode new unknown faces and group them into clusters."""
+    from .clustering import cluster_unknown_faces
+    from .face_encoding import FaceEncoderUnavailable, compute_unknown_face_encodings
+    try:
+        compute_unknown_face_encodings()
+    except FaceEncoderUnavailable as e:
+        # Faces that arrived with an encoding can still be clustered.
+        logger.warning(f"Could not encode unknown faces: {e}")
+    return cluster_unknown_faces()
+
+
+@shared_task
+def flush_recognition_windows():
+    """Write recognition debounce windows that have closed (Redis backend)."""
+    from .debounce import RedisDebounceBackend, get_debouncer
+    debouncer = get_debouncer()
+    if not isinstance(debouncer.backend, RedisDebounceBackend):
+        return 0
+    return debouncer.flush_expired()
+
+
+@shared_task
+def flush_heartbeats():
+    """Write pending camera/terminal pings to last_ping (Redis backend)."""
+    from .heartbeats import RedisHeartbeatBackend, get_heartbeat_recorder
+    recorder = get_heartbeat_recorder()
+    if not isinstance(recorder.backend, RedisHeartbeatBackend):
+        return 0
+    return recorder.flush()
+
+
+@shared_task
+def close_idle_presence_intervals():
+    """Close presence intervals of employees who have not been seen for a while."""
+    from .presence import close_idle_intervals
+    return close_idle_intervals()
+
+
+@shared_task
+def materialize_absentees_task(day=None):
+    """Create 'not_come' records for ``day`` (YYYY-MM-DD, defaults to today)."""
+    from datetime import date
+    from django.utils import timezone
+    from .absentees import materialize_absentees
+    day = date.fromisoformat(day) if day else timezone.localdate()
+    return materialize_absentees(day)
+
+
+@shared_task
+def make_thumbnails_task(names):
+    """Create thumbnails of stored photos."""
+    from .thumbnails import make_thumbnails
+    return make_thumbnails(names)
+
+
+def enqueue_thumbnails(names):
+    """Queue thumbnails of the photos ``names`` once the current transaction commits."""
+    names = [name for name in names if name]
+    if not names:
+        return
+
+    def send():
+        try:
+            make_thumbnails_task.delay(names)
+        except Exception as e:
+            # Missing thumbnails are built on their first request.
+            logger.warning(f"Could not queue thumbnails for {len(names)} photos: {e}")
+
+    transaction.on_commit(send)
+
+
+def enqueue_face_encoding(image_ids):
+    """Queue encoding of ``image_ids`` once the current transaction commits."""
+    image_ids = list(image_ids)
+    if not image_ids:
+        return
+
+    def send():
+        try:
+            encode_images_task.delay(image_ids)
+        except Exception as e:
+            # The encode_faces command picks these images up later.
+            logger.warning(f"Could not queue face encoding for {len(image_ids)} images: {e}")
+
+    transaction.on_commit(send)
+
+
+@shared_task(bind=True)
+def import_employees_task(self, csv_path, photos_path=None, chunk_size=None):
+    """Run an employee import from files previously saved to default storage."""
+    from .importers import EmployeeImportError, import_employees
+
+    def progress(stage, done, total):
+        self.update_state(state='PROGRESS', meta={'stage': stage, 'done': done, 'total': total})
+
+    try:
+        with default_storage.open(csv_path, 'rb') as csv_file:
+            if photos_path:
+                with default_storage.open(photos_path, 'rb') as photos_file:
+                    return import_employees(csv_file, photos_file, chunk_size=chunk_size, progress=progress)
+            return import_employees(csv_file, chunk_size=chunk_size, progress=progress)
+    except EmployeeImportError as e:
+        logger.warning(f"Employee import {self.request.id} rejected: {e}")
+        return {'errors': e.errors}
+    finally:
+        for path in (csv_path, photos_path):
+            if path and default_storage.exists(path):
+                default_storage.delete(path)
@@ -0,0 +1,54 @@
+"""
+The absentee job creates one ``not_come`` record per missing employee and
+reports only the rows it inserted, so reruns count nothing.
+"""
+from datetime import date
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from apps.attendance.absentees import materialize_absentees
+from apps.attendance.models import AttendanceRecord, Employee, Region
+
+DAY = date(2026, 10, 15)
+
+
+class MaterializeAbsenteesTests(TestCase):
+    def setUp(self):
+        self.region = Region.objects.create(name='narxoz')
+        self.employees = [
+            Employee.objects.create(first_name=f'Absent{n}', last_name='Employee', region=self.region, hire_date=DAY)
+            for n in range(3)
+        ]
+        AttendanceRecord.objects.create(employee=self.employees[0], region=self.region, date=DAY, status='come')
+
+    def test_missing_employees_get_one_record(self):
+        self.assertEqual(materialize_absentees(DAY, chunk_size=1), {'narxoz': 2})
+        self.assertCountEqual(
+            AttendanceRecord.objects.filter(date=DAY, status='not_come').values_list('employee', flat=True),
+            [employee.pk for employee in self.employees[1:]],
+        )
+
+    def test_rerun_creates_and_counts_nothing(self):
+        materialize_absentees(DAY)
+        self.assertEqual(materialize_absentees(DAY), {'narxoz': 0})
+        self.assertEqual(AttendanceRecord.objects.filter(date=DAY).count(), 3)
+
+    def test_rows_taken_by_a_concurrent_run_are_not_counted(self):
+        # Both runs found the same absentees; the other one inserted first
+        ids = [employee.pk for employee in self.employees[1:]]
+        AttendanceRecord.objects.create(employee=self.employees[1], region=self.region, date=DAY, status='not_come')
+        with mock.patch('apps.attendance.absentees.absent_employee_ids', return_value=ids):
+            self.assertEqual(materialize_absentees(DAY), {'narxoz': 1})
+        self.assertEqual(AttendanceRecord.objects.filter(date=DAY, status='not_come').count(), 2)
+
+    def test_command_reports_the_inserted_rows(self):
+        out = StringIO()
+        call_command('materialize_absentees', '--from', DAY.isoformat(), stdout=out)
+        call_command('materialize_absentees', '--from', DAY.isoformat(), stdout=out)
+        self.assertEqual(
+            [line for line in out.getvalue().splitlines() if line.startswith('Created')],
+            ['Created 2 absentee record(s)', 'Created 0 absentee record(s)'],
+        )
@@ -0,0 +1,157 @@
+"""
+The async views (ASGI deployments) answer like the sync views they replace.
+"""
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+import asyncio
+import json
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+
+from apps.attendance import async_views, views
+from apps.attendance.debounce import get_debouncer
+from apps.attendance.events import LocalEventBroker
+from apps.attendance.models import Employee, UnknownFace
+from apps.attendance.synthetic import PREFIX, fake_jpeg, generate
+from apps.attendance.throttling import IngestThrottler, LocalTokenBucketBackend
+
+from .test_query_counts import SMALL, InlineIngestPool
+
+
+def _jpeg_upload(name='face.jpg'):
+    upload = io.BytesIO(fake_jpeg())
+    upload.name = name
+    return upload
+
+
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Before super(), which runs setUpTestData
+        cls.media_root = tempfile.mkdtemp()
+        cls._media = override_settings(MEDIA_ROOT=cls.media_root)
+        cls._media.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._media.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        generate(**SMALL)
+        cls.user = User.objects.create_user(f'{PREFIX}-async')
+        cls.token = Token.objects.create(user=cls.user)
+        cls.employee = Employee.objects.filter(employee_id__startswith=f'{PREFIX.upper()}-').first()
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        patches = [
+            mock.patch('apps.attendance.async_views.get_image_ingest_pool', return_value=InlineIngestPool()),
+            mock.patch.object(get_debouncer(), 'window_seconds', 0),
+            mock.patch('apps.attendance.throttling._throttler', IngestThrottler(LocalTokenBucketBackend())),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def call(self, view, method, path, authenticated=True, **kwargs):
+        if authenticated:
+            kwargs['HTTP_AUTHORIZATION'] = f'Token {self.token.key}'
+        request = getattr(self.factory, method)(path, **kwargs)
+        response = async_to_sync(view)(request) if iscoroutinefunction(view) else view(request)
+        return response.render()
+
+    def face(self, user, **data):
+        return {'file': _jpeg_upload(), 'user': user, 'cosine_similarity': '0.9', **data}
+
+    def test_dashboard_matches_sync_view(self):
+        sync = self.call(views.dashboard_data, 'get', '/api/v1/dashboard/')
+        response = self.call(async_views.dashboard_data, 'get', '/api/v1/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertJSONEqual(response.content, sync.content.decode())
+
+    def test_attendance_stats_match_sync_view(self):
+        sync = self.call(views.attendance_stats, 'get', '/api/v1/stats/attendance/')
+        response = self.call(async_views.attendance_stats, 'get', '/api/v1/stats/attendance/')
+        self.assertEqual(response.status_code, 200)
+        self.assertJSONEqual(response.content, sync.content.decode())
+
+    def test_face_result_ingests_known_and_unknown_faces(self):
+        view = async_views.FaceResultView.as_view()
+        unknown_before = UnknownFace.objects.count()
+
+        response = self.call(view, 'post', '/api/v1/face-result/', data=self.face(self.employee.pk), format='multipart')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data['employee_id'], self.employee.pk)
+
+        response = self.call(view, 'post', '/api/v1/face-result/', data=self.face('unrecognized'), format='multipart')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(UnknownFace.objects.count(), unknown_before + 1)
+
+        response = self.call(view, 'post', '/api/v1/face-result/', data=self.face('nobody'), format='multipart')
+        self.assertEqual(response.status_code, 400)
+
+    def test_face_result_batch(self):
+        view = async_views.FaceResultBatchView.as_view()
+        data = {
+            'file': [_jpeg_upload('a.jpg'), _jpeg_upload('b.jpg')],
+            'user': [self.employee.pk, 'unrecognized'],
+            'cosine_similarity': ['0.9', '0.3'],
+        }
+        response = self.call(view, 'post', '/api/v1/face-result/batch/', data=data, format='multipart')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual([result['status_code'] for result in response.data['results']], [200, 200])
+
+    def test_unauthenticated_request_is_rejected(self):
+        response = self.call(async_views.dashboard_data, 'get', '/api/v1/dashboard/', authenticated=False)
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(INGEST_CLIENT_RATE=0.01, INGEST_CLIENT_BURST=1)
+    def test_throttled_face_result_gets_retry_after(self):
+        view = async_views.FaceResultView.as_view()
+        response = self.call(view, 'post', '/api/v1/face-result/', data=self.face('unrecognized'), format='multipart')
+        self.assertEqual(response.status_code, 200)
+        response = self.call(view, 'post', '/api/v1/face-result/', data=self.face('unrecognized'), format='multipart')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    def test_event_stream_relays_matching_events(self):
+        view = async_views.EventStreamView.as_view()
+        broker = LocalEventBroker()
+        request = self.factory.get(
+            f'/api/v1/events/stream/?region={self.employee.region_id}',
+            HTTP_AUTHORIZATION=f'Token {self.token.key}',
+        )
+
+        async def read():
+            response = await view(request)
+            frames = response.streaming_content.__aiter__()
+            first = await frames.__anext__()
+            # Subscribed before the first frame; other regions are filtered out
+            broker.publish(json.dumps({'type': 'attendance', 'region_id': -1}))
+            broker.publish(json.dumps({'type': 'attendance', 'region_id': self.employee.region_id}))
+            second = await asyncio.wait_for(frames.__anext__(), 5)
+            await frames.aclose()
+            return response, [first, second]
+
+        with mock.patch('apps.attendance.events._broker', broker):
+            response, frames = async_to_sync(read)()
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(frames[0], b'retry: 5000\n\n')
+        self.assertTrue(frames[1].startswith(b'event: attendance\n'))
+        self.assertEqual(len(broker.subscribers), 0)
+
+    def test_sync_event_stream_is_refused(self):
+        response = self.call(views.EventStreamView.as_view(), 'get', '/api/v1/events/stream/', HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, 503)
+        self.assertIn(b'ASGI', response.content)
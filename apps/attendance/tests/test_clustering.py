@@ -0,0 +1,41 @@
+"""
+Linking a cluster of unknown faces only links the faces nobody linked yet.
+"""
+from unittest import mock
+
+from django.test import TestCase
+
+from apps.attendance.clustering import link_cluster
+from apps.attendance.face_encoding import FaceEncoderUnavailable
+from apps.attendance.models import Camera, Employee, UnknownFace, UnknownFaceCluster
+from apps.attendance.tasks import cluster_unknown_faces_task
+
+
+class LinkClusterTests(TestCase):
+    def setUp(self):
+        camera = Camera.objects.create(name='cluster-camera')
+        self.cluster = UnknownFaceCluster.objects.create()
+        self.first = Employee.objects.create(first_name='First', last_name='Employee')
+        self.second = Employee.objects.create(first_name='Second', last_name='Employee')
+        self.linked = UnknownFace.objects.create(
+            camera=camera, cluster=self.cluster, is_processed=True, linked_employee=self.first,
+        )
+        self.open = UnknownFace.objects.create(camera=camera, cluster=self.cluster)
+
+    def test_faces_linked_before_keep_their_employee(self):
+        with mock.patch('apps.attendance.clustering.enqueue_face_encoding'):
+            link_cluster(self.cluster, self.second)
+        self.linked.refresh_from_db()
+        self.open.refresh_from_db()
+        self.assertEqual(self.linked.linked_employee, self.first)
+        self.assertEqual(self.open.linked_employee, self.second)
+        self.assertTrue(self.open.is_processed)
+
+    def test_cluster_task_runs_without_an_encoder(self):
+        with mock.patch(
+            'apps.attendance.face_encoding.compute_unknown_face_encodings',
+            side_effect=FaceEncoderUnavailable("missing"),
+        ):
+            with self.assertLogs('apps.attendance.tasks', 'WARNING'):
+                summary = cluster_unknown_faces_task()
+        self.assertEqual(summary['faces'], 0)
@@ -0,0 +1,138 @@
+"""
+Sightings of one employee on one camera are merged into a single window
+that keeps the best frame, and closed windows are written once.
+"""
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.attendance.debounce import LocalDebounceBackend, RecognitionDebouncer
+from apps.attendance.models import AttendanceRecord, Camera, Employee, EmployeeCameraStats, Region
+from apps.attendance.synthetic import fake_jpeg
+
+
+def sighting(employee_id=1, camera_id=1, distance='0.8', name='face.jpg'):
+    return {
+        'employee_id': employee_id, 'camera_id': camera_id, 'camera_role': 'both',
+        'region_id': None, 'filial_id': None, 'distance': distance,
+        'file_name': name, 'timestamp': '2026-10-15T09:00:00+05:00',
+    }
+
+
+class DebouncerTests(TestCase):
+    def setUp(self):
+        self.written = []
+        record = mock.patch('apps.attendance.debounce.record_recognition', side_effect=self.record)
+        record.start()
+        self.addCleanup(record.stop)
+        sweeper = mock.patch.object(RecognitionDebouncer, '_start_sweeper')
+        sweeper.start()
+        self.addCleanup(sweeper.stop)
+        self.debouncer = RecognitionDebouncer(LocalDebounceBackend(), window_seconds=10)
+
+    def record(self, window, image):
+        self.written.append((window, image))
+
+    def submit(self, at, image=b'frame', **event):
+        with mock.patch('apps.attendance.debounce.time.time', return_value=at):
+            self.debouncer.submit(sighting(**event), image)
+
+    def test_sightings_in_a_window_are_merged(self):
+        self.submit(1000, b'first', distance='0.70')
+        self.submit(1003, b'best', distance='0.95', name='best.jpg')
+        self.submit(1006, b'last', distance='0.80')
+        self.assertEqual(self.written, [])
+
+        self.assertEqual(self.debouncer.flush_all(), 1)
+        [(window, image)] = self.written
+        self.assertEqual(image, b'best')
+        self.assertEqual((window['first_at'], window['last_at'], window['count']), (1000, 1006, 3))
+        self.assertEqual((window['distance'], window['file_name']), ('0.95', 'best.jpg'))
+
+    def test_sighting_after_the_window_closes_it(self):
+        self.submit(1000)
+        self.submit(1004)
+        self.submit(1010, b'next')
+        [(window, _)] = self.written
+        self.assertEqual((window['first_at'], window['last_at'], window['count']), (1000, 1004, 2))
+
+        self.debouncer.flush_all()
+        self.assertEqual(self.written[1][0]['first_at'], 1010)
+
+    def test_pairs_are_debounced_separately(self):
+        self.submit(1000, employee_id=1, camera_id=1)
+        self.submit(1001, employee_id=1, camera_id=2)
+        self.submit(1002, employee_id=2, camera_id=1)
+        self.assertEqual(self.debouncer.flush_all(), 3)
+        self.assertEqual(
+            sorted((window['employee_id'], window['camera_id']) for window, _ in self.written),
+            [(1, 1), (1, 2), (2, 1)],
+        )
+
+    def test_flush_expired_only_writes_closed_windows(self):
+        self.submit(1000, employee_id=1)
+        self.submit(1005, employee_id=2)
+        with mock.patch('apps.attendance.debounce.time.time', return_value=1012):
+            self.assertEqual(self.debouncer.flush_expired(), 1)
+        self.assertEqual([window['employee_id'] for window, _ in self.written], [1])
+        with mock.patch('apps.attendance.debounce.time.time', return_value=1015):
+            self.assertEqual(self.debouncer.flush_expired(), 1)
+        self.assertEqual(self.debouncer.flush_all(), 0)
+        self.assertEqual(len(self.written), 2)
+
+    def test_zero_window_writes_every_sighting(self):
+        self.debouncer.window_seconds = 0
+        self.submit(1000)
+        self.submit(1001)
+        self.assertEqual([window['count'] for window, _ in self.written], [1, 1])
+
+    def test_failed_write_does_not_stop_the_flush(self):
+        self.submit(1000, employee_id=1)
+        self.submit(1000, employee_id=2)
+        calls = []
+
+        def fail_first(window, image):
+            calls.append(window['employee_id'])
+            if len(calls) == 1:
+                raise RuntimeError('database is locked')
+
+        with mock.patch('apps.attendance.debounce.record_recognition', side_effect=fail_first), \
+                self.assertLogs('apps.attendance.debounce', 'ERROR'):
+            self.assertEqual(self.debouncer.flush_all(), 2)
+        self.assertEqual(len(calls), 2)
+
+
+class DebouncedWriteTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        sweeper = mock.patch.object(RecognitionDebouncer, '_start_sweeper')
+        sweeper.start()
+        self.addCleanup(sweeper.stop)
+        region = Region.objects.create(name='narxoz')
+        self.camera = Camera.objects.create(name='debounce-camera', region=region)
+        self.employee = Employee.objects.create(first_name='Debounce', last_name='Employee', region=region)
+        self.debouncer = RecognitionDebouncer(LocalDebounceBackend(), window_seconds=10)
+
+    def test_window_is_written_once_with_an_aware_timestamp(self):
+        start = timezone.now().timestamp()
+        for offset, distance in [(0, '0.70'), (2, '0.90'), (4, '0.80')]:
+            event = sighting(self.employee.pk, self.camera.pk, distance)
+            # A camera clock without an offset
+            event['timestamp'] = '2026-10-15T09:00:00'
+            with mock.patch('apps.attendance.debounce.time.time', return_value=start + offset):
+                self.debouncer.submit(event, fake_jpeg())
+        self.assertFalse(AttendanceRecord.objects.exists())
+
+        self.debouncer.flush_all()
+        stats = EmployeeCameraStats.objects.get()
+        self.assertEqual(stats.distance, '0.90')
+        self.assertTrue(timezone.is_aware(stats.timestamp))
+        self.assertEqual(timezone.localtime(stats.timestamp).hour, 9)
+        self.assertEqual(AttendanceRecord.objects.get().employee, self.employee)
@@ -0,0 +1,89 @@
+"""
+Requests signed with a device key: the signature covers the body, stale
+and replayed signatures are refused, and only camera keys post faces.
+"""
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from rest_framework.test import APIClient
+
+from apps.attendance.device_auth import key_store, sign_request, usage
+from apps.attendance.models import Camera, DeviceKey, Employee, Terminal
+from apps.attendance.synthetic import fake_jpeg
+
+PATH = '/api/v1/face-result/'
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    DEVICE_SIGNATURE_MAX_SKEW=60,
+)
+class DeviceSignatureTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.camera_key = DeviceKey.objects.create(camera=Camera.objects.create(name='signed-camera'))
+        self.terminal_key = DeviceKey.objects.create(terminal=Terminal.objects.create(name='signed-terminal'))
+        self.employee = Employee.objects.create(first_name='Signed', last_name='Employee')
+        self.client = APIClient(SERVER_NAME='localhost')
+        pool = mock.patch('apps.attendance.views.get_image_ingest_pool')
+        pool.start()
+        self.addCleanup(pool.stop)
+        self.addCleanup(key_store.invalidate, self.camera_key.key_id)
+        self.addCleanup(key_store.invalidate, self.terminal_key.key_id)
+
+    def body(self):
+        return encode_multipart(BOUNDARY, {
+            'file': SimpleUploadedFile('face.jpg', fake_jpeg(), 'image/jpeg'),
+            'user': str(self.employee.pk),
+            'cosine_similarity': '0.9',
+        })
+
+    def post(self, body, headers):
+        return self.client.generic('POST', PATH, body, content_type=MULTIPART_CONTENT, headers=headers)
+
+    def signed(self, key, body, **kwargs):
+        return sign_request(key.key_id, key.secret, 'POST', PATH, body, **kwargs)
+
+    def test_valid_signature_posts_for_the_camera(self):
+        body = self.body()
+        response = self.post(body, self.signed(self.camera_key, body))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['employee_id'], self.employee.pk)
+        self.assertEqual(usage([self.camera_key.key_id])[self.camera_key.key_id]['bytes'], len(body))
+
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=1024)
+    def test_body_larger_than_the_memory_limit_is_spooled(self):
+        body = self.body()
+        self.assertGreater(len(body), 1024)
+        self.assertEqual(self.post(body, self.signed(self.camera_key, body)).status_code, 200)
+
+    def test_wrong_secret_is_refused(self):
+        body = self.body()
+        headers = sign_request(self.camera_key.key_id, 'not-the-secret', 'POST', PATH, body)
+        self.assertEqual(self.post(body, headers).status_code, 401)
+
+    def test_changed_body_is_refused(self):
+        body = self.body()
+        headers = self.signed(self.camera_key, body)
+        self.assertEqual(self.post(body.replace(b'0.9', b'0.1'), headers).status_code, 401)
+
+    def test_stale_timestamp_is_refused(self):
+        body = self.body()
+        headers = self.signed(self.camera_key, body, timestamp=int(time.time()) - 120)
+        self.assertEqual(self.post(body, headers).status_code, 401)
+
+    def test_replayed_signature_is_refused(self):
+        body = self.body()
+        headers = self.signed(self.camera_key, body)
+        self.assertEqual(self.post(body, headers).status_code, 200)
+        response = self.post(body, headers)
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('Replayed', response.json()['detail'])
+
+    def test_terminal_key_cannot_post_faces(self):
+        body = self.body()
+        self.assertEqual(self.post(body, self.signed(self.terminal_key, body)).status_code, 403)
@@ -0,0 +1,74 @@
+"""
+Allocated employee ids never collide with ids that were given explicitly.
+"""
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from unittest import mock
+
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+
+from apps.attendance.importers import import_employees
+from apps.attendance.models import Employee, IdSequence
+from apps.attendance.synthetic import fake_jpeg
+
+
+class EmployeeIdTests(TestCase):
+    def create(self, employee_id=''):
+        return Employee.objects.create(first_name='Test', last_name='Employee', employee_id=employee_id)
+
+    def test_allocation_skips_an_explicit_id(self):
+        self.assertEqual(self.create().employee_id, 'EMP0001')
+        self.create('EMP0002')
+        self.assertEqual(self.create().employee_id, 'EMP0003')
+
+    def test_explicit_id_before_the_first_allocation(self):
+        self.create('EMP0010')
+        self.assertEqual(self.create().employee_id, 'EMP0011')
+
+    def test_lower_or_foreign_ids_leave_the_sequence_alone(self):
+        self.create('EMP0005')
+        self.create('EMP0003')
+        self.create('CONTRACTOR-7')
+        self.assertEqual(IdSequence.objects.get(name=Employee.EMPLOYEE_ID_SEQUENCE).last_value, 5)
+
+    def test_changing_the_id_of_an_employee_advances_the_sequence(self):
+        employee = self.create()
+        employee.employee_id = 'EMP0042'
+        employee.save()
+        self.assertEqual(self.create().employee_id, 'EMP0043')
+
+
+class EmployeeImportIdTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def run_import(self, *rows):
+        lines = ['first_name,last_name,employee_id,photos'] + [','.join(row) for row in rows]
+        photos = io.BytesIO()
+        with zipfile.ZipFile(photos, 'w') as archive:
+            archive.writestr('a.jpg', fake_jpeg())
+        photos.seek(0)
+        return import_employees(io.StringIO('\n'.join(lines)), photos)
+
+    def test_imported_ids_advance_the_sequence(self):
+        self.run_import(('Ann', 'One', '', ''), ('Bob', 'Two', 'EMP0005', ''))
+        self.assertEqual(
+            sorted(Employee.objects.values_list('employee_id', flat=True)), ['EMP0005', 'EMP0006'],
+        )
+        self.assertEqual(Employee.objects.create(first_name='C', last_name='D').employee_id, 'EMP0007')
+
+    def test_failed_import_removes_its_photos(self):
+        with mock.patch('apps.attendance.models.Image.objects.bulk_create', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.run_import(('Ann', 'One', '', 'a.jpg'))
+        self.assertFalse(Employee.objects.exists())
+        files = [name for _, _, names in os.walk(self.media_root) for name in names]
+        self.assertEqual(files, [])
@@ -0,0 +1,30 @@
+"""
+Encoding jobs do not need the encoder when there is nothing to encode, and
+fail clearly when it is not installed.
+"""
+from unittest import mock
+
+from django.test import TestCase
+
+from apps.attendance import face_encoding
+from apps.attendance.face_encoding import FaceEncoderUnavailable, FaceRecognitionEncoder
+from apps.attendance.tasks import encode_images_task
+
+ENCODER = 'apps.attendance.face_encoding.FaceRecognitionEncoder'
+
+
+class FaceEncodingTests(TestCase):
+    def test_nothing_to_encode_does_not_load_the_encoder(self):
+        with mock.patch.object(FaceRecognitionEncoder, 'check', side_effect=FaceEncoderUnavailable):
+            self.assertEqual(list(face_encoding._run_batches([], 2, ENCODER)), [])
+            self.assertEqual(face_encoding.compute_unknown_face_encodings(encoder_path=ENCODER), 0)
+
+    def test_missing_encoder_package_is_reported(self):
+        with mock.patch('importlib.util.find_spec', return_value=None):
+            with self.assertRaises(FaceEncoderUnavailable):
+                list(face_encoding._run_batches([[(1, '/nonexistent.jpg')]], 1, ENCODER))
+
+    def test_encode_task_logs_an_unavailable_encoder(self):
+        with mock.patch.object(face_encoding, 'compute_image_encodings', side_effect=FaceEncoderUnavailable("missing")):
+            with self.assertLogs('apps.attendance.tasks', 'WARNING'):
+                self.assertEqual(encode_images_task([1, 2]), 0)
@@ -0,0 +1,57 @@
+"""
+With the local backend every worker keeps its own device map; pings flushed
+by one worker reach the others through the database. A shared (Redis) map
+answers without queries. Device lists report online states from last_ping.
+"""
+from unittest import mock
+
+from django.test import TestCase
+
+from apps.attendance.heartbeats import HeartbeatRecorder, LocalHeartbeatBackend
+from apps.attendance.models import Camera
+
+
+class LocalHeartbeatTests(TestCase):
+    def test_other_workers_see_flushed_pings(self):
+        camera = Camera.objects.create(name='heartbeat-camera')
+        pinged = HeartbeatRecorder(LocalHeartbeatBackend(), flush_interval=10)
+        other = HeartbeatRecorder(LocalHeartbeatBackend(), flush_interval=10)
+        other.warm()
+
+        with mock.patch.object(pinged, '_start_flusher'):
+            self.assertTrue(pinged.ping('camera', camera.pk))
+        self.assertEqual(pinged.flush(), 1)
+
+        # Within the flush interval the other worker answers from its own map
+        self.assertEqual(other.fleet_status()['camera']['online'], 0)
+        other._reloaded_at -= 10
+        self.assertEqual(other.fleet_status()['camera']['online'], 1)
+
+
+class DeviceOnlineAnnotationTests(TestCase):
+    def test_devices_that_never_pinged_are_offline(self):
+        Camera.objects.create(name='never-pinged')
+        self.assertIs(Camera.objects.with_online().get(name='never-pinged').online, False)
+        self.assertEqual(Camera.objects.with_online().filter(online=False).count(), 1)
+
+
+class SharedMapBackend(LocalHeartbeatBackend):
+    """Stands in for the Redis backend: one map for every worker."""
+
+    shared = True
+
+
+class SharedHeartbeatTests(TestCase):
+    def test_fleet_status_is_served_from_the_shared_map(self):
+        camera = Camera.objects.create(name='shared-camera')
+        backend = SharedMapBackend()
+        pinged = HeartbeatRecorder(backend, flush_interval=10)
+        other = HeartbeatRecorder(backend, flush_interval=10)
+        pinged.warm()
+
+        with mock.patch.object(pinged, '_start_flusher'):
+            self.assertTrue(pinged.ping('camera', camera.pk))
+        other._reloaded_at -= 60
+        # Before any flush, and long after the last reload
+        with self.assertNumQueries(0):
+            self.assertEqual(other.fleet_status()['camera']['online'], 1)
@@ -0,0 +1,29 @@
+"""
+The metrics endpoint needs its token outside development, and the metrics
+middleware wraps all the others.
+"""
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+
+class MetricsEndpointTests(TestCase):
+    @override_settings(METRICS_TOKEN='scrape-token', DEBUG=False)
+    def test_token_is_required(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+
+    @override_settings(METRICS_TOKEN='', DEBUG=False)
+    def test_unset_token_denies_outside_debug(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+    @override_settings(METRICS_TOKEN='', DEBUG=True)
+    def test_unset_token_is_open_in_debug(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+
+class MiddlewareOrderTests(TestCase):
+    def test_metrics_middleware_runs_first(self):
+        self.assertEqual(settings.MIDDLEWARE[0], 'apps.attendance.metrics.RequestMetricsMiddleware')
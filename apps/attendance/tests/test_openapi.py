@@ -0,0 +1,88 @@
+"""
+api/schema/ serves the schema built by build_openapi_schema while it matches
+the code, and generates it per request otherwise.
+"""
+import io
+import json
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, override_settings
+
+from apps.attendance import openapi
+
+
+class OpenApiSchemaTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = Path(tempfile.mkdtemp())
+        cls._settings = override_settings(OPENAPI_SCHEMA_DIR=cls.directory, OPENAPI_SCHEMA_PRECOMPILED=True)
+        cls._settings.enable()
+        # Generating takes a second or two; build once and restore the record per test.
+        # drf-spectacular prints its warnings about the views to stderr
+        with mock.patch('sys.stderr', io.StringIO()):
+            call_command('build_openapi_schema', stdout=io.StringIO())
+        cls.record = (cls.directory / openapi.BUILD_FILE).read_text()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._settings.disable()
+        shutil.rmtree(cls.directory, ignore_errors=True)
+        openapi.status.cache_clear()
+        super().tearDownClass()
+
+    def setUp(self):
+        (self.directory / openapi.BUILD_FILE).write_text(self.record)
+        openapi.status.cache_clear()
+        self.addCleanup(openapi.status.cache_clear)
+        stderr = mock.patch('sys.stderr', io.StringIO())
+        stderr.start()
+        self.addCleanup(stderr.stop)
+
+    def write_record(self, **changes):
+        record = json.loads(self.record)
+        record.update(changes)
+        (self.directory / openapi.BUILD_FILE).write_text(json.dumps(record))
+        openapi.status.cache_clear()
+
+    def test_built_schema_matches_the_live_view(self):
+        with override_settings(OPENAPI_SCHEMA_PRECOMPILED=False):
+            live = self.client.get('/api/schema/')
+        self.assertEqual(live.status_code, 200)
+        self.assertEqual((self.directory / 'schema.yaml').read_bytes(), live.content)
+
+    def test_current_schema_redirects_to_the_static_file(self):
+        self.assertEqual(openapi.status(), 'current')
+        response = self.client.get('/api/schema/')
+        self.assertRedirects(response, '/static/openapi/schema.yaml', fetch_redirect_response=False)
+        response = self.client.get('/api/schema/', {'format': 'json'})
+        self.assertRedirects(response, '/static/openapi/schema.json', fetch_redirect_response=False)
+
+    def test_stale_schema_falls_back_to_live_generation(self):
+        self.write_record(fingerprint='0' * 64)
+        with self.assertLogs('apps.attendance.openapi', 'WARNING'):
+            self.assertEqual(openapi.check(), 'stale')
+        response = self.client.get('/api/schema/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'openapi:', response.content)
+
+    def test_missing_schema_falls_back_to_live_generation(self):
+        (self.directory / openapi.BUILD_FILE).unlink()
+        self.assertEqual(openapi.status(), 'missing')
+        self.assertEqual(self.client.get('/api/schema/').status_code, 200)
+
+    def test_fingerprint_follows_the_source(self):
+        fingerprint = openapi.source_fingerprint()
+        self.assertEqual(openapi.source_fingerprint(), fingerprint)
+        with mock.patch.object(Path, 'read_bytes', lambda path: b'changed'):
+            self.assertNotEqual(openapi.source_fingerprint(), fingerprint)
+
+    def test_check_option_fails_on_a_stale_schema(self):
+        call_command('build_openapi_schema', '--check', stdout=io.StringIO())
+        self.write_record(fingerprint='0' * 64)
+        with self.assertRaises(CommandError):
+            call_command('build_openapi_schema', '--check')
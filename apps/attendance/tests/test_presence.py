@@ -0,0 +1,114 @@
+"""
+Presence intervals follow the server times of sighting windows, and the
+daily check-out follows every sighting.
+"""
+import shutil
+import tempfile
+from datetime import datetime, time, timedelta
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from apps.attendance.ingest import record_recognition
+from apps.attendance.models import AttendanceRecord, Camera, Employee, PresenceInterval, Region
+from apps.attendance.presence import close_idle_intervals, sessionize
+from apps.attendance.synthetic import fake_jpeg
+
+GAP = timedelta(minutes=30)
+
+
+def at(hour, minute=0):
+    return timezone.make_aware(datetime(2026, 10, 15, hour, minute))
+
+
+class SessionizeTests(SimpleTestCase):
+    def test_gap_exit_and_open_interval(self):
+        sightings = [
+            (at(8, 50), 2, 'exit', 1),   # leaving before arriving is ignored
+            (at(9), 1, 'entry', 1),
+            (at(9, 20), 1, 'both', 1),
+            (at(10, 30), 1, 'both', 1),  # after the gap
+            (at(11), 2, 'exit', 1),
+            (at(13), 1, 'entry', 1),
+        ]
+        intervals = list(sessionize(sightings, gap=GAP))
+        self.assertEqual(
+            [(i['started_at'], i['ended_at'], i['sightings'], i['exit_camera_id']) for i in intervals],
+            [(at(9), at(9, 20), 2, None), (at(10, 30), at(11), 2, 2), (at(13), None, 1, None)],
+        )
+
+
+@override_settings(PRESENCE_SESSION_GAP=int(GAP.total_seconds()))
+class SessionizerTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.region = Region.objects.create(name='narxoz')
+        self.entry = Camera.objects.create(name='entry-camera', region=self.region, role='entry')
+        self.exit = Camera.objects.create(name='exit-camera', region=self.region, role='exit')
+        self.employee = Employee.objects.create(first_name='Present', last_name='Employee', region=self.region)
+
+    def window(self, first_at, last_at=None, camera=None, count=1):
+        camera = camera or self.entry
+        last_at = last_at or first_at
+        return record_recognition({
+            'employee_id': self.employee.pk, 'camera_id': camera.pk, 'camera_role': camera.role,
+            'region_id': self.region.pk, 'filial_id': None,
+            'first_at': first_at.timestamp(), 'last_at': last_at.timestamp(), 'count': count,
+            # A camera clock far off the server's must not move intervals
+            'distance': '0.9', 'file_name': 'face.jpg', 'timestamp': '2020-01-01T00:00:00',
+        }, fake_jpeg())
+
+    def intervals(self):
+        return list(PresenceInterval.objects.order_by('started_at').values_list(
+            'started_at', 'last_seen_at', 'ended_at', 'sightings'
+        ))
+
+    def test_check_out_follows_every_sighting(self):
+        record = self.window(at(9))
+        self.assertEqual((record.check_in, record.check_out), (time(9), None))
+        self.window(at(9, 5), at(9, 7), count=3)
+        record.refresh_from_db()
+        self.assertEqual((record.check_in, record.check_out), (time(9), time(9, 7)))
+        self.assertEqual(self.intervals(), [(at(9), at(9, 7), None, 4)])
+
+    def test_window_of_several_sightings_sets_check_out_on_arrival(self):
+        record = self.window(at(9), at(9, 0) + timedelta(seconds=8), count=2)
+        self.assertEqual(record.check_out, time(9, 0, 8))
+
+    def test_sighting_after_the_gap_closes_the_interval(self):
+        self.window(at(9))
+        self.window(at(9, 20))
+        self.window(at(11))
+        self.assertEqual(self.intervals(), [
+            (at(9), at(9, 20), at(9, 20), 2),
+            (at(11), at(11), None, 1),
+        ])
+        record = AttendanceRecord.objects.get()
+        self.assertEqual(record.presence_seconds, 20 * 60)
+        # Closing the earlier interval does not move check_out back
+        self.assertEqual(record.check_out, time(11))
+
+    def test_exit_camera_closes_the_interval(self):
+        self.window(at(9))
+        self.window(at(9, 25))
+        self.window(at(9, 50), camera=self.exit)
+        interval = PresenceInterval.objects.get()
+        self.assertEqual((interval.ended_at, interval.exit_camera, interval.sightings), (at(9, 50), self.exit, 3))
+        record = AttendanceRecord.objects.get()
+        self.assertEqual((record.check_out, record.presence_seconds), (time(9, 50), 50 * 60))
+
+    def test_exit_camera_without_an_open_interval_opens_none(self):
+        self.window(at(9), camera=self.exit)
+        self.assertEqual(self.intervals(), [])
+
+    def test_idle_intervals_close_at_the_last_sighting(self):
+        self.window(at(9))
+        self.window(at(9, 10))
+        self.assertEqual(close_idle_intervals(now=at(9, 30)), 0)
+        self.assertEqual(close_idle_intervals(now=at(9, 41)), 1)
+        self.assertEqual(self.intervals(), [(at(9), at(9, 10), at(9, 10), 2)])
+        self.assertEqual(AttendanceRecord.objects.get().presence_seconds, 600)
@@ -0,0 +1,273 @@
+"""
+Query-count budgets for every API route.
+
+Each route in ``apps/attendance/urls.py`` and ``apps/authentication/urls.py``
+is requested against a small and a large synthetic dataset (see
+``synthetic.py``). The number of SQL statements must stay within the
+route's budget and must not grow with the data, so a serializer field that
+follows an unselected relation (one query per row) fails the test. The two
+datasets differ in every table a list route reads, regions and filials too.
+
+A budget is the route's query shape, the statements it issues whatever the
+data, without slack: a new query fails the test until its budget is raised
+on purpose.
+
+A new route needs an entry in ``ROUTES`` (or in ``SKIPPED`` with a reason).
+"""
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from apps.attendance import urls as attendance_urls
+from apps.attendance.debounce import get_debouncer
+from apps.attendance.heartbeats import HeartbeatRecorder, LocalHeartbeatBackend
+from apps.attendance.models import (
+    Admin, AttendanceRecord, Camera, Employee, EmployeeCameraStats, Filial, Image,
+    PositionApi, Region, Terminal, UnknownFace, UnknownFaceCluster, WorkSchedule,
+)
+from apps.attendance.serializers import FilialSerializer, RegionSerializer, TerminalSerializer
+from apps.attendance.synthetic import PREFIX, fake_jpeg, generate
+from apps.authentication import urls as authentication_urls
+
+SMALL = dict(regions=2, filials=2, employees=6, days=2, stats_per_day=2, unknown_faces=4, image_pool=2)
+LARGE = dict(regions=5, filials=4, employees=40, days=4, stats_per_day=3, unknown_faces=30, image_pool=2)
+
+PASSWORD = 'Query-count-1'
+
+
+def _jpeg_upload(name='face.jpg'):
+    upload = io.BytesIO(fake_jpeg())
+    upload.name = name
+    return upload
+
+
+def _csv_upload():
+    upload = io.BytesIO(b'first_name,last_name\nAli,Valiyev\nVali,Aliyev\n')
+    upload.name = 'employees.csv'
+    return upload
+
+
+def get(path):
+    return lambda ctx: ('get', path.format(**ctx), {})
+
+
+# route -> (request builder, query budget). A builder gets the fixture ids
+# and returns (method, path, client kwargs).
+ROUTES = {
+    'employees/': (get('/api/v1/employees/'), 4),
+    'employees/<int:pk>/': (get('/api/v1/employees/{employee}/'), 4),
+    'employees/import/': (lambda ctx: ('post', '/api/v1/employees/import/', {
+        'data': {'file': _csv_upload(), 'dry_run': 'true'}, 'format': 'multipart',
+    }), 2),
+    'positions/': (get('/api/v1/positions/'), 1),
+    'positions/<int:pk>/': (lambda ctx: ('put', f"/api/v1/positions/{ctx['position']}/", {
+        'data': {'value': 'tester', 'label': 'Tester'}, 'format': 'json',
+    }), 3),
+    'regions/': (get('/api/v1/regions/'), 2),
+    'regions/<int:pk>/': (get('/api/v1/regions/{region}/'), 1),
+    'terminals/': (get('/api/v1/terminals/'), 2),
+    'terminals/<int:pk>/': (get('/api/v1/terminals/{terminal}/'), 1),
+    'cameras/': (get('/api/v1/cameras/'), 2),
+    'cameras/<int:pk>/': (get('/api/v1/cameras/{camera}/'), 1),
+    'attendance/': (get('/api/v1/attendance/'), 2),
+    'attendance/<int:pk>/': (get('/api/v1/attendance/{record}/'), 1),
+    'presence-intervals/': (get('/api/v1/presence-intervals/'), 1),
+    'admins/': (get('/api/v1/admins/'), 2),
+    'admins/<int:pk>/': (get('/api/v1/admins/{admin}/'), 1),
+    'images/': (get('/api/v1/images/'), 2),
+    'images/<int:pk>/': (get('/api/v1/images/{image}/'), 1),
+    'unknown-faces/': (get('/api/v1/unknown-faces/'), 2),
+    'unknown-faces/<int:pk>/': (get('/api/v1/unknown-faces/{unknown_face}/'), 1),
+    'unknown-face-clusters/': (get('/api/v1/unknown-face-clusters/'), 2),
+    'unknown-face-clusters/<int:pk>/': (get('/api/v1/unknown-face-clusters/{cluster}/'), 1),
+    'filials/': (get('/api/v1/filials/'), 2),
+    'filials/<int:pk>/': (get('/api/v1/filials/{filial}/'), 1),
+    'work-schedules/': (get('/api/v1/work-schedules/'), 2),
+    'work-schedules/<int:pk>/': (get('/api/v1/work-schedules/{schedule}/'), 1),
+    # camera, employee, schedule, today's record, insert, Region.update_counts
+    # (select, 3 counts, update), stats row, presence (exists, select, insert)
+    # and 6 savepoint statements
+    'face-result/': (lambda ctx: ('post', '/api/v1/face-result/', {
+        'data': {'file': _jpeg_upload(), 'user': ctx['employee'], 'cosine_similarity': '0.9'},
+        'format': 'multipart',
+    }), 20),
+    # a face of an employee who has today's record (its check_out moves), and an unknown face
+    'face-result/batch/': (lambda ctx: ('post', '/api/v1/face-result/batch/', {
+        'data': {
+            'file': [_jpeg_upload('a.jpg'), _jpeg_upload('b.jpg')],
+            'user': [ctx['employee'], 'unrecognized'],
+            'cosine_similarity': ['0.9', '0.3'],
+        },
+        'format': 'multipart',
+    }), 14),
+    'stats/attendance/': (get('/api/v1/stats/attendance/'), 1),
+    'dashboard/': (get('/api/v1/dashboard/'), 6),
+    'thumbnails/<int:size>/<path:name>': (get('/api/v1/thumbnails/100/{image_name}'), 0),
+    'heartbeat/': (lambda ctx: ('post', '/api/v1/heartbeat/', {
+        'data': {'device_type': 'camera', 'device_id': ctx['camera']}, 'format': 'json',
+    }), 2),
+    'stats/fleet/': (get('/api/v1/stats/fleet/'), 0),
+    'stats/image-storage/': (get('/api/v1/stats/image-storage/'), 1),
+    'stats/devices/': (get('/api/v1/stats/devices/'), 1),
+    'stats/ingest/': (get('/api/v1/stats/ingest/'), 0),
+    'link-unknown-face/': (lambda ctx: ('post', '/api/v1/link-unknown-face/', {
+        'data': {'unknown_face_id': ctx['unknown_face'], 'employee_id': ctx['employee']}, 'format': 'json',
+    }), 7),
+    'link-unknown-face-cluster/': (lambda ctx: ('post', '/api/v1/link-unknown-face-cluster/', {
+        'data': {'cluster_id': ctx['cluster'], 'employee_id': ctx['employee']}, 'format': 'json',
+    }), 10),
+    'employee-camera-stats/': (get('/api/v1/employee-camera-stats/?date={yesterday}'), 1),
+    'employee-camera-stats/<str:pk>/': (get('/api/v1/employee-camera-stats/{employee}/'), 1),
+    'upload-multiple-images/': (lambda ctx: ('post', '/api/v1/upload-multiple-images/', {
+        'data': {'employee_id': ctx['employee'], 'images': [_jpeg_upload('a.jpg'), _jpeg_upload('b.jpg')]},
+        'format': 'multipart',
+    }), 1),
+    'login/': (lambda ctx: ('post', '/api/v1/auth/login/', {
+        'data': {'username': ctx['user'].username, 'password': PASSWORD}, 'format': 'json',
+    }), 2),
+    'profile/': (get('/api/v1/auth/profile/'), 0),
+    'change-password/': (lambda ctx: ('post', '/api/v1/auth/change-password/', {
+        'data': {'old_password': PASSWORD, 'new_password': 'Query-count-2', 'confirm_password': 'Query-count-2'},
+        'format': 'json',
+    }), 6),
+    'logout/': (lambda ctx: ('post', '/api/v1/auth/logout/', {}), 1),
+}
+
+SKIPPED = {
+    'employees/import/<str:task_id>/': "reads the Celery result backend, not the database",
+    'events/stream/': "streams only under ASGI (test_async_views); the sync view answers 503",
+}
+
+# Routes that delete the user's tokens run last, each with a fresh token
+LAST = ['logout/', 'change-password/']
+
+
+class InlineIngestPool:
+    """Run ingestion stores in the request thread so their queries count."""
+
+    def submit(self, store, data, name):
+        store(data, name)
+        return True
+
+
+@override_settings(DEBUG=False)
+class QueryCountTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls._media = override_settings(MEDIA_ROOT=cls.media_root)
+        cls._media.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._media.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def fixture(self, size):
+        generate(**size)
+        employee = Employee.objects.filter(employee_id__startswith=f'{PREFIX.upper()}-').first()
+        camera = Camera.objects.filter(name__startswith=f'{PREFIX}-').first()
+        faces = list(UnknownFace.objects.filter(camera__name__startswith=f'{PREFIX}-'))
+        cluster = UnknownFaceCluster.objects.create(
+            region=camera.region, representative=faces[0], size=len(faces) - 1,
+            first_seen=timezone.now(), last_seen=timezone.now(),
+        )
+        UnknownFace.objects.filter(pk__in=[face.pk for face in faces[1:]]).update(cluster=cluster)
+        admin = Admin.objects.create(name='Admin', login=f'{PREFIX}-admin', password='x', region=camera.region)
+        image = Image.objects.filter(employee=employee).first()
+        user = User.objects.create_user(f'{PREFIX}-user', password=PASSWORD)
+        return {
+            'employee': employee.pk,
+            'region': camera.region_id,
+            'camera': camera.pk,
+            'terminal': Terminal.objects.filter(name__startswith=f'{PREFIX}-').first().pk,
+            'filial': Filial.objects.filter(value__startswith=f'{PREFIX}-').first().pk,
+            'schedule': WorkSchedule.objects.filter(region=camera.region).first().pk,
+            'record': AttendanceRecord.objects.filter(employee=employee).first().pk,
+            'image': image.pk,
+            'image_name': image.image.name,
+            'unknown_face': faces[0].pk,
+            'cluster': cluster.pk,
+            'admin': admin.pk,
+            'position': PositionApi.objects.create(value=f'{PREFIX}-position', label='Position').pk,
+            'yesterday': EmployeeCameraStats.objects.latest('timestamp').timestamp.date().isoformat(),
+            'user': user,
+        }
+
+    def measure(self, size):
+        """Query count per route for one dataset; the data is rolled back."""
+        counts = {}
+        savepoint = transaction.savepoint()
+        try:
+            ctx = self.fixture(size)
+            client = APIClient(SERVER_NAME='localhost')
+            debouncer = get_debouncer()
+            order = [route for route in ROUTES if route not in LAST] + LAST
+            # A fresh device map, seeded by the first ping and not reloaded while measuring
+            recorder = HeartbeatRecorder(LocalHeartbeatBackend(), flush_interval=3600)
+            with mock.patch('apps.attendance.views.get_image_ingest_pool', return_value=InlineIngestPool()), \
+                    mock.patch.object(debouncer, 'window_seconds', 0), \
+                    mock.patch('apps.attendance.heartbeats._recorder', recorder):
+                for route in order:
+                    method, path, kwargs = ROUTES[route][0](ctx)
+                    token, _ = Token.objects.get_or_create(user=ctx['user'])
+                    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+                    cache.clear()
+                    with CaptureQueriesContext(connection) as queries:
+                        response = getattr(client, method)(path, **kwargs)
+                    response.close()
+                    if response.status_code >= 400:
+                        self.fail(f'{route} returned {response.status_code}: {response.content[:300]!r}')
+                    counts[route] = len(queries)
+        finally:
+            transaction.savepoint_rollback(savepoint)
+        return counts
+
+    def test_every_route_has_a_budget(self):
+        routes = {str(pattern.pattern) for pattern in attendance_urls.urlpatterns + authentication_urls.urlpatterns}
+        self.assertEqual(routes - set(ROUTES) - set(SKIPPED), set(), "routes without a query budget")
+        self.assertEqual(set(ROUTES) - routes, set(), "budgets for routes that no longer exist")
+
+    def test_query_counts_stay_within_budget_and_do_not_grow(self):
+        small = self.measure(SMALL)
+        large = self.measure(LARGE)
+        for route, (_, budget) in ROUTES.items():
+            with self.subTest(route=route):
+                self.assertLessEqual(large[route], small[route], f'{route} grows with data: {small[route]} -> {large[route]}')
+                self.assertLessEqual(large[route], budget, f'{route} exceeds its budget')
+
+    def test_annotated_counts_match_the_per_object_counts(self):
+        generate(**SMALL)
+        today = timezone.localdate()
+        employees = Employee.objects.filter(employee_id__startswith=f'{PREFIX.upper()}-')
+        AttendanceRecord.objects.bulk_create([
+            AttendanceRecord(employee=employee, region=employee.region, date=today, status=status)
+            for employee, status in zip(employees, ['come', 'latecomers', 'not_come', 'come'])
+        ])
+        user = User.objects.create_user(f'{PREFIX}-user', password=PASSWORD)
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(user)
+        lists = [
+            ('/api/v1/regions/', RegionSerializer, Region.objects, ['employees_count', 'arrivals_count', 'latecomers_count', 'absentees_count']),
+            ('/api/v1/filials/', FilialSerializer, Filial.objects, ['terminals_count']),
+            ('/api/v1/terminals/', TerminalSerializer, Terminal.objects, ['employees_count']),
+        ]
+        for path, serializer_class, objects, fields in lists:
+            with self.subTest(path=path):
+                rows = client.get(path, {'page_size': 100}).json()['results']
+                self.assertTrue(rows)
+                for row in rows:
+                    expected = serializer_class(objects.get(pk=row['id'])).data
+                    self.assertEqual({f: row[f] for f in fields}, {f: expected[f] for f in fields})
@@ -0,0 +1,111 @@
+"""
+Recompute rebuilds records from camera events, keeps records edited by
+hand, and resumes an interrupted range from its checkpoint.
+"""
+import json
+import os
+import shutil
+import tempfile
+from datetime import date, datetime, time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.attendance import recompute
+from apps.attendance.models import AttendanceRecord, Camera, Employee, EmployeeCameraStats, PresenceInterval, Region
+
+DAY = date(2025, 10, 15)
+
+
+def at(day, hour, minute=0):
+    return timezone.make_aware(datetime.combine(day, time(hour, minute)))
+
+
+class RecomputeTests(TestCase):
+    def setUp(self):
+        self.region = Region.objects.create(name='narxoz')
+        self.camera = Camera.objects.create(name='recompute-camera', region=self.region)
+        self.employee = Employee.objects.create(
+            first_name='Recomputed', last_name='Employee', region=self.region, hire_date=date(2025, 1, 1),
+        )
+        self.absent = Employee.objects.create(
+            first_name='Absent', last_name='Employee', region=self.region, hire_date=date(2025, 1, 1),
+        )
+
+    def sight(self, when):
+        EmployeeCameraStats.objects.create(employee=self.employee, camera=self.camera, timestamp=when)
+
+    def test_records_are_rebuilt_from_events(self):
+        self.sight(at(DAY, 8, 55))
+        self.sight(at(DAY, 9, 10))
+        self.sight(at(DAY, 17, 30))
+        AttendanceRecord.objects.create(
+            employee=self.employee, region=self.region, date=DAY, status='not_come',
+        )
+        self.assertEqual(recompute.recompute_day(DAY), 3)
+
+        record = AttendanceRecord.objects.get(employee=self.employee, date=DAY)
+        self.assertEqual(
+            (record.check_in, record.check_out, record.status, record.camera),
+            (time(8, 55), time(17, 30), 'come', self.camera),
+        )
+        self.assertEqual(record.presence_seconds, 15 * 60)
+        self.assertEqual(PresenceInterval.objects.filter(date=DAY).count(), 2)
+        self.assertEqual(AttendanceRecord.objects.get(employee=self.absent, date=DAY).status, 'not_come')
+
+    def test_manually_edited_record_is_kept(self):
+        self.sight(at(DAY, 8, 55))
+        self.sight(at(DAY, 17, 30))
+        record = AttendanceRecord.objects.create(employee=self.employee, region=self.region, date=DAY, status='come')
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(User.objects.create_user('editor'))
+        response = client.patch(
+            f'/api/v1/attendance/{record.pk}/',
+            {'employee_id': self.employee.pk, 'check_in': '09:30', 'status': 'latecomers', 'notes': 'Badge at 09:30'},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['is_manual'])
+
+        recompute.recompute_day(DAY)
+        record.refresh_from_db()
+        self.assertEqual((record.check_in, record.check_out, record.status), (time(9, 30), None, 'latecomers'))
+
+    def test_checkpoint_resumes_after_a_failed_chunk(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        checkpoint = os.path.join(directory, 'recompute.json')
+        days = [date(2025, 10, day) for day in range(13, 17)]
+        for day in days:
+            self.sight(at(day, 9))
+
+        real = recompute.recompute_days
+        calls = []
+
+        def fail_second_chunk(chunk, batch_size):
+            calls.append(chunk[0])
+            if len(calls) == 2:
+                raise RuntimeError('connection lost')
+            return real(chunk, batch_size)
+
+        with mock.patch.object(recompute, 'recompute_days', side_effect=fail_second_chunk), \
+                self.assertRaises(RuntimeError):
+            recompute.recompute_range(days[0], days[-1], chunk_days=2, checkpoint=checkpoint)
+        with open(checkpoint) as f:
+            self.assertEqual(json.load(f), {'done': ['2025-10-13']})
+
+        progress = mock.Mock()
+        with mock.patch.object(recompute, 'recompute_days', side_effect=fail_second_chunk):
+            self.assertEqual(
+                recompute.recompute_range(days[0], days[-1], chunk_days=2, checkpoint=checkpoint, progress=progress),
+                (2, 2),
+            )
+        self.assertEqual(calls, [date(2025, 10, 13), date(2025, 10, 15), date(2025, 10, 15)])
+        progress.assert_called_once_with(date(2025, 10, 15), 2, 2, 2, 2)
+        self.assertEqual(recompute.load_checkpoint(checkpoint), {'2025-10-13', '2025-10-15'})
+        self.assertEqual(
+            AttendanceRecord.objects.filter(employee=self.employee, status='come').count(), len(days),
+        )
@@ -0,0 +1,71 @@
+"""
+Cached reference lists are answered without queries until a change that
+they show, and attendance writes leave the device lists cached.
+"""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.attendance.models import AttendanceRecord, Camera, Employee, Region, Terminal
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.region = Region.objects.create(name='narxoz', label='Narxoz')
+        self.camera = Camera.objects.create(name='cache-camera', region=self.region)
+        Terminal.objects.create(name='cache-terminal', region=self.region)
+        self.employee = Employee.objects.create(first_name='Cache', last_name='Employee', region=self.region)
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.force_authenticate(User.objects.create_user('cache'))
+
+    def get(self, path, **headers):
+        response = self.client.get(path, headers=headers)
+        self.assertIn(response.status_code, (200, 304))
+        return response
+
+    def assertCached(self, path):
+        with self.assertNumQueries(0):
+            return self.get(path)
+
+    def test_repeated_request_is_served_from_the_cache(self):
+        first = self.get('/api/v1/cameras/')
+        self.assertEqual(self.assertCached('/api/v1/cameras/').json(), first.json())
+        with self.assertNumQueries(0):
+            response = self.get('/api/v1/cameras/', **{'If-None-Match': first['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_change_to_a_listed_model_invalidates(self):
+        self.get('/api/v1/cameras/')
+        Camera.objects.create(name='cache-camera-2', region=self.region)
+        self.assertEqual(self.get('/api/v1/cameras/').json()['count'], 2)
+
+    def test_region_label_invalidates_the_device_lists(self):
+        self.get('/api/v1/cameras/')
+        self.region.label = 'Renamed'
+        self.region.save()
+        self.assertEqual(self.get('/api/v1/cameras/').json()['results'][0]['region_name'], 'Renamed')
+
+    def test_attendance_record_keeps_device_lists_cached(self):
+        for path in ['/api/v1/cameras/', '/api/v1/terminals/', '/api/v1/regions/']:
+            self.get(path)
+        AttendanceRecord.objects.create(
+            employee=self.employee, camera=self.camera, region=self.region,
+            date=timezone.localdate(), status='come',
+        )
+        self.assertCached('/api/v1/cameras/')
+        self.assertCached('/api/v1/terminals/')
+        # The region list shows today's arrivals
+        self.assertEqual(self.get('/api/v1/regions/').json()['results'][0]['arrivals_count'], 1)
+
+    def test_check_out_update_keeps_the_region_list_cached(self):
+        record = AttendanceRecord.objects.create(
+            employee=self.employee, region=self.region, date=timezone.localdate(), status='come',
+        )
+        self.get('/api/v1/regions/')
+        record.check_out = timezone.localtime().time()
+        record.save(update_fields=['check_out', 'updated_at'])
+        self.assertCached('/api/v1/regions/')
@@ -0,0 +1,76 @@
+"""
+Employee search matches substrings like the icontains search it replaced,
+on every backend, and ranks the matches.
+"""
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from rest_framework.test import APIClient
+
+from apps.attendance.models import Employee
+from apps.attendance.search import FTS_TABLE, contains_terms, install_sqlite_fts, search_employees
+
+
+class EmployeeSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for first_name, last_name, email in [
+            ('Azamat', 'Karimov', 'azamat@example.uz'),
+            ('Bobur', 'Azimov', 'bobur@example.uz'),
+            ('Dilnoza', 'Rahimova', 'dilnoza@example.uz'),
+            ('Karim', 'Karimov', 'karim.karimov@example.uz'),
+        ]:
+            Employee.objects.create(first_name=first_name, last_name=last_name, email=email)
+
+    def setUp(self):
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.force_authenticate(User.objects.create_user('search'))
+
+    def search(self, query):
+        response = self.client.get('/api/v1/employees/', {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [row['employee_id'] for row in response.json()['results']]
+
+    def test_matches_what_icontains_matches(self):
+        for query in ['0001', 'za', 'zam', 'KARIM', 'mov', 'az 0003', 'a.uz', 'rah imo', 'nobody']:
+            with self.subTest(query=query):
+                expected = Employee.objects.filter(contains_terms(query.split()))
+                self.assertCountEqual(self.search(query), expected.values_list('employee_id', flat=True))
+
+    def test_substrings_inside_words(self):
+        self.assertEqual(self.search('0001'), ['EMP0001'])
+        self.assertIn('EMP0001', self.search('za'))
+        self.assertEqual(self.search('zamat'), ['EMP0001'])
+
+    def test_better_matches_come_first(self):
+        self.assertEqual(self.search('karim')[0], 'EMP0004')
+
+    @skipUnless(connection.vendor == 'sqlite', "SQLite FTS5 index")
+    def test_sqlite_ranks_in_a_join(self):
+        sql = str(search_employees(Employee.objects.all(), ['karim']).query)
+        self.assertIn(f'{FTS_TABLE} MATCH', sql)
+        self.assertEqual(sql.count('MATCH'), 1)
+
+    @skipUnless(connection.vendor == 'postgresql', "pg_trgm indexes")
+    def test_postgresql_ranks_by_similarity(self):
+        ranked = search_employees(Employee.objects.all(), ['karim'])
+        self.assertEqual(ranked.order_by('-search_rank').first().employee_id, 'EMP0004')
+
+
+@skipUnless(connection.vendor == 'sqlite', "SQLite FTS5 index")
+class SqliteSearchIndexTests(TransactionTestCase):
+    # Virtual tables cannot be dropped inside the test transaction
+
+    def test_prefix_index_is_replaced(self):
+        Employee.objects.create(first_name='Azamat', last_name='Karimov')
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE {FTS_TABLE}")
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(first_name, last_name, employee_id, email, "
+                f"content='attendance_employee', content_rowid='id', tokenize='unicode61', prefix='2 3')"
+            )
+        install_sqlite_fts(connection)
+        found = search_employees(Employee.objects.all(), ['zamat'])
+        self.assertEqual([employee.first_name for employee in found], ['Azamat'])
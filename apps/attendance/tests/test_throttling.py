@@ -0,0 +1,56 @@
+"""
+Face-result token buckets: a face costs a token in every bucket, and
+requests without a device key only share the global bucket by default.
+"""
+from django.test import SimpleTestCase, override_settings
+
+from apps.attendance.throttling import IngestBatchTooLarge, IngestThrottler, LocalTokenBucketBackend
+
+
+class FailingBackend:
+    def take(self, *args):
+        raise ConnectionError("redis is down")
+
+    count = drops = take
+
+
+@override_settings(
+    INGEST_CAMERA_RATE=1, INGEST_CAMERA_BURST=10,
+    INGEST_CLIENT_RATE=0, INGEST_CLIENT_BURST=10,
+    INGEST_GLOBAL_RATE=100, INGEST_GLOBAL_BURST=100,
+)
+class IngestThrottlerTests(SimpleTestCase):
+    def setUp(self):
+        self.throttler = IngestThrottler(LocalTokenBucketBackend())
+
+    def test_batches_pay_one_token_per_face(self):
+        self.assertIsNone(self.throttler.take('camera:1', 6))
+        wait = self.throttler.take('camera:1', 6)
+        self.assertAlmostEqual(wait, 2, delta=0.1)
+        self.assertEqual(self.throttler.drops()['camera'], 1)
+
+    def test_batch_larger_than_the_bucket_is_rejected(self):
+        with self.assertRaises(IngestBatchTooLarge):
+            self.throttler.take('camera:1', 11)
+        self.assertEqual(self.throttler.drops()['too_large'], 1)
+
+    def test_requests_without_a_device_key_share_the_global_bucket(self):
+        for _ in range(10):
+            self.assertIsNone(self.throttler.take('client:edge', 10))
+        self.assertIsNotNone(self.throttler.take('client:edge', 1))
+        self.assertEqual(self.throttler.drops()['global'], 1)
+
+    @override_settings(INGEST_CLIENT_RATE=1)
+    def test_client_rate_limits_each_user(self):
+        self.assertIsNone(self.throttler.take('client:edge', 10))
+        self.assertIsNotNone(self.throttler.take('client:edge', 1))
+        self.assertIsNone(self.throttler.take('client:other', 1))
+        self.assertEqual(self.throttler.drops()['client'], 1)
+
+    def test_failed_backend_falls_back_to_local_buckets(self):
+        throttler = IngestThrottler(FailingBackend())
+        with self.assertLogs('apps.attendance.throttling', 'WARNING') as logs:
+            self.assertIsNone(throttler.take('camera:1', 10))
+            self.assertIsNotNone(throttler.take('camera:1', 1))
+        # Logged once, not on every request
+        self.assertEqual(len(logs.records), 1)
@@ -0,0 +1,54 @@
+"""
+Thumbnail links are built without touching the storage, and the thumbnail
+view only serves photos from the upload directories.
+"""
+import shutil
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+
+from apps.attendance.synthetic import fake_jpeg
+from apps.attendance.thumbnails import thumbnail_name, thumbnail_url
+
+
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root, THUMBNAIL_SIZES=[50, 100])
+        media.enable()
+        self.addCleanup(media.disable)
+        self.name = default_storage.save('employee_images/face.jpg', ContentFile(fake_jpeg()))
+
+    def test_url_does_not_touch_the_storage(self):
+        with mock.patch.object(default_storage, 'exists') as exists:
+            url = thumbnail_url(SimpleNamespace(name=self.name), 50)
+        exists.assert_not_called()
+        self.assertEqual(url, f'/api/v1/thumbnails/50/{self.name}')
+
+    def test_view_builds_once_and_redirects(self):
+        thumb = thumbnail_name(self.name, 100)
+        response = self.client.get(f'/api/v1/thumbnails/100/{self.name}')
+        self.assertRedirects(response, f'/media/{thumb}', fetch_redirect_response=False)
+        self.assertIn('max-age', response['Cache-Control'])
+        self.assertTrue(default_storage.exists(thumb))
+
+        with mock.patch('apps.attendance.thumbnails.default_storage.open') as source:
+            self.assertEqual(self.client.get(f'/api/v1/thumbnails/100/{self.name}').status_code, 302)
+        source.assert_not_called()
+
+    def test_only_photo_directories_are_served(self):
+        default_storage.save('imports/people.jpg', ContentFile(fake_jpeg()))
+        for name in [
+            'imports/people.jpg',
+            thumbnail_name(self.name, 50),
+            'employee_images/../imports/people.jpg',
+            'employee_images/missing.jpg',
+        ]:
+            with self.subTest(name=name):
+                self.assertEqual(self.client.get(f'/api/v1/thumbnails/50/{name}').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/v1/thumbnails/60/{self.name}').status_code, 404)
@@ -0,0 +1,78 @@
+"""
+Work days are validated on the model, and stored values that are not
+weekday numbers do not break classification. Arrivals are dated and
+classified on the local clock.
+"""
+import shutil
+import tempfile
+from datetime import datetime, time
+
+from django.core.exceptions import ValidationError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.attendance.ingest import record_recognition
+from apps.attendance.models import AttendanceRecord, Camera, Employee, Region, WorkSchedule
+from apps.attendance.serializers import WorkScheduleSerializer
+from apps.attendance.synthetic import fake_jpeg
+
+
+class WorkdaysTests(TestCase):
+    def schedule(self, workdays):
+        return WorkSchedule(name='Office', start_time=time(9), end_time=time(18), workdays=workdays)
+
+    def test_model_validation_rejects_day_names(self):
+        with self.assertRaises(ValidationError):
+            self.schedule('Mon,Tue').full_clean()
+        self.schedule('1, 2,3').full_clean()
+
+    def test_serializer_uses_the_model_validation(self):
+        data = {'name': 'Office', 'start_time': '09:00', 'end_time': '18:00'}
+        self.assertFalse(WorkScheduleSerializer(data={**data, 'workdays': '1,8'}).is_valid())
+        serializer = WorkScheduleSerializer(data={**data, 'workdays': ' 1, 2 '})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(serializer.validated_data['workdays'], '1,2')
+
+    def test_bad_stored_tokens_are_skipped(self):
+        self.assertEqual(self.schedule('Mon,2, 3,9').workday_numbers, {2, 3})
+
+
+class ArrivalClockTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.region = Region.objects.create(name='narxoz')
+        self.camera = Camera.objects.create(name='clock-camera', region=self.region)
+        self.employee = Employee.objects.create(first_name='Early', last_name='Bird', region=self.region)
+        WorkSchedule.objects.create(
+            name='Office', region=self.region, start_time=time(9), end_time=time(18), grace_minutes=0,
+            workdays='1,2,3,4,5,6,7',
+        )
+
+    def arrive(self, local):
+        at = timezone.make_aware(local)
+        return record_recognition({
+            'employee_id': self.employee.pk, 'camera_id': self.camera.pk, 'camera_role': 'entry',
+            'region_id': self.region.pk, 'filial_id': None,
+            'first_at': at.timestamp(), 'last_at': at.timestamp(), 'count': 1,
+            'distance': '0.9', 'file_name': 'face.jpg', 'timestamp': at.isoformat(),
+        }, fake_jpeg())
+
+    def test_arrival_after_local_midnight_is_on_the_local_day(self):
+        record = self.arrive(datetime(2026, 10, 15, 2, 30))
+        self.assertEqual((record.date.isoformat(), record.check_in), ('2026-10-15', time(2, 30)))
+        self.assertEqual(record.status, 'come')
+
+    def test_stored_check_in_matches_the_lateness_decision(self):
+        record = self.arrive(datetime(2026, 10, 15, 9, 30))
+        self.assertEqual((record.check_in, record.status), (time(9, 30), 'latecomers'))
+
+    def test_arrival_after_the_absentee_job_takes_the_local_check_in(self):
+        AttendanceRecord.objects.create(
+            employee=self.employee, region=self.region, date=datetime(2026, 10, 15).date(), status='not_come',
+        )
+        record = self.arrive(datetime(2026, 10, 15, 8, 45))
+        self.assertEqual((record.check_in, record.status), (time(8, 45), 'come'))
@@ -0,0 +1,279 @@
+"""
+Throttling and backpressure for face-result ingestion.
+
+Every face costs one token from two buckets: one per source and one shared
+by all sources. The source is the camera of a device-signed request
+(``INGEST_CAMERA_*``), or the authenticated user otherwise
+(``INGEST_CLIENT_*``, off by default because edge devices without their
+own key share one user token). Buckets refill at ``INGEST_*_RATE`` faces
+per second up to ``INGEST_*_BURST``. A request is let through only if every
+bucket holds a token per face, otherwise it gets 429 with ``Retry-After``;
+a batch with more faces than a bucket can ever hold gets 413. Buckets live
+in Redis (``redis`` backend, shared by every worker) or in this process
+(``local`` backend). When Redis is unreachable the local buckets are used
+for ``FALLBACK_SECONDS``, so ingestion keeps a per-process limit.
+
+Independently of the buckets, a worker whose image ingest pool already
+holds ``INGEST_BACKPRESSURE_DEPTH`` crops answers 503 with ``Retry-After``
+instead of storing more crops in the request thread.
+
+Rejected requests are counted per reason (``camera``, ``client``,
+``global``, ``too_large``, ``backpressure``). The counters and the queue depth are served by
+``stats/ingest/`` and on ``/metrics``.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from rest_framework import exceptions, status
+from rest_framework.throttling import BaseThrottle
+
+from .image_ingest import get_image_ingest_pool
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+REASONS = ('camera', 'client', 'global', 'too_large', 'backpressure')
+
+
+class LocalTokenBucketBackend:
+    """Buckets and drop counters kept in dicts of this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._drops = Counter()
+
+    def take(self, buckets, cost, now):
+        """
+        Take ``cost`` tokens from every ``(key, rate, burst)`` bucket, or
+        from none of them. Returns ``None`` on success, else the index of
+        the emptiest bucket and the seconds until it holds enough tokens.
+        """
+        with self._lock:
+            levels = []
+            denied = None
+            for i, (key, rate, burst) in enumerate(buckets):
+                tokens, at = self._buckets.get(key, (burst, now))
+                tokens = min(burst, tokens + max(0.0, now - at) * rate)
+                levels.append(tokens)
+                if tokens < cost:
+                    wait = (cost - tokens) / rate
+                    if denied is None or wait > denied[1]:
+                        denied = (i, wait)
+            if denied is not None:
+                return denied
+            for (key, _, _), tokens in zip(buckets, levels):
+                self._buckets[key] = (tokens - cost, now)
+        return None
+
+    def count(self, reason):
+        with self._lock:
+            self._drops[reason] += 1
+
+    def drops(self):
+        with self._lock:
+            return {reason: self._drops[reason] for reason in REASONS}
+
+
+class RedisTokenBucketBackend:
+    """Buckets and drop counters in Redis, shared by every worker."""
+
+    PREFIX = 'ingest-bucket:'
+    DROPS_KEY = 'ingest:drops'
+
+    # KEYS are the buckets; ARGV is now, cost, then rate and burst per bucket.
+    # Returns '' when the tokens were taken, else "<index> <wait seconds>".
+    SCRIPT = """
+    local now = tonumber(ARGV[1])
+    local cost = tonumber(ARGV[2])
+    local levels = {}
+    local denied, longest = nil, -1
+    for i, key in ipairs(KEYS) do
+        local rate = tonumber(ARGV[1 + 2 * i])
+        local burst = tonumber(ARGV[2 + 2 * i])
+        local state = redis.call('HMGET', key, 'tokens', 'at')
+        local tokens = tonumber(state[1]) or burst
+        local at = tonumber(state[2]) or now
+        tokens = math.min(burst, tokens + math.max(0, now - at) * rate)
+        levels[i] = tokens
+        if tokens < cost and (cost - tokens) / rate > longest then
+            denied, longest = i - 1, (cost - tokens) / rate
+        end
+    end
+    if denied then
+        return denied .. ' ' .. longest
+    end
+    for i, key in ipairs(KEYS) do
+        local rate = tonumber(ARGV[1 + 2 * i])
+        local burst = tonumber(ARGV[2 + 2 * i])
+        redis.call('HSET', key, 'tokens', levels[i] - cost, 'at', now)
+        redis.call('EXPIRE', key, math.ceil(burst / rate) + 1)
+    end
+    return ''
+    """
+
+    def __init__(self, url=None):
+        import redis
+        self.client = redis.Redis.from_url(url or settings.REDIS_URL)
+        self._take = self.client.register_script(self.SCRIPT)
+
+    def take(self, buckets, cost, now):
+        args = [repr(now), cost]
+        for _, rate, burst in buckets:
+            args += [repr(float(rate)), repr(float(burst))]
+        result = self._take(keys=[f'{self.PREFIX}{key}' for key, _, _ in buckets], args=args)
+        if not result:
+            return None
+        index, wait = result.decode().split()
+        return int(index), float(wait)
+
+    def count(self, reason):
+        self.client.hincrby(self.DROPS_KEY, reason, 1)
+
+    def drops(self):
+        counts = self.client.hgetall(self.DROPS_KEY)
+        return {reason: int(counts.get(reason.encode(), 0)) for reason in REASONS}
+
+
+class IngestBackpressure(exceptions.APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Ingestion queue is full, retry later.'
+    default_code = 'ingest_backpressure'
+
+    def __init__(self, wait):
+        super().__init__()
+        # The exception handler turns ``wait`` into a Retry-After header
+        self.wait = wait
+
+
+class IngestBatchTooLarge(exceptions.APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_code = 'ingest_batch_too_large'
+
+    def __init__(self, limit):
+        super().__init__(f'At most {limit} faces per request.')
+
+
+class IngestThrottler:
+    # Seconds the local buckets stand in after the Redis backend failed
+    FALLBACK_SECONDS = 30
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.fallback = backend if isinstance(backend, LocalTokenBucketBackend) else LocalTokenBucketBackend()
+        self._fallback_until = 0.0
+
+    def buckets(self, source):
+        """``(key, rate, burst, reason)`` of the buckets a face from ``source`` draws from."""
+        buckets = []
+        if source.startswith('camera:'):
+            rate, burst, reason = settings.INGEST_CAMERA_RATE, settings.INGEST_CAMERA_BURST, 'camera'
+        else:
+            rate, burst, reason = settings.INGEST_CLIENT_RATE, settings.INGEST_CLIENT_BURST, 'client'
+        if rate > 0:
+            buckets.append((source, rate, burst, reason))
+        if settings.INGEST_GLOBAL_RATE > 0:
+            buckets.append(('global', settings.INGEST_GLOBAL_RATE, settings.INGEST_GLOBAL_BURST, 'global'))
+        return buckets
+
+    def _call(self, method, *args):
+        if self.backend is not self.fallback and time.monotonic() >= self._fallback_until:
+            try:
+                return getattr(self.backend, method)(*args)
+            except Exception as e:
+                self._fallback_until = time.monotonic() + self.FALLBACK_SECONDS
+                logger.warning(f"Ingest throttle backend failed, using local buckets for {self.FALLBACK_SECONDS}s: {e}")
+        return getattr(self.fallback, method)(*args)
+
+    def take(self, source, cost):
+        """Seconds to wait before retrying, or ``None`` if the faces may be ingested."""
+        buckets = self.buckets(source)
+        if not buckets:
+            return None
+        limit = min(burst for _, _, burst, _ in buckets)
+        if cost > limit:
+            # Waiting would not help: the bucket never holds that many tokens
+            self.count('too_large')
+            raise IngestBatchTooLarge(limit)
+        denied = self._call('take', [bucket[:3] for bucket in buckets], cost, time.time())
+        if denied is None:
+            return None
+        index, wait = denied
+        self.count(buckets[index][3])
+        return wait
+
+    def check_backpressure(self):
+        """Seconds to wait before retrying, or ``None`` if the ingest pool has room."""
+        limit = settings.INGEST_BACKPRESSURE_DEPTH
+        if limit and get_image_ingest_pool().depth >= limit:
+            self.count('backpressure')
+            return settings.INGEST_BACKPRESSURE_RETRY_AFTER
+        return None
+
+    def count(self, reason):
+        self._call('count', reason)
+
+    def drops(self):
+        return self._call('drops')
+
+    def stats(self):
+        pool = get_image_ingest_pool()
+        return {
+            'queue_depth': pool.depth,
+            'queue_size': pool.queue_size,
+            'backpressure_depth': settings.INGEST_BACKPRESSURE_DEPTH,
+            'drops': self.drops(),
+        }
+
+
+_throttler = None
+_throttler_lock = threading.Lock()
+
+
+def get_ingest_throttler():
+    global _throttler
+    with _throttler_lock:
+        if _throttler is None:
+            if settings.INGEST_THROTTLE_BACKEND == 'redis':
+                backend = RedisTokenBucketBackend()
+            else:
+                backend = LocalTokenBucketBackend()
+            _throttler = IngestThrottler(backend)
+    return _throttler
+
+
+class IngestThrottle(BaseThrottle):
+    """DRF throttle of the face-result views; a batch costs one token per face."""
+
+    def allow_request(self, request, view):
+        throttler = get_ingest_throttler()
+        wait = throttler.check_backpressure()
+        if wait is not None:
+            raise IngestBackpressure(wait)
+
+        camera_id = getattr(request.user, 'camera_id', None)
+        source = f'camera:{camera_id}' if camera_id else f'client:{request.user.username}'
+        cost = max(1, len(request.FILES.getlist('file')))
+        self._wait = throttler.take(source, cost)
+        return self._wait is None
+
+    def wait(self):
+        return self._wait
+
+
+def _collect_metrics():
+    throttler = get_ingest_throttler()
+    stats = throttler.stats()
+    yield '# HELP ingest_queue_depth Face crops queued in the image ingest pool'
+    yield '# TYPE ingest_queue_depth gauge'
+    yield f'ingest_queue_depth {stats["queue_depth"]}'
+    yield '# HELP ingest_dropped_total Face-result requests rejected by throttling or backpressure'
+    yield '# TYPE ingest_dropped_total counter'
+    for reason, count in stats['drops'].items():
+        yield f'ingest_dropped_total{{reason="{reason}"}} {count}'
+
+
+registry.add_collector(_collect_metrics)
@@ -0,0 +1,76 @@
+"""
+Square JPEG thumbnails of stored face photos.
+
+A thumbnail of ``employee_images/a.png`` at size 100 is stored as
+``thumbs/100/employee_images/a.jpg`` in the default storage, so its name
+can be derived without a lookup. Thumbnails are made in the background
+when a photo is saved (``enqueue_thumbnails``). Serialized rows link to
+``ThumbnailView``, which redirects to the stored thumbnail and builds it
+first if it does not exist yet, so listing rows never touches the storage.
+Only photos under ``THUMBNAIL_SOURCE_DIRS`` get thumbnails.
+"""
+import io
+import logging
+import os
+import posixpath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from PIL import Image as PILImage, ImageOps
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_PREFIX = 'thumbs'
+# upload_to of Image.image, AttendanceRecord.face_image and UnknownFace.face_image
+THUMBNAIL_SOURCE_DIRS = ('employee_images/', 'attendance_faces/', 'unknown_faces/')
+
+
+def is_thumbnail_source(name):
+    """Whether ``name`` is a stored photo thumbnails may be made of."""
+    return posixpath.normpath(name) == name and name.startswith(THUMBNAIL_SOURCE_DIRS)
+
+
+def thumbnail_name(name, size):
+    root, _ = os.path.splitext(name)
+    return f'{THUMBNAIL_PREFIX}/{size}/{root}.jpg'
+
+
+def make_thumbnail(name, size):
+    """Create the thumbnail of ``name`` unless it exists. Returns its storage name."""
+    thumb = thumbnail_name(name, size)
+    if default_storage.exists(thumb):
+        return thumb
+    with default_storage.open(name, 'rb') as f:
+        image = PILImage.open(f)
+        image = ImageOps.exif_transpose(image).convert('RGB')
+    image = ImageOps.fit(image, (size, size), PILImage.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=settings.THUMBNAIL_QUALITY, optimize=True)
+    saved = default_storage.save(thumb, ContentFile(buffer.getvalue()))
+    if saved != thumb:
+        # Another worker created it first
+        default_storage.delete(saved)
+    return thumb
+
+
+def make_thumbnails(names, sizes=None):
+    """Create every configured size of ``names``. Returns the number created or found."""
+    done = 0
+    for name in names:
+        for size in sizes or settings.THUMBNAIL_SIZES:
+            try:
+                make_thumbnail(name, size)
+                done += 1
+            except Exception as e:
+                logger.error(f"Could not create thumbnail of {name} at {size}px: {e}")
+    return done
+
+
+def thumbnail_url(file, size=None):
+    """URL of the thumbnail of an image field value, served by ``ThumbnailView``."""
+    if not file:
+        return None
+    size = size or settings.THUMBNAIL_SIZES[-1]
+    return reverse('thumbnail', kwargs={'size': size, 'name': file.name})
@@ -1,10 +1,19 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+if settings.ASYNC_VIEWS:
+    # ASGI deployments serve ingestion and the dashboard from async views
+    from . import async_views as ingest_views
+else:
+    ingest_views = views
+
 urlpatterns = [
     # Employee URLs
     path('employees/', views.EmployeeListCreateView.as_view(), name='employee-list'),
     path('employees/<int:pk>/', views.EmployeeDetailView.as_view(), name='employee-detail'),
+    path('employees/import/', views.EmployeeImportView.as_view(), name='employee-import'),
+    path('employees/import/<str:task_id>/', views.EmployeeImportStatusView.as_view(), name='employee-import-status'),
 
     path('positions/', views.PositionApiView.as_view(), name='position-list'),
     path('positions/<int:pk>/', views.PositionApiView.as_view(), name='position-list'),
@@ -24,6 +33,7 @@ urlpatterns = [
     # Attendance Record URLs
     path('attendance/', views.AttendanceRecordListCreateView.as_view(), name='attendance-list'),
     path('attendance/<int:pk>/', views.AttendanceRecordDetailView.as_view(), name='attendance-detail'),
+    path('presence-intervals/', views.PresenceIntervalListView.as_view(), name='presence-interval-list'),
     
     # Admin URLs
     path('admins/', views.AdminListCreateView.as_view(), name='admin-list'),
@@ -37,17 +47,34 @@ urlpatterns = [
     path('unknown-faces/', views.UnknownFaceListView.as_view(), name='unknown-face-list'),
     path('unknown-faces/<int:pk>/', views.UnknownFaceDetailView.as_view(), name='unknown-face-detail'),
     
+    # Unknown Face Cluster URLs
+    path('unknown-face-clusters/', views.UnknownFaceClusterListView.as_view(), name='unknown-face-cluster-list'),
+    path('unknown-face-clusters/<int:pk>/', views.UnknownFaceClusterDetailView.as_view(), name='unknown-face-cluster-detail'),
+    
     # Filial URLs
     path('filials/', views.FilialListCreateView.as_view(), name='filial-list'),
     path('filials/<int:pk>/', views.FilialDetailView.as_view(), name='filial-detail'),
     
+    # Work Schedule URLs
+    path('work-schedules/', views.WorkScheduleListCreateView.as_view(), name='work-schedule-list'),
+    path('work-schedules/<int:pk>/', views.WorkScheduleDetailView.as_view(), name='work-schedule-detail'),
+    
     # Face Recognition API
-    path('face-result/', views.FaceResultView.as_view(), name='face-result'),
+    path('face-result/', ingest_views.FaceResultView.as_view(), name='face-result'),
+    path('face-result/batch/', ingest_views.FaceResultBatchView.as_view(), name='face-result-batch'),
     
     # Statistics and Reports
-    path('stats/attendance/', views.attendance_stats, name='attendance-stats'),
-    path('dashboard/', views.dashboard_data, name='dashboard-data'),
+    path('stats/attendance/', ingest_views.attendance_stats, name='attendance-stats'),
+    path('dashboard/', ingest_views.dashboard_data, name='dashboard-data'),
+    path('events/stream/', ingest_views.EventStreamView.as_view(), name='event-stream'),
+    path('thumbnails/<int:size>/<path:name>', views.ThumbnailView.as_view(), name='thumbnail'),
+    path('heartbeat/', views.device_heartbeat, name='device-heartbeat'),
+    path('stats/fleet/', views.fleet_status, name='fleet-status'),
+    path('stats/image-storage/', views.image_storage_stats, name='image-storage-stats'),
+    path('stats/devices/', views.device_usage_stats, name='device-usage-stats'),
+    path('stats/ingest/', views.ingest_stats, name='ingest-stats'),
     path('link-unknown-face/', views.link_unknown_face, name='link-unknown-face'),
+    path('link-unknown-face-cluster/', views.link_unknown_face_cluster, name='link-unknown-face-cluster'),
     path('employee-camera-stats/', views.EmployeeCameraStatsView.as_view(), name='employee-camera-stats'),
     path('employee-camera-stats/<str:pk>/', views.EmployeeCameraStatsDetailView.as_view(), name='employee-camera-stats'),
     path('upload-multiple-images/', views.MultipleImageUploadView.as_view(), name='upload-multiple-images'),
@@ -1,38 +1,64 @@
 from rest_framework.views import APIView
-from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView
+from rest_framework.generics import ListAPIView, ListCreateAPIView, RetrieveAPIView, RetrieveUpdateDestroyAPIView
 from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from django.conf import settings
-from django.db.models import Q, Count
+from django.db.models import Q, Count, FilteredRelation, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+from django.http import HttpResponseRedirect, StreamingHttpResponse
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
 import os
+import uuid
 import logging
 
 from .models import (
     Employee, Region, Terminal, Camera, AttendanceRecord, 
-    Admin, Image, UnknownFace, Filial , PositionApi , EmployeeCameraStats
+    Admin, Image, UnknownFace, Filial , PositionApi , EmployeeCameraStats, UnknownFaceCluster,
+    WorkSchedule, PresenceInterval, ImageIngestStats, DeviceKey
 )
 from .serializers import (
     EmployeeListSerializer, EmployeeDetailSerializer, RegionSerializer, 
     TerminalSerializer, CameraSerializer, AttendanceRecordSerializer, 
     AdminSerializer, ImageSerializer, UnknownFaceSerializer, 
     FilialSerializer, AttendanceStatsSerializer, UnknownFaceLinkSerializer,
-    FaceRecognitionResultSerializer , PositionApiSerializer , MultipleImageUploadSerializer
+    FaceRecognitionResultSerializer , PositionApiSerializer , MultipleImageUploadSerializer,
+    EmployeeImportSerializer, UnknownFaceClusterSerializer, UnknownFaceClusterLinkSerializer,
+    WorkScheduleSerializer, PresenceIntervalSerializer, HeartbeatSerializer
 )
+from .search import EmployeeSearchFilter
+from .importers import EmployeeImportError, import_employees
+from .tasks import import_employees_task
+from .clustering import link_cluster
+from .debounce import get_debouncer
+from .heartbeats import get_heartbeat_recorder
+from .thumbnails import is_thumbnail_source, make_thumbnail
+from .image_ingest import get_image_ingest_pool
+from .response_cache import cached_response
+from .events import publish_event
+from .metrics import InstrumentedViewMixin
+from .throttling import IngestThrottle, get_ingest_throttler
+from .device_auth import DevicePrincipal, DeviceSignatureAuthentication, usage as device_usage
+from .permissions import IsUserOrCameraKey
 from .filters import (
     EmployeeFilter, RegionFilter, TerminalFilter, CameraFilter,
     AttendanceRecordFilter, AdminFilter, ImageFilter, UnknownFaceFilter,
-    FilialFilter 
+    FilialFilter, UnknownFaceClusterFilter, PresenceIntervalFilter
 )
 from datetime import datetime
-from rest_framework.authentication import TokenAuthentication
+from rest_framework.authentication import SessionAuthentication
+from apps.authentication.authentication import CachedTokenAuthentication
+from celery.result import AsyncResult
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 
 
 
@@ -54,6 +80,7 @@ class MultipleImageUploadView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class PositionApiView(APIView):
+    @cached_response('positions')
     def get(self, request):
         """
         Get all available positions.
@@ -100,13 +127,13 @@ class PositionApiView(APIView):
             return Response({'error': 'Position not found'}, status=status.HTTP_404_NOT_FOUND)
 
 # Employee Views
-class EmployeeListCreateView(ListCreateAPIView):
+class EmployeeListCreateView(InstrumentedViewMixin, ListCreateAPIView):
     """
     List all employees or create a new employee.
     """
-    queryset = Employee.objects.select_related('region', 'terminal').filter(is_active=True)
+    queryset = Employee.objects.select_related('region', 'terminal').prefetch_related('images').filter(is_active=True)
     filterset_class = EmployeeFilter
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, OrderingFilter, EmployeeSearchFilter]
     search_fields = ['first_name', 'last_name', 'employee_id', 'email']
     ordering_fields = ['first_name', 'last_name', 'created_at', 'employee_id']
     ordering = ['first_name', 'last_name']
@@ -120,7 +147,7 @@ class EmployeeListCreateView(ListCreateAPIView):
         summary="List employees",
         description="Get a paginated list of employees with filtering and search capabilities",
         parameters=[
-            OpenApiParameter("search", OpenApiTypes.STR, description="Search in name, employee_id, email"),
+            OpenApiParameter("search", OpenApiTypes.STR, description="Ranked substring search in name, employee_id, email"),
             OpenApiParameter("position", OpenApiTypes.STR, description="Filter by position"),
             OpenApiParameter("region", OpenApiTypes.INT, description="Filter by region ID"),
             OpenApiParameter("status", OpenApiTypes.STR, description="Filter by status"),
@@ -136,13 +163,19 @@ class EmployeeListCreateView(ListCreateAPIView):
     def post(self, request, *args, **kwargs):
         return super().post(request, *args, **kwargs)
 
-class EmployeeDetailView(RetrieveUpdateDestroyAPIView):
+class EmployeeDetailView(InstrumentedViewMixin, RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete an employee.
     """
-    queryset = Employee.objects.select_related('region', 'terminal')
+    queryset = Employee.objects.select_related('terminal')
     serializer_class = EmployeeDetailSerializer
 
+    def get_queryset(self):
+        # The nested region comes with its counts (one query, not four)
+        return super().get_queryset().prefetch_related(
+            Prefetch('region', queryset=with_region_counts(Region.objects.all())),
+        )
+
     @extend_schema(summary="Get employee details")
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
@@ -163,8 +196,79 @@ class EmployeeDetailView(RetrieveUpdateDestroyAPIView):
         employee.save()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+class EmployeeImportView(APIView):
+    """
+    Bulk import employees from a CSV file and a ZIP archive of photos.
+    """
+    parser_classes = (MultiPartParser, FormParser)
+
+    @extend_schema(
+        summary="Bulk import employees",
+        description="Validate a CSV of employees (and a ZIP of photos referenced by the 'photos' column) "
+                    "and import them in a background task. With dry_run=true only validation is performed.",
+        request=EmployeeImportSerializer,
+    )
+    def post(self, request):
+        serializer = EmployeeImportSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        csv_file = serializer.validated_data['file']
+        photos_file = serializer.validated_data.get('photos')
+
+        if serializer.validated_data['dry_run']:
+            try:
+                summary = import_employees(csv_file, photos_file, dry_run=True)
+            except EmployeeImportError as e:
+                return Response({'errors': e.errors}, status=status.HTTP_400_BAD_REQUEST)
+            return Response(summary, status=status.HTTP_200_OK)
+
+        folder = f"imports/{uuid.uuid4().hex}"
+        csv_path = default_storage.save(f"{folder}/{csv_file.name}", csv_file)
+        photos_path = default_storage.save(f"{folder}/{photos_file.name}", photos_file) if photos_file else None
+        task = import_employees_task.delay(csv_path, photos_path)
+        logger.info(f"Employee import queued as task {task.id}")
+        return Response({'task_id': task.id}, status=status.HTTP_202_ACCEPTED)
+
+
+class EmployeeImportStatusView(APIView):
+    """
+    Report the progress or result of a bulk employee import.
+    """
+
+    @extend_schema(summary="Get bulk import status")
+    def get(self, request, task_id):
+        result = AsyncResult(task_id)
+        data = {'task_id': task_id, 'state': result.state}
+        if result.state == 'PROGRESS':
+            data['progress'] = result.info
+        elif result.successful():
+            data['result'] = result.result
+        elif result.failed():
+            data['error'] = str(result.result)
+        return Response(data, status=status.HTTP_200_OK)
+
+
+def with_region_counts(queryset):
+    """Annotate the counts RegionSerializer shows, in the query that lists the regions."""
+    today = timezone.localdate()
+    # A subquery, not a second join: employees x today's records would multiply the rows
+    active_employees = (
+        Employee.objects.filter(region=OuterRef('pk'), is_active=True)
+        .order_by().values('region').annotate(count=Count('pk')).values('count')
+    )
+    return queryset.annotate(
+        records_today=FilteredRelation('attendance_records', condition=Q(attendance_records__date=today)),
+    ).annotate(
+        active_employees=Coalesce(Subquery(active_employees), 0),
+        arrivals_today=Count('records_today', filter=Q(records_today__status='come')),
+        latecomers_today=Count('records_today', filter=Q(records_today__status='latecomers')),
+        absentees_today=Count('records_today', filter=Q(records_today__status='not_come')),
+    )
+
+
 # Region Views
-class RegionListCreateView(ListCreateAPIView):
+class RegionListCreateView(InstrumentedViewMixin, ListCreateAPIView):
     """
     List all regions or create a new region.
     """
@@ -175,6 +279,13 @@ class RegionListCreateView(ListCreateAPIView):
     search_fields = ['name', 'label']
     ordering = ['name']
 
+    @cached_response('regions')
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def get_queryset(self):
+        return with_region_counts(super().get_queryset())
+
 class RegionDetailView(APIView):
     def get(self, request, pk):
         """
@@ -187,15 +298,18 @@ class RegionDetailView(APIView):
         except Region.DoesNotExist:
             return Response({'error': 'Region not found'}, status=status.HTTP_404_NOT_FOUND)
 
-class RegionDetailView(RetrieveUpdateDestroyAPIView):
+class RegionDetailView(InstrumentedViewMixin, RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete a region.
     """
     queryset = Region.objects.all()
     serializer_class = RegionSerializer
 
+    def get_queryset(self):
+        return with_region_counts(super().get_queryset())
+
 # Terminal Views
-class TerminalListCreateView(ListCreateAPIView):
+class TerminalListCreateView(InstrumentedViewMixin, ListCreateAPIView):
     """
     List all terminals or create a new terminal.
     """
@@ -204,17 +318,31 @@ class TerminalListCreateView(ListCreateAPIView):
     filterset_class = TerminalFilter
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     search_fields = ['name', 'ip_address', 'location']
+    ordering_fields = ['name', 'ip_address', 'port', 'status', 'location', 'last_ping', 'created_at', 'online']
     ordering = ['name']
 
-class TerminalDetailView(RetrieveUpdateDestroyAPIView):
+    # Heartbeats do not bump the version; the timeout bounds how stale online states get
+    @cached_response('terminals', timeout=settings.DEVICE_LIST_CACHE_TIMEOUT)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def get_queryset(self):
+        # Annotated per request: the online threshold moves with the clock
+        return super().get_queryset().with_online().annotate(
+            active_employees=Count('employees', filter=Q(employees__is_active=True)),
+        )
+
+class TerminalDetailView(InstrumentedViewMixin, RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete a terminal.
     """
-    queryset = Terminal.objects.select_related('region', 'filial')
+    queryset = Terminal.objects.select_related('region', 'filial').annotate(
+        active_employees=Count('employees', filter=Q(employees__is_active=True)),
+    )
     serializer_class = TerminalSerializer
 
 # Camera Views
-class CameraListCreateView(ListCreateAPIView):
+class CameraListCreateView(InstrumentedViewMixin, ListCreateAPIView):
     """
     List all cameras or create a new camera.
     """
@@ -223,9 +351,18 @@ class CameraListCreateView(ListCreateAPIView):
     filterset_class = CameraFilter
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     search_fields = ['name', 'ip_address', 'location']
+    ordering_fields = ['name', 'ip_address', 'port', 'status', 'role', 'location', 'last_ping', 'created_at', 'online']
     ordering = ['name']
 
-class CameraDetailView(RetrieveUpdateDestroyAPIView):
+    @cached_response('cameras', timeout=settings.DEVICE_LIST_CACHE_TIMEOUT)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def get_queryset(self):
+        # Annotated per request: the online threshold moves with the clock
+        return super().get_queryset().with_online()
+
+class CameraDetailView(InstrumentedViewMixin, RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete a camera.
     """
@@ -233,7 +370,7 @@ class CameraDetailView(RetrieveUpdateDestroyAPIView):
     serializer_class = CameraSerializer
 
 # Attendance Record Views
-class AttendanceRecordListCreateView(ListCreateAPIView):
+class AttendanceRecordListCreateView(InstrumentedViewMixin, ListCreateAPIView):
     """
     List all attendance records or create a new record.
     """
@@ -244,15 +381,33 @@ class AttendanceRecordListCreateView(ListCreateAPIView):
     search_fields = ['employee__first_name', 'employee__last_name', 'employee__employee_id']
     ordering = ['-date', '-recorded_at']
 
-class AttendanceRecordDetailView(RetrieveUpdateDestroyAPIView):
+    def perform_create(self, serializer):
+        serializer.save(is_manual=True)
+
+class AttendanceRecordDetailView(InstrumentedViewMixin, RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete an attendance record.
     """
     queryset = AttendanceRecord.objects.select_related('employee', 'camera', 'region')
     serializer_class = AttendanceRecordSerializer
 
+    def perform_update(self, serializer):
+        # Keeps recompute from overwriting the edit
+        serializer.save(is_manual=True)
+
+class PresenceIntervalListView(InstrumentedViewMixin, ListAPIView):
+    """
+    List the presence intervals (visits) attendance records are derived from.
+    """
+    queryset = PresenceInterval.objects.select_related('employee', 'entry_camera', 'exit_camera')
+    serializer_class = PresenceIntervalSerializer
+    filterset_class = PresenceIntervalFilter
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    ordering_fields = ['started_at', 'ended_at']
+    ordering = ['-started_at']
+
 # Admin Views
-class AdminListCreateView(ListCreateAPIView):
+class AdminListCreateView(InstrumentedViewMixin, ListCreateAPIView):
     """
     List all admins or create a new admin.
     """
@@ -263,7 +418,7 @@ class AdminListCreateView(ListCreateAPIView):
     search_fields = ['name', 'login']
     ordering = ['name']
 
-class AdminDetailView(RetrieveUpdateDestroyAPIView):
+class AdminDetailView(InstrumentedViewMixin, RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete an admin.
     """
@@ -271,7 +426,7 @@ class AdminDetailView(RetrieveUpdateDestroyAPIView):
     serializer_class = AdminSerializer
 
 # Image Views
-class ImageListCreateView(ListCreateAPIView):
+class ImageListCreateView(InstrumentedViewMixin, ListCreateAPIView):
     """
     List all employee images or upload a new image.
     """
@@ -284,7 +439,7 @@ class ImageListCreateView(ListCreateAPIView):
 
 
 
-class ImageDetailView(RetrieveUpdateDestroyAPIView):
+class ImageDetailView(InstrumentedViewMixin, RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete an employee image.
     """
@@ -292,7 +447,7 @@ class ImageDetailView(RetrieveUpdateDestroyAPIView):
     serializer_class = ImageSerializer
 
 # Unknown Face Views
-class UnknownFaceListView(ListCreateAPIView):
+class UnknownFaceListView(InstrumentedViewMixin, ListCreateAPIView):
     """
     List all unknown faces.
     """
@@ -302,33 +457,80 @@ class UnknownFaceListView(ListCreateAPIView):
     filter_backends = [DjangoFilterBackend, OrderingFilter]
     ordering = ['-recorded_at']
 
-class UnknownFaceDetailView(RetrieveUpdateDestroyAPIView):
+class UnknownFaceDetailView(InstrumentedViewMixin, RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete an unknown face record.
     """
     queryset = UnknownFace.objects.select_related('camera', 'region', 'linked_employee')
     serializer_class = UnknownFaceSerializer
 
+# Unknown Face Cluster Views
+class UnknownFaceClusterListView(InstrumentedViewMixin, ListAPIView):
+    """
+    List groups of unknown face sightings that belong to the same person.
+    """
+    queryset = UnknownFaceCluster.objects.select_related('region', 'representative', 'linked_employee')
+    serializer_class = UnknownFaceClusterSerializer
+    filterset_class = UnknownFaceClusterFilter
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    ordering_fields = ['last_seen', 'first_seen', 'size']
+    ordering = ['-last_seen']
+
+class UnknownFaceClusterDetailView(InstrumentedViewMixin, RetrieveAPIView):
+    """
+    Retrieve an unknown face cluster. Its sightings are listed by
+    unknown-faces/?cluster=<id>.
+    """
+    queryset = UnknownFaceCluster.objects.select_related('region', 'representative', 'linked_employee')
+    serializer_class = UnknownFaceClusterSerializer
+
 # Filial Views
-class FilialListCreateView(ListCreateAPIView):
+class FilialListCreateView(InstrumentedViewMixin, ListCreateAPIView):
     """
     List all filials or create a new filial.
     """
-    queryset = Filial.objects.filter(is_active=True)
+    queryset = Filial.objects.filter(is_active=True).annotate(
+        active_terminals=Count('terminals', filter=Q(terminals__status='active')),
+    )
     serializer_class = FilialSerializer
     filterset_class = FilialFilter
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     search_fields = ['name', 'value']
     ordering = ['name']
 
-class FilialDetailView(RetrieveUpdateDestroyAPIView):
+    @cached_response('filials')
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+class FilialDetailView(InstrumentedViewMixin, RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete a filial.
     """
-    queryset = Filial.objects.all()
+    queryset = Filial.objects.annotate(
+        active_terminals=Count('terminals', filter=Q(terminals__status='active')),
+    )
     serializer_class = FilialSerializer
 
 
+# Work Schedule Views
+class WorkScheduleListCreateView(InstrumentedViewMixin, ListCreateAPIView):
+    """
+    List all work schedules or create a new one.
+    """
+    queryset = WorkSchedule.objects.select_related('region', 'filial')
+    serializer_class = WorkScheduleSerializer
+    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filterset_fields = ['region', 'filial', 'is_active']
+    search_fields = ['name']
+    ordering = ['name']
+
+class WorkScheduleDetailView(InstrumentedViewMixin, RetrieveUpdateDestroyAPIView):
+    """
+    Retrieve, update or delete a work schedule.
+    """
+    queryset = WorkSchedule.objects.select_related('region', 'filial')
+    serializer_class = WorkScheduleSerializer
+
 
 # # Face Recognition API
 # class FaceResultView(APIView):
@@ -452,7 +654,7 @@ class FilialDetailView(RetrieveUpdateDestroyAPIView):
 #                     )
 
 #                 try:
-#                     today = timezone.now().date()
+#                     today = timezone.localdate()
 #                     current_time = timezone.now().time()
                     
 #                     # Get or create attendance record for today
@@ -502,17 +704,102 @@ class FilialDetailView(RetrieveUpdateDestroyAPIView):
 
 
 
+def validate_face_result(face_file, user_value, cosine_similarity, timestamp_str):
+    """``(timestamp, None)`` for a valid face, else ``(None, (response data, status code))``."""
+    if not face_file or not cosine_similarity or not user_value:
+        return None, ({"error": "Missing required fields (file, user, cosine_similarity)."}, status.HTTP_400_BAD_REQUEST)
+
+    # Parse timestamp if provided, else use current time
+    timestamp = timezone.now()
+    if timestamp_str:
+        try:
+            timestamp = datetime.fromisoformat(timestamp_str)
+        except ValueError:
+            return None, (
+                {"error": "Invalid timestamp format. Use ISO format (e.g., 2025-07-23T15:30:00)."},
+                status.HTTP_400_BAD_REQUEST
+            )
+        if timezone.is_naive(timestamp):
+            # Cameras send local wall-clock time without an offset
+            timestamp = timezone.make_aware(timestamp)
+    return timestamp, None
+
+
+def face_result_response(face_file, cosine_similarity, employee_id):
+    """
+    Response data for an accepted face; ``employee_id`` is ``None`` for an
+    unknown face. The face is only queued at this point: the ingest pool and
+    the debouncer store it later and log failures.
+    """
+    response_data = {
+        "status": "ok",
+        "cosine_similarity": cosine_similarity,
+        "saved_file": f"face_results/stats/{face_file.name}",
+    }
+    if employee_id is None:
+        response_data.update({"employee_id": 0, "message": "Unknown face accepted for recording"})
+    else:
+        response_data.update({"employee_id": employee_id, "message": "Attendance and stats accepted for recording"})
+    return response_data
+
+
+def unknown_face_store(camera_obj, cosine_similarity):
+    """Ingest pool callback that records an unrecognized face."""
+    def store(data, name):
+        unknown_face = UnknownFace.objects.create(
+            face_image=ContentFile(data, name=name),
+            distance=cosine_similarity,
+            camera=camera_obj,
+            region=camera_obj.region
+        )
+        logger.info(f"Unknown face recorded: {unknown_face.id}")
+        publish_event(
+            'unknown_face',
+            id=unknown_face.pk,
+            camera_id=camera_obj.pk,
+            region_id=camera_obj.region_id,
+            filial_id=camera_obj.filial_id,
+            distance=unknown_face.distance,
+            recorded_at=unknown_face.recorded_at,
+            face_image_url=unknown_face.get_face_image_url,
+        )
+    return store
+
+
+def sighting_store(employee, camera_obj, cosine_similarity, timestamp):
+    """Ingest pool callback that hands a recognition to the debouncer."""
+    event = {
+        'employee_id': employee.pk,
+        'employee_name': employee.full_name,
+        'camera_id': camera_obj.pk,
+        'camera_role': camera_obj.role,
+        'region_id': camera_obj.region_id,
+        'filial_id': camera_obj.filial_id,
+        'distance': cosine_similarity,
+        'timestamp': timestamp.isoformat(),
+    }
+
+    def submit(data, name):
+        # Repeated sightings are merged into one write per debounce window
+        get_debouncer().submit(dict(event, file_name=name), data)
+    return submit
+
+
 class FaceResultView(APIView):
     """
     Handle face recognition results from cameras.
     """
     parser_classes = (MultiPartParser, FormParser)
-    authentication_classes = [TokenAuthentication]
-    permission_classes = [IsAuthenticated]
+    authentication_classes = [DeviceSignatureAuthentication, CachedTokenAuthentication]
+    permission_classes = [IsUserOrCameraKey]
+    throttle_classes = [IngestThrottle]
 
     @extend_schema(
         summary="Process face recognition result",
-        description="Handle face data from client. If 'user' == 'unrecognized', save to UnknownFace model. Otherwise, 'user' should be an integer (employee_id) -> save to AttendanceRecord and EmployeeCameraStats.",
+        description="Handle face data from client. If 'user' == 'unrecognized', save to UnknownFace model. Otherwise, 'user' should be an integer (employee_id) -> save to AttendanceRecord and EmployeeCameraStats. "
+                    "200 means the face was validated and queued, not that it is stored: sightings of one employee "
+                    "on one camera are written once per RECOGNITION_DEBOUNCE_WINDOW seconds, and storage errors "
+                    "are logged on the server instead of being returned. A naive 'timestamp' is taken as local time.",
         request={
             'multipart/form-data': {
                 'type': 'object',
@@ -532,137 +819,118 @@ class FaceResultView(APIView):
         Handle face data from client and save to appropriate model.
         """
         try:
-            # Extract data from request
-            face_file = request.FILES.get('file')
-            cosine_similarity = request.data.get('cosine_similarity')
-            user_value = request.data.get('user')
-            camera_ip = request.data.get('camera_ip', "192.168.1.64")
-            timestamp_str = request.data.get('timestamp', None)
-
-            # Validate inputs
-            if not face_file or not cosine_similarity or not user_value:
-                return Response(
-                    {"error": "Missing required fields (file, user, cosine_similarity)."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+            camera_obj = self.get_camera(request)
+            if camera_obj is None:
+                return Response({"error": "Camera not found."}, status=status.HTTP_404_NOT_FOUND)
+            data, code = self.process(
+                camera_obj,
+                request.FILES.get('file'),
+                request.data.get('user'),
+                request.data.get('cosine_similarity'),
+                request.data.get('timestamp', None),
+            )
+            return Response(data, status=code)
 
-            # try:
-            #     cosine_similarity = cosine_similarity)
-            # except (ValueError, TypeError):
-            #     return Response(
-            #         {"error": "cosine_similarity must be a number."},
-            #         status=status.HTTP_400_BAD_REQUEST
-            #     )
-
-            # Parse timestamp if provided, else use current time
-            timestamp = datetime.now()
-            if timestamp_str:
-                try:
-                    timestamp = datetime.fromisoformat(timestamp_str)
-                except ValueError:
-                    return Response(
-                        {"error": "Invalid timestamp format. Use ISO format (e.g., 2025-07-23T15:30:00)."},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
+        except Exception as e:
+            logger.error(f"Unexpected error in face recognition: {e}")
+            return Response({"error": "Internal server error"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            # Fetch camera by IP
+    def get_camera(self, request):
+        """The signing camera (IsUserOrCameraKey turns away terminal keys), else the default camera."""
+        camera_id = getattr(request.user, 'camera_id', None)
+        if camera_id:
+            return Camera.objects.filter(pk=camera_id).first()
+        # camera_obj = Camera.objects.get(ip_address=camera_ip, status='active')
+        return Camera.objects.first()
+
+    def process(self, camera_obj, face_file, user_value, cosine_similarity, timestamp_str):
+        """Validate and ingest one face; returns ``(response data, status code)``."""
+        timestamp, error = validate_face_result(face_file, user_value, cosine_similarity, timestamp_str)
+        if error:
+            return error
+
+        # Handle "unrecognized" user
+        if user_value == "unrecognized":
             try:
-                # camera_obj = Camera.objects.get(ip_address=camera_ip, status='active')
-                camera_obj = Camera.objects.first()
-            except Camera.DoesNotExist:
-                logger.warning(f"Camera with IP {camera_ip} not found")
-                return Response(
-                    {"error": "Camera not found."}, 
-                    status=status.HTTP_404_NOT_FOUND
+                # The crop is normalized and stored by the ingest pool
+                get_image_ingest_pool().submit(
+                    unknown_face_store(camera_obj, cosine_similarity), face_file.read(), face_file.name
                 )
+                return face_result_response(face_file, cosine_similarity, None), status.HTTP_200_OK
+            except Exception as e:
+                logger.error(f"Error creating unknown face record: {e}")
+                return {"error": str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR
 
-            # Common response data
-            response_data = {
-                "status": "ok",
-                "cosine_similarity": cosine_similarity,
-                "saved_file": f"face_results/stats/{face_file.name}",
-            }
+        # Handle recognized user (employee)
+        try:
+            employee = Employee.objects.get(id=int(user_value), is_active=True)
+        except ValueError:
+            return {"error": "'user' must be an integer or 'unrecognized'."}, status.HTTP_400_BAD_REQUEST
+        except Employee.DoesNotExist:
+            return {"error": "Employee not found."}, status.HTTP_404_NOT_FOUND
 
-            # Handle "unrecognized" user
-            if user_value == "unrecognized":
-                try:
-                    unknown_face = UnknownFace.objects.create(
-                        face_image=face_file,
-                        distance=cosine_similarity,
-                        camera=camera_obj,
-                        region=camera_obj.region
-                    )
-                    logger.info(f"Unknown face recorded: {unknown_face.id}")
-                    response_data.update({
-                        "employee_id": 0,
-                        "message": "Unknown face recorded successfully"
-                    })
-                    return Response(response_data, status=status.HTTP_200_OK)
-                except Exception as e:
-                    logger.error(f"Error creating unknown face record: {e}")
-                    return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-            # Handle recognized user (employee)
-            try:
-                employee_id = int(user_value)
-                employee = Employee.objects.get(id=employee_id, is_active=True)
-            except ValueError:
-                return Response(
-                    {"error": "'user' must be an integer or 'unrecognized'."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            except Employee.DoesNotExist:
-                return Response(
-                    {"error": "Employee not found."}, 
-                    status=status.HTTP_404_NOT_FOUND
-                )
+        try:
+            get_image_ingest_pool().submit(
+                sighting_store(employee, camera_obj, cosine_similarity, timestamp), face_file.read(), face_file.name
+            )
+            return face_result_response(face_file, cosine_similarity, employee.pk), status.HTTP_200_OK
+        except Exception as e:
+            logger.error(f"Error creating attendance record: {e}")
+            return {"error": str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR
 
-            try:
-                today = timezone.now().date()
-                current_time = timezone.now().time()
-
-                # Get or create attendance record for today
-                attendance_record, created = AttendanceRecord.objects.get_or_create(
-                    employee=employee,
-                    date=today,
-                    defaults={
-                        'camera': camera_obj,
-                        'region': camera_obj.region,
-                        'check_in': current_time,
-                        'face_image': face_file,
-                        'distance': cosine_similarity,
-                        'status': 'come'
-                    }
-                )
 
-                if not created:
-                    attendance_record.check_out = current_time
-                    attendance_record.face_image = face_file
-                    attendance_record.distance = cosine_similarity
-                    attendance_record.save()
-
-                # Create EmployeeCameraStats entry
-                EmployeeCameraStats.objects.create(
-                    employee=employee,
-                    camera=camera_obj,
-                    timestamp=timestamp,
-                    face_image=face_file,
-                    distance=cosine_similarity
-                )
+class FaceResultBatchView(FaceResultView):
+    """
+    Several face results from one device in a single (signed) request.
+    """
 
-                logger.info(f"Attendance and stats recorded for employee {employee_id}")
-                response_data.update({
-                    "employee_id": employee_id,
-                    "message": "Attendance and stats recorded successfully"
-                })
-                return Response(response_data, status=status.HTTP_200_OK)
+    @extend_schema(
+        summary="Process a batch of face recognition results",
+        description="Same fields as face-result, each repeated once per face in the same order "
+                    "('timestamp' may be omitted for all faces). Returns one result per face.",
+        request={
+            'multipart/form-data': {
+                'type': 'object',
+                'properties': {
+                    'file': {'type': 'array', 'items': {'type': 'string', 'format': 'binary'}},
+                    'user': {'type': 'array', 'items': {'type': 'string'}},
+                    'cosine_similarity': {'type': 'array', 'items': {'type': 'number'}},
+                    'timestamp': {'type': 'array', 'items': {'type': 'string'}},
+                }
+            }
+        },
+    )
+    def post(self, request, format=None):
+        files = request.FILES.getlist('file')
+        users = request.data.getlist('user')
+        similarities = request.data.getlist('cosine_similarity')
+        timestamps = request.data.getlist('timestamp')
+        if not files or len(users) != len(files) or len(similarities) != len(files) \
+                or (timestamps and len(timestamps) != len(files)):
+            return Response(
+                {"error": "file, user and cosine_similarity (and optionally timestamp) must be given once per face."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(files) > settings.FACE_RESULT_BATCH_MAX:
+            return Response(
+                {"error": f"At most {settings.FACE_RESULT_BATCH_MAX} faces per batch."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-            except Exception as e:
-                logger.error(f"Error creating attendance record: {e}")
-                return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        try:
+            camera_obj = self.get_camera(request)
+            if camera_obj is None:
+                return Response({"error": "Camera not found."}, status=status.HTTP_404_NOT_FOUND)
+            results = []
+            for i, face_file in enumerate(files):
+                data, code = self.process(
+                    camera_obj, face_file, users[i], similarities[i], timestamps[i] if timestamps else None
+                )
+                results.append(dict(data, status_code=code))
+            return Response({'results': results}, status=status.HTTP_200_OK)
 
         except Exception as e:
-            logger.error(f"Unexpected error in face recognition: {e}")
+            logger.error(f"Unexpected error in face recognition batch: {e}")
             return Response({"error": "Internal server error"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
@@ -709,7 +977,7 @@ class EmployeeCameraStatsView(APIView):
         try:
             # Get date filter from query params
             date_str = request.query_params.get('date')
-            queryset = EmployeeCameraStats.objects.select_related('employee', 'camera').order_by('-timestamp')
+            queryset = EmployeeCameraStats.objects.select_related('employee__region', 'camera').order_by('-timestamp')
 
             if date_str:
                 try:
@@ -796,13 +1064,11 @@ class EmployeeCameraStatsDetailView(APIView):
 # @permission_classes([IsAuthenticated])
 def attendance_stats(request):
     """Get attendance statistics by region for today"""
-    today = timezone.now().date()
-    
     stats = []
-    for region in Region.objects.filter(is_active=True):
-        total_employees = region.employees.filter(is_active=True).count()
-        arrivals = region.attendance_records.filter(date=today, status='come').count()
-        latecomers = region.attendance_records.filter(date=today, status='latecomers').count()
+    for region in with_region_counts(Region.objects.filter(is_active=True)):
+        total_employees = region.active_employees
+        arrivals = region.arrivals_today
+        latecomers = region.latecomers_today
         absentees = total_employees - arrivals - latecomers
         
         attendance_rate = (arrivals / total_employees * 100) if total_employees > 0 else 0
@@ -873,6 +1139,215 @@ def link_unknown_face(request):
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class EventStreamRenderer(BaseRenderer):
+    media_type = 'text/event-stream'
+    format = 'sse'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Errors are answered before any stream starts
+        return data if isinstance(data, (str, bytes)) else JSONRenderer().render(data)
+
+
+def event_stream_filters(query_params):
+    """``(region_id, filial_id)`` of an events/stream/ request; raises ValueError."""
+    region_id = int(query_params['region']) if query_params.get('region') else None
+    filial_id = int(query_params['filial']) if query_params.get('filial') else None
+    return region_id, filial_id
+
+
+class EventStreamView(APIView):
+    """
+    Server-Sent Events stream of new attendance records ('attendance') and
+    unknown faces ('unknown_face'), optionally limited to one region or filial.
+
+    A stream stays open for minutes, which would hold a whole sync worker,
+    so it is only served by the async view (``async_views.EventStreamView``)
+    of the ASGI application; docker-compose runs it as the ``events``
+    service and nginx routes this path there. This view answers 503.
+    """
+    renderer_classes = [EventStreamRenderer, JSONRenderer]
+
+    @extend_schema(
+        summary="Live attendance events (Server-Sent Events, ASGI deployments only)",
+        parameters=[
+            OpenApiParameter('region', OpenApiTypes.INT, description="Only events of this region"),
+            OpenApiParameter('filial', OpenApiTypes.INT, description="Only events of this filial"),
+        ],
+        responses={(200, 'text/event-stream'): OpenApiTypes.STR},
+    )
+    def get(self, request):
+        try:
+            event_stream_filters(request.query_params)
+        except ValueError:
+            return Response({'error': "'region' and 'filial' must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            {'error': "Live events are only served by the ASGI application (attendance_system.asgi); "
+                      "route this path to an ASGI worker, like the events service of docker-compose.yml"},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+
+
+class ThumbnailView(APIView):
+    """
+    Redirect to the thumbnail of a stored photo, building it on the first
+    request. Public like the media files it is made from, so it works in
+    <img> tags, but only for the photo directories.
+    """
+    authentication_classes = []
+    permission_classes = []
+
+    @extend_schema(exclude=True)
+    def get(self, request, size, name):
+        if size not in settings.THUMBNAIL_SIZES or not is_thumbnail_source(name):
+            return Response({'error': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            thumb = make_thumbnail(name, size)
+        except FileNotFoundError:
+            return Response({'error': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.error(f"Error creating thumbnail of {name}: {e}")
+            return Response({'error': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
+        response = HttpResponseRedirect(f"{settings.MEDIA_URL}{thumb}")
+        # A thumbnail name always leads to the same file
+        patch_cache_control(response, public=True, max_age=24 * 60 * 60)
+        return response
+
+@extend_schema(request=HeartbeatSerializer, summary="Record a camera or terminal heartbeat")
+@api_view(['POST'])
+@authentication_classes([DeviceSignatureAuthentication, CachedTokenAuthentication, SessionAuthentication])
+def device_heartbeat(request):
+    """Record a heartbeat; last_ping is written in bulk by the heartbeat flusher"""
+    serializer = HeartbeatSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    device_type = serializer.validated_data['device_type']
+    device_id = serializer.validated_data['device_id']
+
+    if isinstance(request.user, DevicePrincipal) and (request.user.kind, request.user.device_id) != (device_type, device_id):
+        return Response({'error': 'A device key may only report its own device'}, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        if not get_heartbeat_recorder().ping(device_type, device_id):
+            return Response({'error': f'{device_type} {device_id} not found'}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        logger.error(f"Error recording heartbeat: {e}")
+        return Response({'error': 'Internal server error'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return Response({'status': 'ok'})
+
+@extend_schema(
+    summary="Request and byte counts per device key",
+    parameters=[
+        OpenApiParameter('minutes', OpenApiTypes.INT, description="Window for the totals in minutes (default 60)"),
+    ],
+)
+@api_view(['GET'])
+def device_usage_stats(request):
+    """Signed requests per device key: last minute, totals of the window and last use"""
+    try:
+        minutes = max(1, min(int(request.query_params.get('minutes', 60)), 120))
+    except ValueError:
+        return Response({'error': "'minutes' must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+    keys = list(DeviceKey.objects.filter(is_active=True).select_related('camera', 'terminal'))
+    counts = device_usage([key.key_id for key in keys], minutes=minutes)
+    return Response([
+        {
+            'key_id': key.key_id,
+            'device_type': key.device[0],
+            'device_id': key.device[1],
+            'device_name': (key.camera or key.terminal).name,
+            **counts[key.key_id],
+        }
+        for key in keys
+    ])
+
+@extend_schema(
+    summary="Face crop storage saved per day",
+    parameters=[
+        OpenApiParameter('days', OpenApiTypes.INT, description="Number of days to report (default 30)"),
+    ],
+)
+@api_view(['GET'])
+def image_storage_stats(request):
+    """Bytes received and stored for face crops, per day"""
+    try:
+        days = max(1, min(int(request.query_params.get('days', 30)), 366))
+    except ValueError:
+        return Response({'error': "'days' must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+    rows = ImageIngestStats.objects.order_by('-date')[:days]
+    return Response([
+        {
+            'date': row.date,
+            'images': row.images,
+            'original_bytes': row.original_bytes,
+            'stored_bytes': row.stored_bytes,
+            'saved_bytes': row.saved_bytes,
+            'saved_percent': round(row.saved_bytes / row.original_bytes * 100, 2) if row.original_bytes else 0,
+        }
+        for row in rows
+    ])
+
+@extend_schema(summary="Ingest queue depth and face-result requests rejected per reason")
+@api_view(['GET'])
+def ingest_stats(request):
+    """Depth of this worker's image ingest pool and throttling/backpressure drop counters"""
+    try:
+        return Response(get_ingest_throttler().stats())
+    except Exception as e:
+        logger.error(f"Error reading ingest stats: {e}")
+        return Response({'error': 'Internal server error'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@extend_schema(summary="Online status of every camera and terminal")
+@api_view(['GET'])
+def fleet_status(request):
+    """Online status of all devices, answered from the heartbeat map"""
+    try:
+        return Response(get_heartbeat_recorder().fleet_status())
+    except Exception as e:
+        logger.error(f"Error reading fleet status: {e}")
+        return Response({'error': 'Internal server error'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@extend_schema(
+    summary="Link unknown face cluster to employee",
+    description="Link every sighting in an unknown face cluster to an existing employee and "
+                "create an employee image for each of them",
+    request=UnknownFaceClusterLinkSerializer,
+    responses={200: {'description': 'Successfully linked'}}
+)
+@api_view(['POST'])
+def link_unknown_face_cluster(request):
+    """Link unknown face cluster to employee"""
+    serializer = UnknownFaceClusterLinkSerializer(data=request.data)
+    if serializer.is_valid():
+        cluster_id = serializer.validated_data['cluster_id']
+        employee_id = serializer.validated_data['employee_id']
+
+        try:
+            cluster = UnknownFaceCluster.objects.get(id=cluster_id)
+            employee = Employee.objects.get(id=employee_id)
+            images = link_cluster(cluster, employee)
+
+            return Response({
+                'message': 'Unknown face cluster successfully linked to employee',
+                'cluster_id': cluster_id,
+                'employee_id': employee_id,
+                'images_created': len(images)
+            })
+
+        except (UnknownFaceCluster.DoesNotExist, Employee.DoesNotExist) as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        except Exception as e:
+            logger.error(f"Error linking unknown face cluster: {e}")
+            return Response(
+                {'error': 'Internal server error'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
 @extend_schema(
     summary="Get dashboard data",
     description="Get dashboard statistics and recent activities"
@@ -881,7 +1356,7 @@ def link_unknown_face(request):
 # @permission_classes([IsAuthenticated])
 def dashboard_data(request):
     """Get dashboard statistics"""
-    today = timezone.now().date()
+    today = timezone.localdate()
     
     # Overall statistics
     total_employees = Employee.objects.filter(is_active=True).count()
@@ -889,18 +1364,20 @@ def dashboard_data(request):
     total_cameras = Camera.objects.filter(status='active').count()
     
     # Today's attendance
-    today_attendance = AttendanceRecord.objects.filter(date=today).count()
-    today_arrivals = AttendanceRecord.objects.filter(date=today, status='come').count()
-    today_latecomers = AttendanceRecord.objects.filter(date=today, status='latecomers').count()
+    today_counts = AttendanceRecord.objects.filter(date=today).aggregate(
+        total=Count('id'),
+        arrivals=Count('id', filter=Q(status='come')),
+        latecomers=Count('id', filter=Q(status='latecomers')),
+    )
     
     # Recent unknown faces
-    recent_unknown = UnknownFace.objects.filter(
-        is_processed=False
-    ).order_by('-recorded_at')[:5]
+    recent_unknown = UnknownFace.objects.select_related(
+        'camera', 'region', 'linked_employee'
+    ).filter(is_processed=False).order_by('-recorded_at')[:5]
     
     # Recent attendance records
     recent_attendance = AttendanceRecord.objects.select_related(
-        'employee', 'camera'
+        'employee', 'camera', 'region'
     ).order_by('-recorded_at')[:10]
     
     return Response({
@@ -908,9 +1385,9 @@ def dashboard_data(request):
             'total_employees': total_employees,
             'total_regions': total_regions,
             'total_cameras': total_cameras,
-            'today_attendance': today_attendance,
-            'today_arrivals': today_arrivals,
-            'today_latecomers': today_latecomers,
+            'today_attendance': today_counts['total'],
+            'today_arrivals': today_counts['arrivals'],
+            'today_latecomers': today_counts['latecomers'],
         },
         'recent_unknown_faces': UnknownFaceSerializer(recent_unknown, many=True).data,
         'recent_attendance': AttendanceRecordSerializer(recent_attendance, many=True).data,
@@ -0,0 +1,70 @@
+"""
+Worker start-up work done before the first request.
+
+``preload`` runs once in the Gunicorn master when ``preload_app`` is on
+(see ``gunicorn.conf.py``). It imports every view, serializer and filter
+through the URLconf and loads the face encoding index. Forked workers share
+that memory copy-on-write. It must not open database connections or start
+threads, because neither survives a fork. Both check that the prebuilt
+OpenAPI schema matches the code (``openapi.check``).
+
+``warm_up`` runs in every worker after the application is loaded and before
+it accepts requests (Gunicorn's ``post_worker_init``). It fills the
+per-process maps that would otherwise be built by the first requests: work
+schedules, the camera/terminal heartbeat map and the device keys. A step
+that fails is logged and skipped, so a worker always starts.
+"""
+import logging
+import time
+
+from django.db import connections
+from django.urls import get_resolver
+
+from . import openapi
+from .device_auth import key_store
+from .face_index import get_face_index
+from .heartbeats import get_heartbeat_recorder
+from .schedules import schedule_cache
+
+logger = logging.getLogger(__name__)
+
+
+def _run(steps):
+    timings = {}
+    for name, step in steps:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            logger.warning(f"Warm-up step {name} failed: {e}")
+            continue
+        timings[name] = round((time.perf_counter() - started) * 1000, 1)
+    return timings
+
+
+def preload():
+    """Import-time and file-backed work shared by all workers; returns ms per step."""
+    timings = _run([
+        ('urls', lambda: get_resolver().url_patterns),
+        ('face_index', lambda: get_face_index().load()),
+        ('openapi_schema', openapi.check),
+    ])
+    # Nothing here should have connected, but a shared socket would break every worker
+    connections.close_all()
+    logger.info(f"Preloaded before fork: {timings}")
+    return timings
+
+
+def warm_up():
+    """Fill this worker's caches; returns ms per step."""
+    timings = _run([
+        ('urls', lambda: get_resolver().url_patterns),
+        ('schedules', lambda: schedule_cache.get()),
+        ('devices', lambda: get_heartbeat_recorder().warm()),
+        ('device_keys', lambda: key_store.warm()),
+        ('face_index', lambda: get_face_index().load()),
+        ('openapi_schema', openapi.check),
+    ])
+    connections.close_all()
+    logger.info(f"Worker warmed up: {timings}")
+    return timings
@@ -0,0 +1,115 @@
+"""
+Token authentication without a database query per request.
+
+``CachedTokenAuthentication`` behaves like DRF's ``TokenAuthentication``
+but keeps the token's user in two layers. The first is a per-process map
+that lives ``AUTH_TOKEN_LOCAL_TTL`` seconds. The second is the Django cache
+(Redis in production), where entries live ``AUTH_TOKEN_CACHE_TTL`` seconds.
+Only a miss in both layers runs the ``Token``/``User`` query.
+
+``invalidate_token`` and ``invalidate_user_tokens`` drop entries from the
+shared cache and from this process's map. They are called on logout, on
+password change, and from signals when a token is deleted or a user is
+saved. Other processes stop accepting a revoked token once their local
+entry expires, so ``AUTH_TOKEN_LOCAL_TTL`` bounds the revocation delay.
+
+Async views (see ``apps/attendance/async_views.py``) call ``aauthenticate``,
+which answers local hits on the event loop and reads the shared cache with
+the async cache API; only a miss in both runs the query in a thread.
+"""
+import copy
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+
+CACHE_PREFIX = 'auth-token:'
+
+
+class LocalTokenCache:
+    """Token key -> (user, expiry) map of this process."""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        user, expires_at = entry
+        if expires_at < time.monotonic():
+            with self._lock:
+                self._entries.pop(key, None)
+            return None
+        return user
+
+    def set(self, key, user, ttl):
+        with self._lock:
+            self._entries[key] = (user, time.monotonic() + ttl)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_tokens = LocalTokenCache()
+
+
+def invalidate_token(*keys):
+    """Stop accepting cached ``keys`` (the tokens may already be deleted)."""
+    local_tokens.delete(*keys)
+    cache.delete_many([f'{CACHE_PREFIX}{key}' for key in keys])
+
+
+def invalidate_user_tokens(user):
+    invalidate_token(*Token.objects.filter(user=user).values_list('key', flat=True))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        user = local_tokens.get(key)
+        if user is None:
+            user = cache.get(f'{CACHE_PREFIX}{key}')
+            if user is None:
+                user, _token = super().authenticate_credentials(key)
+                cache.set(f'{CACHE_PREFIX}{key}', user, settings.AUTH_TOKEN_CACHE_TTL)
+            local_tokens.set(key, user, settings.AUTH_TOKEN_LOCAL_TTL)
+        return self._accept(key, user)
+
+    async def aauthenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            # Malformed header: let authenticate() raise the usual error
+            return await sync_to_async(self.authenticate)(request)
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            return await sync_to_async(self.authenticate)(request)
+
+        user = local_tokens.get(key)
+        if user is None:
+            user = await cache.aget(f'{CACHE_PREFIX}{key}')
+            if user is None:
+                return await sync_to_async(self.authenticate_credentials)(key)
+            local_tokens.set(key, user, settings.AUTH_TOKEN_LOCAL_TTL)
+        return self._accept(key, user)
+
+    def _accept(self, key, user):
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        # Views get their own copy, so changes to request.user are not shared
+        return copy.copy(user), Token(key=key, user=user)
@@ -0,0 +1,19 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_token, invalidate_user_tokens
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Tokens deleted outside the auth views (admin, shell) stop working too"""
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+def invalidate_tokens_on_user_change(sender, instance, created, **kwargs):
+    """Cached users carry is_active and password; refresh them after a change"""
+    if not created:
+        invalidate_user_tokens(instance)
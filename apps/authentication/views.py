@@ -6,6 +6,7 @@ from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
 from drf_spectacular.utils import extend_schema
+from .authentication import invalidate_token, invalidate_user_tokens
 from .serializers import LoginSerializer, UserSerializer, ChangePasswordSerializer
 import logging
 
@@ -58,6 +59,7 @@ class LogoutView(APIView):
     def post(self, request):
         try:
             # Delete the user's token
+            invalidate_token(request.user.auth_token.key)
             request.user.auth_token.delete()
             logger.info(f"User {request.user.username} logged out successfully")
             return Response({'message': 'Successfully logged out'})
@@ -124,6 +126,7 @@ class ChangePasswordView(APIView):
             user.save()
             
             # Delete all tokens to force re-login
+            invalidate_user_tokens(user)
             Token.objects.filter(user=user).delete()
             
             logger.info(f"User {user.username} changed password")
@@ -0,0 +1,8 @@
+import os
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'attendance_system.settings')
+# Serve ingestion and the dashboard from the async views
+os.environ.setdefault('ASYNC_VIEWS', 'True')
+
+application = get_asgi_application()
@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+from celery.schedules import crontab
 from decouple import config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -24,7 +25,6 @@ THIRD_PARTY_APPS = [
     'django_filters',
     'corsheaders',
     'drf_spectacular',
-    'django_extensions',
     # 'debug_toolbar',
 ]
 
@@ -39,9 +39,11 @@ INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 
 MIDDLEWARE = [
+    # First, so the queries of the middleware below count towards the request
+    'apps.attendance.metrics.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'attendance_system.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -53,6 +55,10 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'attendance_system.urls'
 
+# Route face-result, dashboard and stats/attendance to the async views
+# (apps/attendance/async_views.py); attendance_system/asgi.py turns it on
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -70,6 +76,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'attendance_system.wsgi.application'
+ASGI_APPLICATION = 'attendance_system.asgi.application'
 
 # Database
 # DATABASES = {
@@ -120,6 +127,12 @@ STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 # STATICFILES_DIRS = [BASE_DIR / 'static']
 
+# Output of `manage.py build_openapi_schema`, collected as static/openapi/
+# once it has been built (the command creates the directory)
+OPENAPI_SCHEMA_DIR = BASE_DIR / 'build' / 'openapi'
+STATICFILES_DIRS = [('openapi', OPENAPI_SCHEMA_DIR)] if OPENAPI_SCHEMA_DIR.is_dir() else []
+WHITENOISE_MIMETYPES = {'.yaml': 'application/vnd.oai.openapi'}
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -130,7 +143,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'apps.authentication.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -155,6 +168,10 @@ SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
 }
 
+# api/schema/ redirects to the schema built by `manage.py build_openapi_schema`
+# while it matches the code, instead of generating the schema per request
+OPENAPI_SCHEMA_PRECOMPILED = config('OPENAPI_SCHEMA_PRECOMPILED', default=True, cast=bool)
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -164,13 +181,51 @@ CORS_ALLOWED_ORIGINS = [
 CORS_ALLOW_CREDENTIALS = True
 
 # Cache configuration
+REDIS_URL = config('REDIS_URL', default='redis://127.0.0.1:6379/1')
+
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
-        'LOCATION': config('REDIS_URL', default='redis://127.0.0.1:6379/1'),
+        'LOCATION': REDIS_URL,
     }
 }
 
+# Live dashboard events ('redis' pub/sub shared by all workers, or 'local' for a single process)
+EVENT_STREAM_BACKEND = config('EVENT_STREAM_BACKEND', default='redis')
+# Seconds between keep-alive comments on idle event streams
+EVENT_STREAM_KEEPALIVE = config('EVENT_STREAM_KEEPALIVE', default=15, cast=int)
+# Seconds after which a stream ends and the browser reconnects; bounds streams
+# of clients that went away, which Django 4.2 does not notice under ASGI
+EVENT_STREAM_MAX_AGE = config('EVENT_STREAM_MAX_AGE', default=300, cast=int)
+
+# Seconds a cached reference list lives; changes invalidate it earlier
+RESPONSE_CACHE_TIMEOUT = config('RESPONSE_CACHE_TIMEOUT', default=300, cast=int)
+# Camera and terminal lists include online states that change without a save
+DEVICE_LIST_CACHE_TIMEOUT = config('DEVICE_LIST_CACHE_TIMEOUT', default=30, cast=int)
+
+# Seconds an authenticated token is trusted from this process's memory; bounds
+# how long other workers accept a revoked token
+AUTH_TOKEN_LOCAL_TTL = config('AUTH_TOKEN_LOCAL_TTL', default=5, cast=int)
+# Seconds a token's user is kept in the shared cache (revocation deletes it)
+AUTH_TOKEN_CACHE_TTL = config('AUTH_TOKEN_CACHE_TTL', default=300, cast=int)
+
+# Signed device requests: allowed clock skew in seconds, key cache lifetimes
+DEVICE_SIGNATURE_MAX_SKEW = config('DEVICE_SIGNATURE_MAX_SKEW', default=300, cast=int)
+DEVICE_KEY_LOCAL_TTL = config('DEVICE_KEY_LOCAL_TTL', default=5, cast=int)
+DEVICE_KEY_CACHE_TTL = config('DEVICE_KEY_CACHE_TTL', default=300, cast=int)
+# Faces accepted in one face-result/batch/ request
+FACE_RESULT_BATCH_MAX = config('FACE_RESULT_BATCH_MAX', default=50, cast=int)
+
+# Per-request query/latency metrics, served in Prometheus format at METRICS_PATH
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+METRICS_PATH = '/metrics'
+# Bearer token required by the metrics endpoint; when empty the endpoint is
+# only served with DEBUG on
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+# Requests slower than this log their most repeated SQL statements
+SLOW_REQUEST_THRESHOLD_MS = config('SLOW_REQUEST_THRESHOLD_MS', default=500, cast=int)
+SLOW_REQUEST_TOP_QUERIES = config('SLOW_REQUEST_TOP_QUERIES', default=5, cast=int)
+
 # Session configuration
 # SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
 # SESSION_CACHE_ALIAS = 'default'
@@ -182,6 +237,35 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+# Camera/terminal pings are written to last_ping at most this often ('local' or 'redis' backend)
+HEARTBEAT_FLUSH_INTERVAL = config('HEARTBEAT_FLUSH_INTERVAL', default=10, cast=int)
+# 'redis' serves the fleet status from one map shared by every worker and is
+# flushed by Celery beat; a 'local' map re-reads last_ping every flush interval
+HEARTBEAT_BACKEND = config('HEARTBEAT_BACKEND', default='redis')
+# A device is online if it pinged within this many seconds
+DEVICE_ONLINE_THRESHOLD = config('DEVICE_ONLINE_THRESHOLD', default=300, cast=int)
+CELERY_BEAT_SCHEDULE = {
+    'cluster-unknown-faces': {
+        'task': 'apps.attendance.tasks.cluster_unknown_faces_task',
+        'schedule': 300.0,
+    },
+    'flush-recognition-windows': {
+        'task': 'apps.attendance.tasks.flush_recognition_windows',
+        'schedule': 5.0,
+    },
+    'flush-heartbeats': {
+        'task': 'apps.attendance.tasks.flush_heartbeats',
+        'schedule': float(HEARTBEAT_FLUSH_INTERVAL),
+    },
+    'close-idle-presence-intervals': {
+        'task': 'apps.attendance.tasks.close_idle_presence_intervals',
+        'schedule': 60.0,
+    },
+    'materialize-absentees': {
+        'task': 'apps.attendance.tasks.materialize_absentees_task',
+        'schedule': crontab(hour=23, minute=50),
+    },
+}
 
 # Logging configuration
 LOGGING = {
@@ -235,11 +319,55 @@ os.makedirs(BASE_DIR / 'logs', exist_ok=True)
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 
+# Square thumbnails made for every stored photo (pixels); the API uses the largest
+THUMBNAIL_SIZES = [50, 100]
+THUMBNAIL_QUALITY = config('THUMBNAIL_QUALITY', default=80, cast=int)
+
+# Face crops from recognizers are re-encoded before they are stored
+INGEST_IMAGE_MAX_SIZE = config('INGEST_IMAGE_MAX_SIZE', default=640, cast=int)
+INGEST_IMAGE_FORMAT = config('INGEST_IMAGE_FORMAT', default='JPEG')  # 'JPEG' or 'WEBP'
+INGEST_IMAGE_QUALITY = config('INGEST_IMAGE_QUALITY', default=85, cast=int)
+INGEST_IMAGE_WORKERS = config('INGEST_IMAGE_WORKERS', default=2, cast=int)
+INGEST_IMAGE_QUEUE_SIZE = config('INGEST_IMAGE_QUEUE_SIZE', default=100, cast=int)
+# Token buckets of face-result ingestion ('redis', shared by all workers, or
+# 'local' per worker; local buckets stand in while Redis is unreachable):
+# faces per second and bucket size per signing camera, per user for requests
+# without a device key, and shared by all sources (a rate of 0 turns the
+# bucket off). A request may not carry more faces than a bucket holds.
+INGEST_THROTTLE_BACKEND = config('INGEST_THROTTLE_BACKEND', default='redis')
+INGEST_CAMERA_RATE = config('INGEST_CAMERA_RATE', default=5, cast=float)
+INGEST_CAMERA_BURST = config('INGEST_CAMERA_BURST', default=50, cast=int)
+INGEST_CLIENT_RATE = config('INGEST_CLIENT_RATE', default=0, cast=float)
+INGEST_CLIENT_BURST = config('INGEST_CLIENT_BURST', default=100, cast=int)
+INGEST_GLOBAL_RATE = config('INGEST_GLOBAL_RATE', default=200, cast=float)
+INGEST_GLOBAL_BURST = config('INGEST_GLOBAL_BURST', default=400, cast=int)
+# Face-result answers 503 while this many crops wait in the ingest pool (0 turns it off)
+INGEST_BACKPRESSURE_DEPTH = config('INGEST_BACKPRESSURE_DEPTH', default=80, cast=int)
+INGEST_BACKPRESSURE_RETRY_AFTER = config('INGEST_BACKPRESSURE_RETRY_AFTER', default=5, cast=int)
+
 # Face recognition settings
 FACE_RECOGNITION_TOLERANCE = 0.6
 FACE_RECOGNITION_MODEL = 'large'  # 'small' or 'large'
 FAISS_INDEX_PATH = BASE_DIR / 'data' / 'face_index.faiss'
 FACE_ENCODINGS_PATH = BASE_DIR / 'data' / 'face_encodings.pkl'
+FACE_ENCODER = config('FACE_ENCODER', default='apps.attendance.face_encoding.FaceRecognitionEncoder')
+FACE_ENCODING_WORKERS = config('FACE_ENCODING_WORKERS', default=2, cast=int)
+FACE_ENCODING_BATCH_SIZE = config('FACE_ENCODING_BATCH_SIZE', default=32, cast=int)
+# Repeated recognitions of one employee on one camera within this many
+# seconds are merged into a single write ('local' or 'redis' backend)
+RECOGNITION_DEBOUNCE_WINDOW = config('RECOGNITION_DEBOUNCE_WINDOW', default=10, cast=int)
+RECOGNITION_DEBOUNCE_BACKEND = config('RECOGNITION_DEBOUNCE_BACKEND', default='local')
+# A presence interval ends when an employee is not seen for this many seconds
+PRESENCE_SESSION_GAP = config('PRESENCE_SESSION_GAP', default=1800, cast=int)
+# Seconds other worker processes may keep using a stale work schedule
+WORK_SCHEDULE_CACHE_TTL = config('WORK_SCHEDULE_CACHE_TTL', default=60, cast=int)
+# Rows per INSERT for the end-of-day absentee job
+ABSENTEE_CHUNK_SIZE = config('ABSENTEE_CHUNK_SIZE', default=1000, cast=int)
+# Maximum cosine distance between a sighting and a cluster centroid
+UNKNOWN_FACE_CLUSTER_DISTANCE = config('UNKNOWN_FACE_CLUSTER_DISTANCE', default=0.08, cast=float)
+
+# Bulk employee import
+EMPLOYEE_IMPORT_CHUNK_SIZE = config('EMPLOYEE_IMPORT_CHUNK_SIZE', default=500, cast=int)
 
 # Create data directory
 os.makedirs(BASE_DIR / 'data', exist_ok=True)
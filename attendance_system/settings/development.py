@@ -30,15 +30,24 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 # CORS settings for development
 CORS_ALLOW_ALL_ORIGINS = True
 
-# Additional development apps
+# Additional development apps (not installed in production, so workers start faster)
 INSTALLED_APPS += [
     'debug_toolbar',
+    'django_extensions',
 ]
 
 MIDDLEWARE += [
     'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+# The development server is a single process
+EVENT_STREAM_BACKEND = config('EVENT_STREAM_BACKEND', default='local')
+INGEST_THROTTLE_BACKEND = config('INGEST_THROTTLE_BACKEND', default='local')
+HEARTBEAT_BACKEND = config('HEARTBEAT_BACKEND', default='local')
+
+# Generate the OpenAPI schema per request, so it follows code changes
+OPENAPI_SCHEMA_PRECOMPILED = config('OPENAPI_SCHEMA_PRECOMPILED', default=False, cast=bool)
+
 # Debug toolbar configuration
 # INTERNAL_IPS = [
 #     '127.0.0.1',
@@ -0,0 +1,47 @@
+"""
+Gunicorn settings for both entry points.
+
+WSGI, sync workers (one request at a time per worker):
+
+    gunicorn -c gunicorn.conf.py attendance_system.wsgi:application
+
+ASGI, uvicorn workers (face-result and the dashboard use async views):
+
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker \
+        gunicorn -c gunicorn.conf.py attendance_system.asgi:application
+
+docker-compose runs both: WSGI for the API (``web``) and ASGI for the live
+event stream (``events``), which only the async views can serve.
+
+The application is preloaded in the master and every worker warms its
+caches before taking requests (``apps/attendance/warmup.py``). With
+preloading, ``kill -HUP`` restarts workers without reloading code; set
+``GUNICORN_PRELOAD_APP=False`` where code is reloaded that way.
+
+Gunicorn treats every module-level name here as a setting, so decouple is
+used through its module (``config`` is a Gunicorn setting).
+"""
+import decouple
+
+bind = decouple.config('GUNICORN_BIND', default='0.0.0.0:8000')
+workers = decouple.config('GUNICORN_WORKERS', default=2, cast=int)
+worker_class = decouple.config('GUNICORN_WORKER_CLASS', default='sync')
+timeout = decouple.config('GUNICORN_TIMEOUT', default=90, cast=int)
+# Idle keep-alive connections from nginx are closed after this many seconds
+keepalive = decouple.config('GUNICORN_KEEPALIVE', default=5, cast=int)
+# Import the application once in the master; workers fork from it and share
+# the imported modules and the face encoding index copy-on-write
+preload_app = decouple.config('GUNICORN_PRELOAD_APP', default=True, cast=bool)
+
+
+def when_ready(server):
+    # Runs in the master after preloading and before the first fork
+    if server.cfg.preload_app:
+        from apps.attendance.warmup import preload
+        preload()
+
+
+def post_worker_init(worker):
+    # Runs in each worker after the application is loaded, before it accepts requests
+    from apps.attendance.warmup import warm_up
+    warm_up()
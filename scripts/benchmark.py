@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+"""
+Benchmark the attendance API against a running server.
+
+Seed a dataset first, start the server, then run the scenarios:
+
+    python manage.py seed_benchmark_data --clear --employees 1000 --days 30
+    python scripts/benchmark.py --username admin --password admin123
+    python scripts/benchmark.py --compare benchmarks/results/<earlier>.json
+
+Each scenario sends ``--requests`` requests from ``--concurrency`` threads
+and reports throughput and p50/p95/p99 latency. Results are saved as JSON
+together with the git commit, so runs of different commits can be compared.
+Only the standard library is used, so the script runs outside the
+project's virtualenv too.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'results')
+
+# Smallest valid JPEG (1x1 gray pixel), used when --image is not given
+TINY_JPEG = bytes.fromhex(
+    'ffd8ffe000104a46494600010100000100010000ffdb004300080606070605080707070909080a0c140d0c0b0b0c1912130f'
+    '141d1a1f1e1d1a1c1c20242e2720222c231c1c2837292c30313434341f27393d38323c2e333432ffc0000b08000100010101'
+    '1100ffc4001f0000010501010101010100000000000000000102030405060708090a0bffc400b5100002010303020403050504'
+    '040000017d01020300041105122131410613516107227114328191a1082342b1c11552d1f02433627282090a161718191a25'
+    '262728292a3435363738393a434445464748494a535455565758595a636465666768696a737475767778797a838485868788'
+    '898a92939495969798999aa2a3a4a5a6a7a8a9aab2b3b4b5b6b7b8b9bac2c3c4c5c6c7c8c9cad2d3d4d5d6d7d8d9dae1e2e3'
+    'e4e5e6e7e8e9eaf1f2f3f4f5f6f7f8f9faffda0008010100003f00fbd3ffd9'
+)
+
+
+class Client:
+    def __init__(self, base_url, token=None, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.token = token
+        self.timeout = timeout
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if self.token:
+            headers['Authorization'] = f'Token {self.token}'
+        req = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def get_json(self, path):
+        code, body = self.request('GET', path)
+        if code != 200:
+            raise RuntimeError(f'GET {path} returned {code}: {body[:200]!r}')
+        return json.loads(body)
+
+    def login(self, username, password):
+        body = json.dumps({'username': username, 'password': password}).encode()
+        code, data = self.request('POST', '/api/v1/auth/login/', body, {'Content-Type': 'application/json'})
+        if code != 200:
+            raise RuntimeError(f'Login failed ({code}): {data[:200]!r}')
+        self.token = json.loads(data)['token']
+
+
+def multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    for name, (filename, content) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f'Content-Type: image/jpeg\r\n\r\n'.encode() + content + b'\r\n'
+        )
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def run_scenario(client, make_request, requests, concurrency):
+    """Call ``make_request(i)`` ``requests`` times and collect latencies."""
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def one(i):
+        nonlocal errors
+        method, path, body, headers = make_request(i)
+        started = time.perf_counter()
+        try:
+            code, _ = client.request(method, path, body, headers)
+        except Exception:
+            code = None
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            if code is None or code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - started
+    ms = [value * 1000 for value in latencies]
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': errors,
+        'duration_s': round(wall, 3),
+        'throughput_rps': round(requests / wall, 2) if wall else None,
+        'mean_ms': round(statistics.mean(ms), 2) if ms else None,
+        'p50_ms': round(percentile(ms, 0.50), 2) if ms else None,
+        'p95_ms': round(percentile(ms, 0.95), 2) if ms else None,
+        'p99_ms': round(percentile(ms, 0.99), 2) if ms else None,
+    }
+
+
+def build_scenarios(client, image):
+    employees = client.get_json('/api/v1/employees/?search=&ordering=employee_id')
+    employee_ids = [item['id'] for item in employees.get('results', employees)] or [0]
+    today = date.today()
+    month_ago = today - timedelta(days=30)
+
+    def get(path):
+        return lambda i: ('GET', path, None, None)
+
+    def face_result(i):
+        user = 'unrecognized' if i % 10 == 9 else random.choice(employee_ids)
+        body, content_type = multipart(
+            {
+                'user': user,
+                'cosine_similarity': f'{random.uniform(0.6, 0.95):.3f}',
+                'timestamp': datetime.now().isoformat(),
+            },
+            {'file': (f'bench-{i}.jpg', image)},
+        )
+        return 'POST', '/api/v1/face-result/', body, {'Content-Type': content_type}
+
+    def export_page(i):
+        return ('GET', f'/api/v1/attendance/?date_from={month_ago}&date_to={today}&page={i % 5 + 1}', None, None)
+
+    return {
+        'face_result': face_result,
+        'dashboard': get('/api/v1/dashboard/'),
+        'attendance_stats': get('/api/v1/stats/attendance/'),
+        'list_employees': get('/api/v1/employees/'),
+        'list_attendance': get('/api/v1/attendance/'),
+        'list_cameras': get('/api/v1/cameras/'),
+        'list_unknown_faces': get('/api/v1/unknown-faces/'),
+        'list_camera_stats': get(f'/api/v1/employee-camera-stats/?date={today - timedelta(days=1)}'),
+        'export_attendance': export_page,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path} (commit {baseline.get('commit')})")
+    print(f"{'scenario':<22}{'p95 ms':>12}{'Δ p95':>10}{'rps':>10}{'Δ rps':>10}")
+    for name, result in current['scenarios'].items():
+        old = baseline['scenarios'].get(name)
+        if not old or not old.get('p95_ms') or not result.get('p95_ms'):
+            continue
+        p95_delta = (result['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100
+        rps_delta = (result['throughput_rps'] - old['throughput_rps']) / old['throughput_rps'] * 100
+        print(f"{name:<22}{result['p95_ms']:>12.1f}{p95_delta:>+9.1f}%"
+              f"{result['throughput_rps']:>10.1f}{rps_delta:>+9.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--token', help="API token (otherwise --username/--password log in)")
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='admin123')
+    parser.add_argument('--scenarios', help="Comma separated scenario names (default: all)")
+    parser.add_argument('--requests', type=int, default=200, help="Requests per scenario")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--warmup', type=int, default=10, help="Unmeasured requests per scenario")
+    parser.add_argument('--image', help="JPEG sent to face-result (default: a 1x1 JPEG)")
+    parser.add_argument('--output', help="Result file (default: benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument('--compare', help="Earlier result file to compare with")
+    args = parser.parse_args()
+
+    client = Client(args.base_url, args.token)
+    if not client.token:
+        client.login(args.username, args.password)
+
+    image = TINY_JPEG
+    if args.image:
+        with open(args.image, 'rb') as f:
+            image = f.read()
+
+    scenarios = build_scenarios(client, image)
+    if args.scenarios:
+        wanted = args.scenarios.split(',')
+        unknown = set(wanted) - set(scenarios)
+        if unknown:
+            parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}; choose from {', '.join(scenarios)}")
+        scenarios = {name: scenarios[name] for name in wanted}
+
+    result = {
+        'commit': git_commit(),
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'base_url': args.base_url,
+        'scenarios': {},
+    }
+    print(f"{'scenario':<22}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for name, make_request in scenarios.items():
+        if args.warmup:
+            run_scenario(client, make_request, args.warmup, args.concurrency)
+        stats = run_scenario(client, make_request, args.requests, args.concurrency)
+        result['scenarios'][name] = stats
+        print(f"{name:<22}{stats['throughput_rps']:>10.1f}{stats['p50_ms']:>10.1f}"
+              f"{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}{stats['errors']:>8}")
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{result['commit'] or 'nogit'}.json")
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+    if args.compare:
+        compare(result, args.compare)
+    return 1 if any(s['errors'] for s in result['scenarios'].values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())